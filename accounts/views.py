@@ -11,13 +11,13 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.hashers import check_password, make_password
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
 from django.db.models import Q
 from django.http import JsonResponse
 from django.shortcuts import redirect, render
 from django.utils import timezone
 from django.views.decorators.http import require_http_methods
 from core.models import Property, School, Student, UserProfile
+from core.outbox import send_now
 
 from .models import PasswordResetSession
 
@@ -109,7 +109,9 @@ def _send_reset_code(user, code):
         "— Boarding Hub Security Team"
     )
     from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', None) or 'no-reply@boardinghub.local'
-    send_mail(subject, message, from_email, [user.email])
+    # The user is waiting for this code: try SMTP now, and leave it to the
+    # send_outbox command only if that fails
+    send_now(subject, message, [user.email], from_email=from_email)
 
 
 def _resolve_username_by_identifier(identifier, selected_role):
@@ -0,0 +1,210 @@
+# admin_panel app approvals.py
+
+"""Batch approval of survey responses into student accounts.
+
+:func:`approve_responses` checks every selected response up front, then
+creates the missing User, UserProfile and Student rows with ``bulk_create``
+and marks the responses registered, all in one transaction: a failure
+leaves no half-made accounts behind. With a ``welcome_login_url``, new
+accounts get no password here; instead a ``send_student_welcome`` job per
+account is queued in the same transaction, which hashes and emails that
+account's password, so credentials go out even if the caller never
+finishes. Without one, temporary passwords are hashed before the
+transaction starts.
+"""
+
+import secrets
+import string
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from core.jobs import enqueue_many
+from core.models import Student, SurveyResponse, UserProfile
+from core.stats import apply_deltas
+
+WELCOME_TASK = 'admin_panel.tasks.send_student_welcome'
+
+
+def temp_password():
+    return ''.join(secrets.choice(string.ascii_uppercase) for _ in range(8))
+
+
+def _counted_department(response):
+    """The department the stats rollup counts ``response`` under (core.stats.response_department)."""
+    if response.department_id is not None or response.student is None:
+        return response.department_id
+    return response.student.department_id
+
+
+def _unique_student_id(wanted, taken):
+    student_id = wanted
+    while not student_id or student_id in taken:
+        student_id = f'S-{secrets.token_hex(4).upper()}'
+    taken.add(student_id)
+    return student_id
+
+
+def approve_responses(survey, response_ids, reviewer, welcome_login_url=None):
+    """Register the students of the selected responses of ``survey``.
+
+    Returns one result per requested id, in order: a dict with the
+    response ``id``, its ``outcome`` (``approved``, ``skipped`` or
+    ``failed``), a human readable ``detail`` and, for approved rows, the
+    ``username``. Accounts created here also carry the ``temp_password``
+    to send to the student or, given ``welcome_login_url``, the id of the
+    ``welcome_job`` that will. Existing accounts keep their password.
+    """
+    results = {}
+    wanted = []
+    for raw_id in response_ids:
+        try:
+            response_id = int(raw_id)
+        except (TypeError, ValueError):
+            results[raw_id] = {'id': raw_id, 'outcome': 'failed', 'detail': 'Invalid response id.'}
+            continue
+        if response_id not in results:
+            wanted.append(response_id)
+            results[response_id] = None
+    order = list(results)
+
+    responses = SurveyResponse.objects.filter(
+        survey=survey, id__in=wanted, deleted_at__isnull=True
+    ).select_related('student')
+    by_id = {response.id: response for response in responses}
+
+    to_approve = []
+    for response_id in wanted:
+        response = by_id.get(response_id)
+        if response is None:
+            results[response_id] = {'id': response_id, 'outcome': 'failed', 'detail': 'Response not found.'}
+        elif response.status == 'registered':
+            results[response_id] = {'id': response_id, 'outcome': 'skipped', 'detail': 'Already registered.'}
+        else:
+            to_approve.append(response)
+
+    if to_approve:
+        _approve(survey, to_approve, reviewer, results, welcome_login_url)
+    return [results[key] for key in order]
+
+
+def _approve(survey, responses, reviewer, results, welcome_login_url):
+    school = survey.school
+    users = {
+        user.username: user
+        for user in User.objects.filter(
+            username__in=[response.student_email for response in responses]
+        ).select_related('profile', 'student_profile__survey_response')
+    }
+
+    new_users = []
+    passwords = {}
+    for response in responses:
+        if response.student_email in users:
+            continue
+        names = response.student_name.split()
+        user = User(
+            username=response.student_email,
+            email=response.student_email,
+            first_name=names[0] if names else '',
+            last_name=' '.join(names[1:]),
+        )
+        if welcome_login_url:
+            # The welcome job sets the password it emails
+            user.set_unusable_password()
+        else:
+            passwords[user.username] = temp_password()
+        users[user.username] = user
+        new_users.append(user)
+
+    # Hash outside the transaction: it is the slow part and needs no locks
+    for user in new_users:
+        if user.username in passwords:
+            user.password = make_password(passwords[user.username])
+
+    wanted_ids = [response.provided_student_id for response in responses if response.provided_student_id]
+    taken = set(Student.objects.filter(student_id__in=wanted_ids).values_list('student_id', flat=True))
+    now = timezone.now()
+
+    # Bulk writes send no signals, so the stats rollup moves by these instead
+    pending_left = 0
+    department_deltas = {}
+
+    with transaction.atomic():
+        User.objects.bulk_create(new_users)
+        new_usernames = {user.username for user in new_users}
+
+        new_profiles = []
+        changed_profiles = []
+        new_students = []
+        for response in responses:
+            user = users[response.student_email]
+            profile = None if user.username in new_usernames else getattr(user, 'profile', None)
+            if profile is None:
+                profile = UserProfile(user=user, role='student', school=school)
+                new_profiles.append(profile)
+            elif profile.role != 'student' or not profile.school_id:
+                profile.role = 'student'
+                profile.school = profile.school or school
+                profile.updated_at = now
+                changed_profiles.append(profile)
+
+            student = None if user.username in new_usernames else getattr(user, 'student_profile', None)
+            # A student already linked to another response keeps that link
+            link = student is None or not hasattr(student, 'survey_response')
+            if student is None:
+                student = Student(
+                    user=user,
+                    student_id=_unique_student_id(response.provided_student_id, taken),
+                    school=school,
+                    department_id=response.department_id,
+                    program_id=response.program_id,
+                )
+                new_students.append(student)
+
+            if response.status == 'pending':
+                pending_left += 1
+            counted_before = _counted_department(response)
+            response.status = 'registered'
+            response.reviewed_by = reviewer
+            response.reviewed_at = now
+            response.updated_at = now
+            if link:
+                response.student = student
+            counted_after = _counted_department(response)
+            if counted_before != counted_after:
+                for department, delta in ((counted_before, -1), (counted_after, 1)):
+                    if department is not None:
+                        department_deltas[department] = department_deltas.get(department, 0) + delta
+            results[response.id] = {
+                'id': response.id,
+                'outcome': 'approved',
+                'detail': f'Registered as {student.student_id}.',
+                'username': user.username,
+                'temp_password': passwords.get(user.username),
+            }
+
+        UserProfile.objects.bulk_create(new_profiles)
+        UserProfile.objects.bulk_update(changed_profiles, ['role', 'school', 'updated_at'])
+        Student.objects.bulk_create(new_students)
+        SurveyResponse.objects.bulk_update(
+            responses, ['status', 'reviewed_by', 'reviewed_at', 'student', 'updated_at']
+        )
+        if welcome_login_url and new_users:
+            jobs = enqueue_many(
+                WELCOME_TASK,
+                [{'user_id': user.id, 'login_url': welcome_login_url} for user in new_users],
+                user=reviewer,
+            )
+            job_ids = {user.username: job.id for user, job in zip(new_users, jobs)}
+            for response in responses:
+                result = results[response.id]
+                if result['username'] in job_ids:
+                    result['welcome_job'] = job_ids[result['username']]
+        apply_deltas(
+            school.id if school else None,
+            {'total_students': len(new_students), 'pending_survey_responses': -pending_left},
+            department_deltas,
+        )
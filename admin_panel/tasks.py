@@ -0,0 +1,90 @@
+# admin_panel app tasks.py
+
+"""Background tasks behind the slow admin actions.
+
+Views queue these with :func:`core.jobs.enqueue` and return at once; the
+``run_workers`` command runs them. Each task is called as
+``task(job, **payload)`` and returns a JSON-serializable summary.
+"""
+
+from django.contrib.auth.models import User
+
+from core.jobs import set_progress
+from core.models import Survey
+from core.outbox import queue_email
+
+from .approvals import approve_responses, temp_password
+
+
+def welcome_email(school, name, student_id, email, password, login_url):
+    """Subject and body of the login-credentials email for a new student."""
+    subject = f'Welcome to {school.name} Boarding Hub System'
+    message = f'''Dear {name},
+
+Welcome to the {school.name} Boarding Hub System!
+
+Your student account has been created successfully. Below are your login credentials:
+
+Student ID: {student_id}
+Email: {email}
+Password: {password}
+
+IMPORTANT SECURITY NOTICE:
+- Please keep this password confidential and do not share it with anyone.
+- We recommend changing your password after your first login.
+- Never share your login credentials with others.
+
+You can now log in to the system using your email or student ID and the password provided above.
+
+Login URL: {login_url}
+
+If you have any questions or need assistance, please contact the school administration.
+
+Best regards,
+{school.name} Administration Team'''
+    return subject, message
+
+
+def _queue_welcome(user, student, password, login_url):
+    subject, message = welcome_email(
+        student.school,
+        user.get_full_name() or user.username,
+        student.student_id,
+        user.email,
+        password,
+        login_url,
+    )
+    return queue_email(subject, message, [user.email]).id
+
+
+def send_student_welcome(job, user_id, login_url):
+    """Give a new student a temporary password and email it to them.
+
+    The password is generated here rather than in the request, so it
+    never sits in plain text in the job queue.
+    """
+    user = User.objects.select_related('student_profile__school').get(id=user_id)
+    password = temp_password()
+    user.set_password(password)
+    user.save(update_fields=['password'])
+    return {'email': user.email, 'outbox_id': _queue_welcome(user, user.student_profile, password, login_url)}
+
+
+def approve_survey_responses(job, survey_id, response_ids, reviewer_id, login_url):
+    """Bulk-approve survey responses; each new student's login email is its own job.
+
+    The welcome jobs are queued in the approval transaction, so no
+    credentials depend on this job's result being recorded.
+    """
+    survey = Survey.objects.select_related('school').get(id=survey_id)
+    reviewer = User.objects.filter(id=reviewer_id).first()
+    set_progress(job, 0, len(response_ids))
+    rows = approve_responses(survey, response_ids, reviewer, welcome_login_url=login_url)
+    set_progress(job, len(rows))
+    return {
+        'approved': sum(1 for row in rows if row['outcome'] == 'approved'),
+        'skipped': sum(1 for row in rows if row['outcome'] == 'skipped'),
+        'failed': sum(1 for row in rows if row['outcome'] == 'failed'),
+        'welcome_jobs': sum(1 for row in rows if row.get('welcome_job')),
+        'rows': rows,
+    }
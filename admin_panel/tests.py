@@ -1,3 +1,551 @@
+from datetime import timedelta
+import json
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import (
+    Department,
+    Job,
+    OutboundEmail,
+    Program,
+    School,
+    SchoolStats,
+    Student,
+    Survey,
+    SurveyAnswer,
+    SurveyQuestion,
+    SurveyResponse,
+    SurveySection,
+    UserProfile,
+)
+from core.stats import compute_school_stats, refresh_school_stats
+
+
+class DashboardStatisticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(name="Caraga State University")
+        cls.admin = User.objects.create_user(username="schooladmin", password="pass1234")
+        UserProfile.objects.create(user=cls.admin, role="school_admin", school=cls.school)
+        cls.survey = Survey.objects.create(
+            school=cls.school, title="Boarding survey", unique_code="board-2026"
+        )
+
+    def _add_departments(self, count):
+        start = Department.objects.count()
+        departments = [
+            Department.objects.create(school=self.school, name=f"Dept {start + i:02d}")
+            for i in range(count)
+        ]
+        for i, dept in enumerate(departments):
+            for j in range(i % 3):
+                SurveyResponse.objects.create(
+                    survey=self.survey,
+                    student_name=f"Student {dept.id}-{j}",
+                    student_email=f"s{dept.id}-{j}@example.com",
+                    department=dept,
+                )
+        return departments
+
+    def _dashboard(self):
+        self.client.login(username="schooladmin", password="pass1234")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("admin_panel:dashboard"))
+        self.assertEqual(response.status_code, 200)
+        return response.context, len(ctx.captured_queries)
+
+    def test_department_counts_in_constant_queries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._add_departments(3)
+        context, few_queries = self._dashboard()
+        self.assertEqual(
+            [row["count"] for row in context["department_response_counts"]], [0, 1, 2]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._add_departments(12)
+        context, many_queries = self._dashboard()
+        self.assertEqual(len(context["department_response_counts"]), 15)
+        self.assertEqual(few_queries, many_queries)
+        self.assertEqual(context["pending_survey_responses"], 15)
+
+    def test_counted_writes_apply_deltas_without_recounting(self):
+        refresh_school_stats(self.school.id)
+        with mock.patch("core.stats.compute_school_stats") as compute:
+            departments = self._add_departments(4)
+            response = SurveyResponse.objects.filter(department=departments[2]).first()
+            response.status = "approved"
+            response.save()
+            SurveyResponse.objects.filter(department=departments[1]).get().delete()
+        compute.assert_not_called()
+        stats = SchoolStats.objects.get(school=self.school)
+        self.assertEqual(stats.pending_survey_responses, 1)
+        self.assertEqual(stats.department_response_counts, {str(departments[2].id): 2})
+        live = compute_school_stats(self.school.id)
+        self.assertEqual(
+            (live["pending_survey_responses"], live["department_response_counts"]),
+            (stats.pending_survey_responses, stats.department_response_counts),
+        )
+
+    def test_moving_a_response_refreshes_both_schools(self):
+        other_school = School.objects.create(name="Father Saturnino Urios University")
+        other_survey = Survey.objects.create(school=other_school, title="Other", unique_code="other-2026")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = SurveyResponse.objects.create(
+                survey=self.survey, student_name="Ana", student_email="ana@example.com"
+            )
+        self.assertEqual(SchoolStats.objects.get(school=self.school).pending_survey_responses, 1)
+
+        response = SurveyResponse.objects.get(id=response.id)
+        response.survey = other_survey
+        with self.captureOnCommitCallbacks(execute=True):
+            response.save()
+        self.assertEqual(SchoolStats.objects.get(school=self.school).pending_survey_responses, 0)
+        self.assertEqual(SchoolStats.objects.get(school=other_school).pending_survey_responses, 1)
+
+    def test_verify_command_repairs_drift(self):
+        self._add_departments(3)
+        # As if the rollup had never been built
+        SchoolStats.objects.all().delete()
+        out = StringIO()
+        call_command("verify_school_stats", stdout=out)
+        self.assertIn("missing", out.getvalue())
+        self.assertFalse(SchoolStats.objects.exists())
+
+        call_command("verify_school_stats", "--fix", stdout=StringIO())
+        stats = SchoolStats.objects.get(school=self.school)
+        self.assertEqual(stats.pending_survey_responses, 3)
+
+        SchoolStats.objects.filter(pk=stats.pk).update(pending_survey_responses=99)
+        out = StringIO()
+        call_command("verify_school_stats", "--fix", stdout=out)
+        self.assertIn("pending_survey_responses", out.getvalue())
+        stats.refresh_from_db()
+        self.assertEqual(stats.pending_survey_responses, 3)
+
+
+class SurveyResponseDepartmentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(name="Caraga State University")
+        cls.other_school = School.objects.create(name="Father Saturnino Urios University")
+        cls.survey = Survey.objects.create(
+            school=cls.school,
+            title="Boarding survey",
+            unique_code="board-2026",
+            status="active",
+            require_property_info=False,
+        )
+        cls.dept = Department.objects.create(school=cls.school, name="Engineering", code="COE")
+        cls.program = Program.objects.create(department=cls.dept, name="Civil Engineering")
+        cls.foreign_dept = Department.objects.create(school=cls.other_school, name="Nursing")
+
+    def test_survey_take_stores_department_and_program(self):
+        response = self.client.post(
+            reverse("survey_take", args=[self.survey.unique_code]),
+            {
+                "student_name": "Ana Cruz",
+                "student_email": "ana@example.com",
+                "student_id": "2026-0001",
+                "department": str(self.dept.id),
+                "program": str(self.program.id),
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        saved = SurveyResponse.objects.get(student_email="ana@example.com")
+        self.assertEqual(saved.department, self.dept)
+        self.assertEqual(saved.program, self.program)
+
+    def test_survey_take_writes_answers_in_a_few_queries(self):
+        section = SurveySection.objects.create(survey=self.survey, title="About you")
+        types = ["text_short", "multiple_choice", "checkbox", "rating", "date"]
+        questions = [
+            SurveyQuestion.objects.create(section=section, text=f"Question {i}", question_type=types[i % 5], order=i)
+            for i in range(38)
+        ]
+        dept_question = SurveyQuestion.objects.create(section=section, text="Your department?", order=38)
+        program_question = SurveyQuestion.objects.create(section=section, text="Your program?", order=39)
+        data = {
+            "student_name": "Ana Cruz",
+            "student_email": "ana@example.com",
+            "student_id": "2026-0001",
+            f"question_{dept_question.id}": "engineering",
+            f"question_{program_question.id}": "civil",
+        }
+        values = {"text_short": "Hello", "multiple_choice": "Yes", "checkbox": ["A", "B"], "rating": "4", "date": "2026-06-01"}
+        for question in questions:
+            data[f"question_{question.id}"] = values[question.question_type]
+
+        refresh_school_stats(self.school.id)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse("survey_take", args=[self.survey.unique_code]), data)
+        self.assertEqual(response.status_code, 200)
+        # Two of them keep the school's stats rollup current
+        self.assertLessEqual(len(ctx.captured_queries), 11)
+
+        saved = SurveyResponse.objects.get(student_email="ana@example.com")
+        self.assertEqual((saved.department, saved.program), (self.dept, self.program))
+        answers = {answer.question_id: answer for answer in SurveyAnswer.objects.filter(response=saved)}
+        self.assertEqual(len(answers), 40)
+        self.assertEqual(answers[questions[2].id].answer_choice, "A, B")
+        self.assertEqual(answers[questions[3].id].answer_rating, 4)
+        self.assertEqual(str(answers[questions[4].id].answer_date), "2026-06-01")
+
+    def test_survey_take_matches_typed_department_in_name_order(self):
+        section = SurveySection.objects.create(survey=self.survey, title="About you")
+        question = SurveyQuestion.objects.create(section=section, text="Your department?", order=0)
+        computer = Department.objects.create(school=self.school, name="Computer Engineering", code="CE")
+        self.client.post(
+            reverse("survey_take", args=[self.survey.unique_code]),
+            {
+                "student_name": "Ana Cruz",
+                "student_email": "ana@example.com",
+                "student_id": "2026-0001",
+                f"question_{question.id}": "engineering",
+            },
+        )
+        self.assertEqual(SurveyResponse.objects.get(student_email="ana@example.com").department, computer)
+
+    def test_backfill_reads_additional_data(self):
+        rows = [
+            ({"department_id": self.dept.id, "program_id": str(self.program.id)}, self.dept, self.program),
+            ({"department_id": str(self.dept.id)}, self.dept, None),
+            # Another school's department and stale ids are left unset
+            ({"department_id": self.foreign_dept.id}, None, None),
+            ({"department_id": 987654, "program_id": "x"}, None, None),
+        ]
+        for i, (data, _, _) in enumerate(rows):
+            SurveyResponse.objects.create(
+                survey=self.survey,
+                student_name=f"Student {i}",
+                student_email=f"s{i}@example.com",
+                additional_data=data,
+            )
+
+        out = StringIO()
+        call_command("backfill_survey_response_departments", "--chunk-size", "2", stdout=out)
+        self.assertIn("Updated 2 of 4", out.getvalue())
+        for i, (_, dept, program) in enumerate(rows):
+            saved = SurveyResponse.objects.get(student_email=f"s{i}@example.com")
+            self.assertEqual((saved.department, saved.program), (dept, program))
+        self.assertEqual(
+            SchoolStats.objects.get(school=self.school).department_response_counts,
+            {str(self.dept.id): 2},
+        )
+
+
+class SurveyTakeCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(name="Caraga State University")
+        cls.admin = User.objects.create_user(username="schooladmin", password="pass1234")
+        UserProfile.objects.create(user=cls.admin, role="school_admin", school=cls.school)
+        cls.survey = Survey.objects.create(
+            school=cls.school, title="Boarding survey", unique_code="board-2026", status="active"
+        )
+        section = SurveySection.objects.create(survey=cls.survey, title="About you")
+        SurveyQuestion.objects.create(section=section, text="Where do you stay?")
+        cls.dept = Department.objects.create(school=cls.school, name="Engineering", code="COE")
+        Program.objects.create(department=cls.dept, name="Civil Engineering")
+
+    def setUp(self):
+        # Versions from other tests' surveys with the same code must not leak in
+        cache.clear()
+
+    def _take(self):
+        return self.client.get(reverse("survey_take", args=[self.survey.unique_code]))
+
+    def test_repeat_views_are_served_from_cache(self):
+        first = self._take()
+        self.assertContains(first, "Where do you stay?")
+        self.assertContains(first, "Civil Engineering (Engineering)")
+        with CaptureQueriesContext(connection) as ctx:
+            again = self._take()
+        self.assertContains(again, "Where do you stay?")
+        # Only the version and definition reads of the shared cache
+        self.assertEqual([q["sql"] for q in ctx.captured_queries if "django_cache" not in q["sql"]], [])
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_survey_create_edit_bumps_version(self):
+        self._take()
+        self.client.login(username="schooladmin", password="pass1234")
+        sections = [{"title": "Housing", "questions": [{"text": "Monthly rent?", "type": "text_short"}]}]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("admin_panel:survey_create"), {
+                "survey_id": self.survey.id,
+                "title": "Boarding survey",
+                "status": "active",
+                "sections": json.dumps(sections),
+            })
+        self.client.logout()
+
+        response = self._take()
+        self.assertContains(response, "Monthly rent?")
+        self.assertNotContains(response, "Where do you stay?")
+
+    def test_department_changes_and_failed_posts_use_fresh_choices(self):
+        self._take()
+        with self.captureOnCommitCallbacks(execute=True):
+            Department.objects.create(school=self.school, name="Nursing", code="CON")
+        # A failed validation renders the same form, choices included
+        response = self.client.post(reverse("survey_take", args=[self.survey.unique_code]), {})
+        self.assertContains(response, "Name, student ID, and university email are required.")
+        self.assertContains(response, "Nursing")
+        self.assertContains(response, "Where do you stay?")
+
+    def test_deactivated_survey_is_not_found(self):
+        self.assertEqual(self._take().status_code, 200)
+        self.survey.status = "draft"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.survey.save()
+        self.assertEqual(self._take().status_code, 404)
+
+
+class SurveyResponsesListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(name="Caraga State University")
+        cls.admin = User.objects.create_user(username="schooladmin", password="pass1234")
+        UserProfile.objects.create(user=cls.admin, role="school_admin", school=cls.school)
+        cls.survey = Survey.objects.create(
+            school=cls.school, title="Boarding survey", unique_code="board-2026"
+        )
+        cls.departments = [
+            Department.objects.create(school=cls.school, name=f"Dept {i}", code=f"D{i}")
+            for i in range(4)
+        ]
+
+    def _add_responses(self, count):
+        start = SurveyResponse.objects.count()
+        for i in range(start, start + count):
+            SurveyResponse.objects.create(
+                survey=self.survey,
+                student_name=f"Student {i}",
+                student_email=f"s{i}@example.com",
+                department=self.departments[i % len(self.departments)],
+                status="rejected" if i % 5 == 0 else "pending",
+            )
+
+    def _list(self, **params):
+        self.client.login(username="schooladmin", password="pass1234")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                reverse("admin_panel:survey_responses", args=[self.survey.id]), params
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.context, len(ctx.captured_queries)
+
+    def test_page_queries_do_not_grow_with_responses(self):
+        self._add_responses(8)
+        context, few_queries = self._list()
+        self.assertEqual(len(context["responses"]), 8)
+        self.assertEqual(set(context["grouped_responses"]), {"D0", "D1", "D2", "D3"})
+
+        self._add_responses(120)
+        context, many_queries = self._list(page=2)
+        self.assertEqual(few_queries, many_queries)
+        self.assertEqual(len(context["responses"]), 50)
+        self.assertEqual(sum(
+            len(rows) for programs in context["grouped_responses"].values() for rows in programs.values()
+        ), 50)
+        self.assertEqual(context["all_count"], 128)
+        self.assertEqual(context["rejected_count"], 26)
+        self.assertEqual(context["pending_count"], 102)
+
+
+class BatchApprovalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(name="Caraga State University")
+        cls.admin = User.objects.create_user(username="schooladmin", password="pass1234")
+        UserProfile.objects.create(user=cls.admin, role="school_admin", school=cls.school)
+        cls.survey = Survey.objects.create(
+            school=cls.school, title="Boarding survey", unique_code="board-2026"
+        )
+        cls.dept = Department.objects.create(school=cls.school, name="Engineering")
+
+    def _response(self, i, **kwargs):
+        return SurveyResponse.objects.create(
+            survey=self.survey,
+            student_name=f"Student Number {i}",
+            student_email=f"s{i}@example.com",
+            provided_student_id=f"2026-{i:04d}",
+            department=self.dept,
+            **kwargs,
+        )
+
+    def test_approve_reports_each_row_and_creates_accounts(self):
+        from admin_panel.approvals import approve_responses
+
+        fresh = self._response(1)
+        existing_user = User.objects.create_user(username="s2@example.com", password="keepme")
+        with_account = self._response(2)
+        registered = self._response(3, status="registered")
+        # Another student already holds the requested student id
+        Student.objects.create(
+            user=User.objects.create_user(username="other"), student_id="2026-0004"
+        )
+        clashing = self._response(4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            results = approve_responses(
+                self.survey,
+                [fresh.id, "abc", with_account.id, registered.id, 999999, clashing.id],
+                self.admin,
+            )
+
+        self.assertEqual(
+            [r["outcome"] for r in results],
+            ["approved", "failed", "approved", "skipped", "failed", "approved"],
+        )
+        self.assertTrue(results[0]["temp_password"])
+        self.assertIsNone(results[2]["temp_password"])
+        existing_user.refresh_from_db()
+        self.assertTrue(existing_user.check_password("keepme"))
+
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, "registered")
+        self.assertEqual(fresh.student.student_id, "2026-0001")
+        self.assertEqual(fresh.student.department, self.dept)
+        self.assertEqual(fresh.student.user.profile.role, "student")
+        self.assertTrue(fresh.student.user.check_password(results[0]["temp_password"]))
+        clashing.refresh_from_db()
+        self.assertNotEqual(clashing.student.student_id, "2026-0004")
+        stats = SchoolStats.objects.get(school=self.school)
+        self.assertEqual(stats.total_students, 3)
+        live = compute_school_stats(self.school.id)
+        self.assertEqual(
+            (stats.pending_survey_responses, stats.department_response_counts),
+            (live["pending_survey_responses"], live["department_response_counts"]),
+        )
+
+    def test_bulk_action_view_runs_approval_as_a_job(self):
+        responses = [self._response(i) for i in range(3)]
+        self.client.login(username="schooladmin", password="pass1234")
+        page = self.client.post(
+            reverse("admin_panel:survey_responses", args=[self.survey.id]),
+            {"bulk_action": "approve", "selected": [r.id for r in responses[:2]]},
+        )
+        job = Job.objects.get()
+        self.assertTrue(page["Location"].endswith(f"?job={job.id}"))
+        self.client.post(
+            reverse("admin_panel:survey_responses", args=[self.survey.id]),
+            {"bulk_action": "reject", "selected": [responses[2].id]},
+        )
+        # Nothing is approved until a worker runs the job
+        self.assertEqual(self.client.get(reverse("admin_panel:job_progress", args=[job.id])).json()["status"], "queued")
+        self.assertFalse(Student.objects.exists())
+
+        call_command("run_workers", "--once", "--workers", "1", stdout=StringIO())
+        welcome = OutboundEmail.objects.order_by("id")
+        self.assertEqual([email.to for email in welcome], [["s0@example.com"], ["s1@example.com"]])
+        self.assertIn("Password: ", welcome[0].body)
+
+        progress = self.client.get(reverse("admin_panel:job_progress", args=[job.id])).json()
+        self.assertEqual(progress["status"], "succeeded")
+        self.assertEqual((progress["done"], progress["total"]), (2, 2))
+        self.assertEqual(progress["result"]["approved"], 2)
+        self.assertEqual(progress["result"]["welcome_jobs"], 2)
+        self.assertIsNone(progress["result"]["rows"][0]["temp_password"])
+        # Each student got a welcome job of their own, already run
+        self.assertEqual(
+            list(Job.objects.exclude(id=job.id).values_list("task", "status")),
+            [("admin_panel.tasks.send_student_welcome", "succeeded")] * 2,
+        )
+        self.assertEqual(
+            list(SurveyResponse.objects.order_by("id").values_list("status", flat=True)),
+            ["registered", "registered", "rejected"],
+        )
+        self.assertEqual(Student.objects.filter(school=self.school).count(), 2)
+        # The bulk writes moved the rollup by their deltas alone
+        stats = SchoolStats.objects.get(school=self.school)
+        live = compute_school_stats(self.school.id)
+        self.assertEqual(
+            (stats.total_students, stats.pending_survey_responses, stats.department_response_counts),
+            (live["total_students"], live["pending_survey_responses"], live["department_response_counts"]),
+        )
+
+
+def failing_task(job, fail_times):
+    if job.attempts <= fail_times:
+        raise RuntimeError(f"attempt {job.attempts} failed")
+    return {"attempts": job.attempts}
+
+
+class JobQueueTests(TestCase):
+    def test_retries_with_backoff_then_fails(self):
+        from core.jobs import claim_job, enqueue, run_job
+
+        job = enqueue(failing_task, {"fail_times": 5}, max_attempts=2)
+        job = run_job(claim_job("w1"))
+        self.assertEqual((job.status, job.attempts), ("queued", 1))
+        self.assertGreater(job.run_after, timezone.now())
+        # Backing off: not claimable yet
+        self.assertIsNone(claim_job("w1"))
+
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        job = run_job(claim_job("w1"))
+        self.assertEqual((job.status, job.attempts), ("failed", 2))
+        self.assertIn("attempt 2 failed", Job.objects.get(id=job.id).error)
+
+    def test_expired_claim_is_taken_over(self):
+        from core.jobs import claim_job, enqueue, run_job
+
+        enqueue(failing_task, {"fail_times": 0})
+        stale = claim_job("w1", visibility_timeout=60)
+        self.assertIsNone(claim_job("w2"))
+
+        Job.objects.filter(id=stale.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        fresh = claim_job("w2")
+        self.assertEqual((fresh.id, fresh.attempts, fresh.locked_by), (stale.id, 2, "w2"))
+        run_job(fresh)
+        # The first worker finishing late does not overwrite the result
+        stale.payload = {"fail_times": 9}
+        run_job(stale)
+        job = Job.objects.get(id=stale.id)
+        self.assertEqual((job.status, job.result), ("succeeded", {"attempts": 2}))
+
+    def test_progress_extends_claim(self):
+        from core.jobs import claim_job, enqueue, set_progress
+
+        enqueue(failing_task, {"fail_times": 0})
+        job = claim_job("w1", visibility_timeout=60)
+        Job.objects.filter(id=job.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        set_progress(job, 1, 10)
+        self.assertIsNone(claim_job("w2"))
+        self.assertGreater(Job.objects.get(id=job.id).locked_until, timezone.now() + timedelta(seconds=50))
+
+    def test_expired_claim_without_attempts_left_fails(self):
+        from core.jobs import claim_job, enqueue
+
+        job = enqueue(failing_task, {"fail_times": 0}, max_attempts=1)
+        claim_job("w1", visibility_timeout=60)
+        Job.objects.filter(id=job.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(claim_job("w2"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), ("failed", 1, ""))
+        self.assertIn("stopped", job.error)
+
+    def test_progress_endpoint_is_private(self):
+        from core.jobs import enqueue
+
+        school = School.objects.create(name="Caraga State University")
+        owner = User.objects.create_user(username="admin1", password="pass1234")
+        other = User.objects.create_user(username="admin2", password="pass1234")
+        for user in (owner, other):
+            UserProfile.objects.create(user=user, role="school_admin", school=school)
+        job = enqueue(failing_task, {"fail_times": 0}, user=owner)
 
-# Create your tests here.
+        self.client.login(username="admin2", password="pass1234")
+        self.assertEqual(self.client.get(reverse("admin_panel:job_progress", args=[job.id])).status_code, 404)
+        self.client.login(username="admin1", password="pass1234")
+        self.assertEqual(self.client.get(reverse("admin_panel:job_progress", args=[job.id])).json()["id"], job.id)
@@ -29,5 +29,6 @@ urlpatterns = [
     path('surveys/responses/<int:response_id>/permanent-delete/', views.permanently_delete_survey_response, name='permanently_delete_survey_response'),
     path('surveys/<int:survey_id>/delete/', views.delete_survey, name='delete_survey'),
     path('students/<int:student_id>/delete/', views.delete_student, name='delete_student'),
+    path('jobs/<int:job_id>/', views.job_progress, name='job_progress'),
 ]
 
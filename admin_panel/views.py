@@ -1,19 +1,34 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate
 from django.contrib import messages
+from django.core.paginator import Paginator
+from django.utils.http import urlencode
+from django.db import transaction
 from django.db.models import Count, Q, Avg
-from django.db.utils import NotSupportedError
+from datetime import datetime
 from functools import wraps
 from collections import OrderedDict
-from core.models import UserProfile, Property, Student, BoardingAssignment, EmergencyLog, MaintenanceRequest, Department, Program, Survey, SurveySection, SurveyQuestion, SurveyResponse, SurveyAnswer
+from core.models import UserProfile, Property, Student, BoardingAssignment, EmergencyLog, MaintenanceRequest, Department, Program, Survey, SurveySection, SurveyQuestion, SurveyResponse, SurveyAnswer, SchoolStats, Job
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
-from core.email_backend import send_email_with_feedback
+from core.outbox import queue_email
+from core.stats import apply_deltas, get_school_stats
+from core.survey_cache import compiled_survey
+from core.jobs import enqueue, job_status
+from .tasks import approve_survey_responses, send_student_welcome
 from django.conf import settings
 import secrets
 import string
 import json
+import logging
+
+email_logger = logging.getLogger('core.email')
+
+# Survey responses listed per page in the admin review list
+SURVEY_RESPONSES_PAGE_SIZE = 50
 
 
 def school_admin_required(view_func):
@@ -92,77 +107,40 @@ def dashboard(request):
     """School Admin Dashboard"""
     profile = request.user.profile
     
-    # Get statistics
-    total_students = Student.objects.filter(school=profile.school).count()
-    total_properties = Property.objects.filter(school=profile.school).count()
-    verified_properties = Property.objects.filter(school=profile.school, status='verified').count()
-    
+    school = profile.school
+
+    # Get statistics from the school's rollup row (core/stats.py)
+    stats = get_school_stats(school) if school else SchoolStats()
+
     # Get students with boarding assignments
     boarding_students = BoardingAssignment.objects.filter(
-        student__school=profile.school,
+        student__school=school,
         status='active'
     ).select_related('student', 'property')
-    
-    # Critical alerts (properties with low rating)
-    low_rating_properties = Property.objects.filter(
-        school=profile.school,
-        safety_rating__lt=3.0,
-        status='verified'
-    ).count()
-    
-    # Critical safety alerts (emergency logs with high severity)
-    critical_alerts = EmergencyLog.objects.filter(
-        property__school=profile.school,
-        severity__in=['high', 'critical'],
-        status__in=['open', 'investigating']
-    ).count()
-    
-    # Pending verifications (properties not yet verified)
-    pending_verifications = Property.objects.filter(
-        school=profile.school,
-        status='pending'
-    ).count()
-    
-    # Pending survey responses (students awaiting approval)
-    pending_survey_responses = SurveyResponse.objects.filter(
-        survey__school=profile.school,
-        status='pending'
-    ).count()
-    
+
     # Recent alerts for the dashboard
     recent_alerts = EmergencyLog.objects.filter(
-        property__school=profile.school
+        property__school=school
     ).select_related('property').order_by('-created_at')[:5]
+
     # Response counts per department for dashboard summary
-    department_response_counts = []
-    departments = Department.objects.filter(school=profile.school).order_by('name')
-    for dept in departments:
-        # Count responses linked to students in this department
-        count1 = SurveyResponse.objects.filter(survey__school=profile.school, student__department=dept).count()
-        # Try JSON contains lookup first; fall back to text search on DBs that don't support JSON contains (e.g., SQLite)
-        try:
-            count2 = SurveyResponse.objects.filter(
-                survey__school=profile.school,
-                additional_data__contains={"department_id": dept.id}
-            ).count()
-        except NotSupportedError:
-            # SQLite doesn't support JSON contains; do a safe icontains fallback for common JSON key formats
-            patterns = [f'"department_id": {dept.id}', f'"department_id":"{dept.id}"', f'"department_id": "{dept.id}"']
-            q = Q()
-            for p in patterns:
-                q |= Q(additional_data__icontains=p)
-            count2 = SurveyResponse.objects.filter(survey__school=profile.school).filter(q).count()
-
-        department_response_counts.append({'department': dept.name, 'count': count1 + count2})
-    
+    department_response_counts = [
+        {'department': dept.name, 'count': stats.department_response_counts.get(str(dept.id), 0)}
+        for dept in Department.objects.filter(school=school).order_by('name')
+    ]
+
     context = {
-        'total_students': total_students,
-        'total_properties': total_properties,
-        'verified_properties': verified_properties,
-        'low_rating_properties': low_rating_properties,
-        'critical_alerts': critical_alerts,
-        'pending_verifications': pending_verifications,
-        'pending_survey_responses': pending_survey_responses,
+        'total_students': stats.total_students,
+        'total_properties': stats.total_properties,
+        'verified_properties': stats.verified_properties,
+        # Critical alerts (properties with low rating)
+        'low_rating_properties': stats.low_rating_properties,
+        # Critical safety alerts (emergency logs with high severity)
+        'critical_alerts': stats.open_critical_emergencies,
+        # Pending verifications (properties not yet verified)
+        'pending_verifications': stats.pending_properties,
+        # Pending survey responses (students awaiting approval)
+        'pending_survey_responses': stats.pending_survey_responses,
         'boarding_students': boarding_students[:10],  # Latest 10
         'recent_alerts': recent_alerts,
         'department_response_counts': department_response_counts,
@@ -378,11 +356,10 @@ def add_property_owner(request):
         status='pending'
     )
     
-    # Send email with login credentials
-    try:
-        login_url = request.build_absolute_uri('/login/')
-        subject = f'Welcome to {profile.school.name} Boarding Hub System'
-        message = f'''Dear {owner_name},
+    # Queue the login credentials email (delivered by send_outbox)
+    login_url = request.build_absolute_uri('/login/')
+    subject = f'Welcome to {profile.school.name} Boarding Hub System'
+    message = f'''Dear {owner_name},
 
 Welcome to the {profile.school.name} Boarding Hub System!
 
@@ -405,43 +382,8 @@ If you have any questions or need assistance, please contact the school administ
 
 Best regards,
 {profile.school.name} Administration Team'''
-        
-        from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', settings.EMAIL_HOST_USER)
-        print(f"Attempting to send email to {owner_email} from {from_email}")
-        print(f"SMTP Host: {settings.EMAIL_HOST}, Port: {settings.EMAIL_PORT}")
-        
-        send_mail(
-            subject,
-            message,
-            from_email,
-            [owner_email],
-            fail_silently=False,
-        )
-        print(f"Email sent successfully to {owner_email}")
-        messages.success(request, f'Property {property_id} and owner registered successfully. Login credentials sent to {owner_email}. If not received, check spam folder or sent_emails folder. Emails may take 1-5 minutes to arrive on phone.')
-    except Exception as e:
-        import traceback
-        error_msg = str(e)
-        error_type = type(e).__name__
-        full_traceback = traceback.format_exc()
-        
-        # Print detailed error to console
-        print("=" * 60)
-        print("EMAIL SENDING ERROR:")
-        print(f"Error Type: {error_type}")
-        print(f"Error Message: {error_msg}")
-        print(f"Full Traceback:\n{full_traceback}")
-        print("=" * 60)
-        
-        # Provide user-friendly error message
-        if "authentication failed" in str(e).lower() or "535" in str(e) or "534" in str(e):
-            user_error = f'⚠️ Email authentication failed! Gmail requires an App Password (not your regular password). The email was saved to sent_emails folder. Generate App Password at: https://myaccount.google.com/apppasswords'
-        elif "connection" in str(e).lower() or "timeout" in str(e).lower():
-            user_error = f'⚠️ Could not connect to email server. The email was saved to sent_emails folder. Check your internet connection.'
-        else:
-            user_error = f'⚠️ Email could not be sent via SMTP. The email was saved to sent_emails folder. Error: {error_msg[:100]}'
-        
-        messages.warning(request, f'Property {property_id} and owner registered successfully. {user_error} Password: {temp_password} (Check sent_emails folder for email content)')
+    queue_email(subject, message, [owner_email])
+    messages.success(request, f'Property {property_id} and owner registered successfully. Login credentials will be emailed to {owner_email} shortly. If not received, check spam folder or the fallback emails (resend_fallback_emails).')
     
     return redirect('admin_panel:provisioning_hub')
 
@@ -470,9 +412,6 @@ def add_student(request):
         messages.error(request, f'Student ID {student_id} already exists.')
         return redirect('admin_panel:provisioning_hub')
     
-    # Generate temporary password (8 uppercase letters)
-    temp_password = ''.join(secrets.choice(string.ascii_uppercase) for _ in range(8))
-    
     # Create user
     user, created = User.objects.get_or_create(
         username=student_email,
@@ -487,8 +426,8 @@ def add_student(request):
         messages.error(request, 'Email already registered.')
         return redirect('admin_panel:provisioning_hub')
     
-    # Set password
-    user.set_password(temp_password)
+    # The welcome job sets the temporary password and emails it
+    user.set_unusable_password()
     user.save()
     
     # Create profile
@@ -536,70 +475,13 @@ def add_student(request):
         except Property.DoesNotExist:
             messages.warning(request, f'Property {assigned_prop_id} not found. Student created without property assignment.')
     
-    # Send email with login credentials
-    try:
-        login_url = request.build_absolute_uri('/login/')
-        subject = f'Welcome to {profile.school.name} Boarding Hub System'
-        message = f'''Dear {student_name},
-
-Welcome to the {profile.school.name} Boarding Hub System!
-
-Your student account has been created successfully. Below are your login credentials:
-
-Student ID: {student_id}
-Email: {student_email}
-Password: {temp_password}
-
-IMPORTANT SECURITY NOTICE:
-- Please keep this password confidential and do not share it with anyone.
-- We recommend changing your password after your first login.
-- Never share your login credentials with others.
-
-You can now log in to the system using your email, student ID, or the password provided above.
-
-Login URL: {login_url}
-
-If you have any questions or need assistance, please contact the school administration.
-
-Best regards,
-{profile.school.name} Administration Team'''
-        
-        from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', settings.EMAIL_HOST_USER)
-        print(f"Attempting to send email to {student_email} from {from_email}")
-        print(f"SMTP Host: {settings.EMAIL_HOST}, Port: {settings.EMAIL_PORT}")
-        
-        send_mail(
-            subject,
-            message,
-            from_email,
-            [student_email],
-            fail_silently=False,
-        )
-        print(f"Email sent successfully to {student_email}")
-        messages.success(request, f'Student {student_id} enrolled successfully. Login credentials sent to {student_email}. If not received, check spam folder or sent_emails folder. Emails may take 1-5 minutes to arrive on phone.')
-    except Exception as e:
-        import traceback
-        error_msg = str(e)
-        error_type = type(e).__name__
-        full_traceback = traceback.format_exc()
-        
-        # Print detailed error to console
-        print("=" * 60)
-        print("EMAIL SENDING ERROR:")
-        print(f"Error Type: {error_type}")
-        print(f"Error Message: {error_msg}")
-        print(f"Full Traceback:\n{full_traceback}")
-        print("=" * 60)
-        
-        # Provide user-friendly error message
-        if "authentication failed" in str(e).lower() or "535" in str(e) or "534" in str(e):
-            user_error = f'⚠️ Email authentication failed! Gmail requires an App Password (not your regular password). The email was saved to sent_emails folder. Generate App Password at: https://myaccount.google.com/apppasswords'
-        elif "connection" in str(e).lower() or "timeout" in str(e).lower():
-            user_error = f'⚠️ Could not connect to email server. The email was saved to sent_emails folder. Check your internet connection.'
-        else:
-            user_error = f'⚠️ Email could not be sent via SMTP. The email was saved to sent_emails folder. Error: {error_msg[:100]}'
-        
-        messages.warning(request, f'Student {student_id} enrolled successfully. {user_error} Password: {temp_password} (Check sent_emails folder for email content)')
+    # Generate the password and send the login credentials in the background
+    job = enqueue(
+        send_student_welcome,
+        {'user_id': user.id, 'login_url': request.build_absolute_uri('/login/')},
+        user=request.user,
+    )
+    messages.success(request, f'Student {student_id} enrolled successfully. Login credentials will be emailed to {student_email} shortly (job #{job.id}). If not received, check spam folder or the fallback emails (resend_fallback_emails).')
     
     return redirect('admin_panel:provisioning_hub')
 
@@ -914,62 +796,66 @@ def survey_create(request):
             messages.error(request, 'Survey title is required.')
             return redirect('admin_panel:survey_create')
         
-        # Create or update survey
-        if survey_id:
-            survey = get_object_or_404(Survey, id=survey_id, school=profile.school)
-            survey.title = title
-            if category:
-                survey.category = category
-            survey.description = description
-            survey.status = status
-            survey.recipient_type = recipient_type
-            survey.require_property_info = require_property_info
-            survey.save()
-        else:
-            # Generate unique code
-            unique_code = f"SURV-{uuid.uuid4().hex[:8].upper()}"
-            while Survey.objects.filter(unique_code=unique_code).exists():
+        # One transaction, so the public page never sees the survey without
+        # its sections; saving the survey bumps its cached definition
+        # (core.survey_cache) once this commits
+        with transaction.atomic():
+            # Create or update survey
+            if survey_id:
+                survey = get_object_or_404(Survey, id=survey_id, school=profile.school)
+                survey.title = title
+                if category:
+                    survey.category = category
+                survey.description = description
+                survey.status = status
+                survey.recipient_type = recipient_type
+                survey.require_property_info = require_property_info
+                survey.save()
+            else:
+                # Generate unique code
                 unique_code = f"SURV-{uuid.uuid4().hex[:8].upper()}"
+                while Survey.objects.filter(unique_code=unique_code).exists():
+                    unique_code = f"SURV-{uuid.uuid4().hex[:8].upper()}"
             
-            survey = Survey.objects.create(
-                school=profile.school,
-                title=title,
-                category=category or 'Student Registration',
-                description=description,
-                status=status,
-                recipient_type=recipient_type,
-                unique_code=unique_code,
-                require_property_info=require_property_info,
-                created_by=request.user
-            )
+                survey = Survey.objects.create(
+                    school=profile.school,
+                    title=title,
+                    category=category or 'Student Registration',
+                    description=description,
+                    status=status,
+                    recipient_type=recipient_type,
+                    unique_code=unique_code,
+                    require_property_info=require_property_info,
+                    created_by=request.user
+                )
         
-        # Handle sections and questions
-        sections_data = json.loads(request.POST.get('sections', '[]'))
+            # Handle sections and questions
+            sections_data = json.loads(request.POST.get('sections', '[]'))
         
-        # Delete existing sections if editing
-        if survey_id:
-            survey.sections.all().delete()
+            # Delete existing sections if editing
+            if survey_id:
+                survey.sections.all().delete()
         
-        # Create sections and questions
-        for section_idx, section_data in enumerate(sections_data):
-            section = SurveySection.objects.create(
-                survey=survey,
-                title=section_data.get('title', f'Section {section_idx + 1}'),
-                color=section_data.get('color', '#818cf8'),
-                order=section_idx
-            )
-            
-            # Create questions
-            questions = section_data.get('questions', [])
-            for q_idx, question_data in enumerate(questions):
-                SurveyQuestion.objects.create(
-                    section=section,
-                    text=question_data.get('text', ''),
-                    question_type=question_data.get('type', 'text_short'),
-                    options=question_data.get('options', []),
-                    is_required=question_data.get('is_required', True),
-                    order=q_idx
+            # Create sections and questions
+            for section_idx, section_data in enumerate(sections_data):
+                section = SurveySection.objects.create(
+                    survey=survey,
+                    title=section_data.get('title', f'Section {section_idx + 1}'),
+                    color=section_data.get('color', '#818cf8'),
+                    order=section_idx
                 )
+            
+                # Create questions
+                questions = section_data.get('questions', [])
+                for q_idx, question_data in enumerate(questions):
+                    SurveyQuestion.objects.create(
+                        section=section,
+                        text=question_data.get('text', ''),
+                        question_type=question_data.get('type', 'text_short'),
+                        options=question_data.get('options', []),
+                        is_required=question_data.get('is_required', True),
+                        order=q_idx
+                    )
         
         if survey_id:
             messages.success(request, f'Survey "{survey.title}" updated successfully!')
@@ -1041,60 +927,34 @@ def survey_responses(request, survey_id):
         action = request.POST.get('bulk_action')
         selected = request.POST.getlist('selected')
         processed = 0
-        for rid in selected:
-            try:
-                resp = SurveyResponse.objects.get(id=int(rid), survey=survey)
-            except Exception:
-                continue
-
-            if action == 'approve' and resp.status != 'registered':
-                # Minimal approve flow: create user/profile/student and mark registered
-                temp_password = ''.join(secrets.choice(string.ascii_uppercase) for _ in range(8))
-                try:
-                    user, created = User.objects.get_or_create(
-                        username=resp.student_email,
-                        defaults={
-                            'email': resp.student_email,
-                            'first_name': resp.student_name.split()[0] if resp.student_name.split() else '',
-                            'last_name': ' '.join(resp.student_name.split()[1:]) if len(resp.student_name.split()) > 1 else '',
-                        }
-                    )
-                    user.set_password(temp_password)
-                    user.save()
-
-                    # Ensure profile
-                    try:
-                        prof = user.profile
-                        if prof.role != 'student':
-                            prof.role = 'student'
-                        if not prof.school:
-                            prof.school = profile.school
-                        prof.save()
-                    except UserProfile.DoesNotExist:
-                        UserProfile.objects.create(user=user, role='student', school=profile.school)
-
-                    # Create Student record if missing
-                    if not hasattr(user, 'student_profile'):
-                        Student.objects.create(
-                            user=user,
-                            student_id=resp.provided_student_id or f"S-{secrets.token_hex(4).upper()}",
-                            school=profile.school
-                        )
-                except Exception:
-                    pass
-
-                resp.status = 'registered'
-                resp.reviewed_by = request.user
-                resp.reviewed_at = timezone.now()
-                resp.save()
-                processed += 1
+        if action == 'approve':
+            # Account creation runs in the background (run_workers) and queues a
+            # welcome job per new student; the page polls the job for progress.
+            # One attempt only: a rerun would skip the rows already registered.
+            job = enqueue(
+                approve_survey_responses,
+                {
+                    'survey_id': survey.id,
+                    'response_ids': selected,
+                    'reviewer_id': request.user.id,
+                    'login_url': request.build_absolute_uri('/login/'),
+                },
+                user=request.user,
+                max_attempts=1,
+            )
+            messages.success(request, f'Approval of {len(selected)} response(s) started (job #{job.id}).')
+            return redirect(f"{reverse('admin_panel:survey_responses', args=[survey.id])}?job={job.id}")
 
-            elif action == 'reject' and resp.status != 'rejected':
-                resp.status = 'rejected'
-                resp.reviewed_by = request.user
-                resp.reviewed_at = timezone.now()
-                resp.save()
-                processed += 1
+        elif action == 'reject':
+            now = timezone.now()
+            chosen = SurveyResponse.objects.filter(
+                survey=survey, id__in=[rid for rid in selected if rid.isdigit()]
+            )
+            rejection = {'status': 'rejected', 'reviewed_by': request.user, 'reviewed_at': now, 'updated_at': now}
+            # Bulk updates send no signals: the pending ones leave the rollup count here
+            was_pending = chosen.filter(status='pending').update(**rejection)
+            processed = was_pending + chosen.exclude(status='rejected').update(**rejection)
+            apply_deltas(survey.school_id, {'pending_survey_responses': -was_pending})
 
         messages.success(request, f'{processed} response(s) processed.')
         return redirect('admin_panel:survey_responses', survey_id=survey.id)
@@ -1104,80 +964,72 @@ def survey_responses(request, survey_id):
     
     if show_trash:
         # Show only deleted responses
-        responses = SurveyResponse.objects.filter(survey=survey, deleted_at__isnull=False).order_by('-deleted_at')
+        responses = SurveyResponse.objects.filter(survey=survey, deleted_at__isnull=False).order_by('-deleted_at', '-id')
     else:
         # Show only non-deleted responses
-        responses = SurveyResponse.objects.filter(survey=survey, deleted_at__isnull=True).order_by('-created_at')
-    
-    # Calculate counts for each status (excluding deleted)
-    all_responses = survey.responses.filter(deleted_at__isnull=True)
-    all_count = all_responses.count()
-    pending_count = all_responses.filter(status='pending').count()
-    rejected_count = all_responses.filter(status='rejected').count()
-    registered_count = all_responses.filter(status='registered').count()
-    trash_count = survey.responses.filter(deleted_at__isnull=False).count()
+        responses = SurveyResponse.objects.filter(survey=survey, deleted_at__isnull=True).order_by('-created_at', '-id')
+    
+    # Calculate counts for each status (excluding deleted) in one aggregate
+    live = Q(deleted_at__isnull=True)
+    counts = survey.responses.aggregate(
+        all_count=Count('id', filter=live),
+        pending_count=Count('id', filter=live & Q(status='pending')),
+        rejected_count=Count('id', filter=live & Q(status='rejected')),
+        registered_count=Count('id', filter=live & Q(status='registered')),
+        trash_count=Count('id', filter=Q(deleted_at__isnull=False)),
+    )
     
     # Filter by status if provided (only if not viewing trash)
     status_filter = request.GET.get('status')
     if status_filter and not show_trash:
         responses = responses.filter(status=status_filter)
 
-    # Attach department/program display attributes for organization in template
-    for resp in responses:
-        dept_name = None
-        prog_name = None
-        try:
-            if resp.student and resp.student.department:
-                dept_name = resp.student.department.code or resp.student.department.name
-            elif resp.additional_data:
-                dept_id = resp.additional_data.get('department_id')
-                if dept_id:
-                    try:
-                        dept = Department.objects.filter(id=int(dept_id), school=profile.school).first()
-                        if dept:
-                            dept_name = dept.code or dept.name
-                    except Exception:
-                        pass
-
-            if resp.student and resp.student.program:
-                prog_name = resp.student.program.code or resp.student.program.name
-            elif resp.additional_data:
-                prog_id = resp.additional_data.get('program_id')
-                if prog_id:
-                    try:
-                        prog = Program.objects.filter(id=int(prog_id), department__school=profile.school).first()
-                        if prog:
-                            prog_name = prog.code or prog.name
-                    except Exception:
-                        pass
-        except Exception:
-            dept_name = None
-            prog_name = None
-
-        resp.dept_display = dept_name or '—'
-        resp.prog_display = prog_name or '—'
-    # Group responses by department -> program for easier UI rendering
+    paginator = Paginator(responses.select_related('student'), SURVEY_RESPONSES_PAGE_SIZE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_responses = list(page_obj)
+
+    # Department/program names for this page, one query each. A registered
+    # student's own department/program wins over the one picked on the survey.
+    dept_ids = set()
+    prog_ids = set()
+    for resp in page_responses:
+        resp.display_department_id = (resp.student and resp.student.department_id) or resp.department_id
+        resp.display_program_id = (resp.student and resp.student.program_id) or resp.program_id
+        dept_ids.add(resp.display_department_id)
+        prog_ids.add(resp.display_program_id)
+    dept_names = {
+        dept_id: code or name
+        for dept_id, code, name in Department.objects.filter(id__in=dept_ids - {None}).values_list('id', 'code', 'name')
+    }
+    prog_names = {
+        prog_id: code or name
+        for prog_id, code, name in Program.objects.filter(id__in=prog_ids - {None}).values_list('id', 'code', 'name')
+    }
+
+    # Group this page's responses by department -> program for easier UI rendering
     grouped_responses = OrderedDict()
-    for resp in responses:
-        dept = getattr(resp, 'dept_display', '—') or '—'
-        prog = getattr(resp, 'prog_display', '—') or '—'
-        if dept not in grouped_responses:
-            grouped_responses[dept] = OrderedDict()
-        if prog not in grouped_responses[dept]:
-            grouped_responses[dept][prog] = []
-        grouped_responses[dept][prog].append(resp)
+    for resp in page_responses:
+        resp.dept_display = dept_names.get(resp.display_department_id) or '—'
+        resp.prog_display = prog_names.get(resp.display_program_id) or '—'
+        grouped_responses.setdefault(resp.dept_display, OrderedDict()).setdefault(resp.prog_display, []).append(resp)
+
+    # Query string of the current filter, for the pagination links
+    if show_trash:
+        page_query = 'trash=1'
+    else:
+        page_query = urlencode({'status': status_filter}) if status_filter else ''
 
     context = {
         'survey': survey,
-        'responses': responses,
+        'responses': page_responses,
         'grouped_responses': grouped_responses,
+        'page_obj': page_obj,
+        'page_query': page_query,
+        # Background approval job to show progress for
+        'job_id': request.GET.get('job') if (request.GET.get('job') or '').isdigit() else None,
         'status_filter': status_filter,
         'show_trash': show_trash,
-        'all_count': all_count,
-        'pending_count': pending_count,
-        'rejected_count': rejected_count,
-        'registered_count': registered_count,
-        'trash_count': trash_count,
+        **counts,
     }
     
     return render(request, 'admin_panel/survey_responses.html', context)
@@ -1187,7 +1039,10 @@ def survey_responses(request, survey_id):
 def survey_response_detail(request, response_id):
     """View and review individual survey response"""
     profile = request.user.profile
-    response = get_object_or_404(SurveyResponse, id=response_id, survey__school=profile.school)
+    response = get_object_or_404(
+        SurveyResponse.objects.select_related('department', 'program'),
+        id=response_id, survey__school=profile.school,
+    )
     
     if request.method == 'POST':
         action = request.POST.get('action')
@@ -1261,36 +1116,9 @@ def survey_response_detail(request, response_id):
                 while Student.objects.filter(student_id=student_id_val).exists():
                     student_id_val = f"S-{secrets.token_hex(4).upper()}"
 
-                # STEP 2: Resolve department/program from response.additional_data if present
-                dept = None
-                prog = None
-                try:
-                    if response.additional_data:
-                        dept_id = response.additional_data.get('department_id')
-                        prog_id = response.additional_data.get('program_id')
-                        
-                        # Handle both string and integer IDs
-                        if dept_id:
-                            try:
-                                dept_id = int(dept_id)
-                            except (ValueError, TypeError):
-                                dept_id = None
-                            
-                            if dept_id:
-                                dept = Department.objects.filter(id=dept_id, school=profile.school).first()
-                        
-                        if prog_id:
-                            try:
-                                prog_id = int(prog_id)
-                            except (ValueError, TypeError):
-                                prog_id = None
-                            
-                            if prog_id:
-                                prog = Program.objects.filter(id=prog_id, department__school=profile.school).first()
-                except Exception as e:
-                    print(f"Warning: Failed to resolve department/program: {e}")
-                    dept = None
-                    prog = None
+                # STEP 2: Department/program picked on the survey
+                dept = response.department
+                prog = response.program
 
                 # STEP 3: Check if student already exists
                 try:
@@ -1406,37 +1234,11 @@ Best regards,
 {profile.school.name} Administration Team
 '''
 
-                    from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', settings.EMAIL_HOST_USER)
-                    print(f"\n{'='*60}")
-                    print(f"ATTEMPTING TO SEND APPROVAL CREDENTIALS EMAIL")
-                    print(f"{'='*60}")
-                    print(f"To: {response.student_email}")
-                    print(f"From: {from_email}")
-                    print(f"Subject: {subject}")
-                    print(f"{'='*60}\n")
-
-                    used_fallback, result, saved_file = send_email_with_feedback(
-                        subject,
-                        message,
-                        from_email,
-                        [response.student_email],
-                    )
-                    print(f"\n✓ send_email_with_feedback() returned: {result}; fallback={used_fallback}; saved_file={saved_file}")
-                    if used_fallback:
-                        extra = f" Email content saved to: {saved_file}." if saved_file else ''
-                        messages.warning(request, f'Response approved, but SMTP failed and the email was saved to the server (sent_emails). Please fix SMTP settings or manually forward the temporary password to {response.student_email}.{extra}')
-                    else:
-                        messages.success(request, f'Response approved. Login credentials have been sent to {response.student_email}. The student should check their inbox, spam folder, and wait 1-5 minutes for delivery.')
+                    queue_email(subject, message, [response.student_email])
+                    messages.success(request, f'Response approved. Login credentials will be emailed to {response.student_email} shortly. The student should check their inbox, spam folder, and wait 1-5 minutes for delivery.')
                 except Exception as e:
-                    import traceback
                     error_msg = str(e)
-                    error_trace = traceback.format_exc()
-                    print(f"\n{'='*60}")
-                    print(f"ERROR SENDING APPROVAL CREDENTIALS EMAIL")
-                    print(f"{'='*60}")
-                    print(f"Error: {error_msg}")
-                    print(f"Traceback:\n{error_trace}")
-                    print(f"{'='*60}\n")
+                    email_logger.exception('email.queue_failed', extra={'response_id': response.id, 'error_class': type(e).__name__})
                     messages.warning(request, f'Response approved, but email could not be sent. Error: {error_msg[:100]}. Please contact the student manually with the temporary password.')
             except Exception as e:
                 import traceback
@@ -1563,38 +1365,26 @@ def register_from_survey(request, response_id):
             except Program.DoesNotExist:
                 program = None
 
-        # If department/program not provided via form, fall back to any saved values in response.additional_data
-        if not department and response.additional_data:
-            dept_id = response.additional_data.get('department_id')
-            if dept_id:
-                try:
-                    department = Department.objects.get(id=dept_id, school=profile.school)
-                except Department.DoesNotExist:
-                    department = None
-        if not program and response.additional_data:
-            prog_id = response.additional_data.get('program_id')
-            if prog_id:
-                try:
-                    program = Program.objects.get(id=prog_id, department__school=profile.school)
-                except Program.DoesNotExist:
-                    program = None
+        # If department/program not provided via form, fall back to the ones picked on the survey
+        if not department:
+            department = response.department
+        if not program:
+            program = response.program
 
         # Ensure a User exists for this email (approval may have already created it)
         existing_user = User.objects.filter(username=response.student_email).first()
-        temp_password = None
         created_user = False
         if existing_user:
             user = existing_user
         else:
-            # Generate 8-character password and create user
-            temp_password = ''.join(secrets.choice(string.ascii_uppercase) for _ in range(8))
-            user = User.objects.create(
+            # The welcome job sets the temporary password and emails it
+            user = User(
                 username=response.student_email,
                 email=response.student_email,
                 first_name=response.student_name.split()[0] if response.student_name.split() else '',
                 last_name=' '.join(response.student_name.split()[1:]) if len(response.student_name.split()) > 1 else '',
             )
-            user.set_password(temp_password)
+            user.set_unusable_password()
             user.save()
             created_user = True
 
@@ -1636,51 +1426,14 @@ def register_from_survey(request, response_id):
         response.status = 'registered'
         response.save()
 
-        # Send email with login credentials if we just created the user here
-        if created_user and temp_password:
-            try:
-                login_url = request.build_absolute_uri('/login/')
-                subject = f'Welcome to {profile.school.name} Boarding Hub System'
-                message = f'''Dear {response.student_name},
-
-Welcome to the {profile.school.name} Boarding Hub System!
-
-Your account has been created successfully. Below are your login credentials:
-
-Student ID: {student_id}
-Email: {response.student_email}
-Password: {temp_password}
-
-IMPORTANT SECURITY NOTICE:
-- Please keep this password confidential and do not share it with anyone.
-- We recommend changing your password after your first login.
-- Never share your login credentials with others.
-
-You can now log in to the system using your email or student ID and the password provided above.
-
-Login URL: {login_url}
-
-If you have any questions or need assistance, please contact the school administration.
-
-Best regards,
-{profile.school.name} Administration Team'''
-
-                from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', settings.EMAIL_HOST_USER)
-                used_fallback, result, saved_file = send_email_with_feedback(
-                    subject,
-                    message,
-                    from_email,
-                    [response.student_email],
-                )
-                if used_fallback:
-                    extra = f" Email content saved to: {saved_file}." if saved_file else ''
-                    messages.warning(request, f'Student {student_id} registered successfully, but SMTP failed and the email was saved to sent_emails. Password: {temp_password}.{extra}')
-                else:
-                    messages.success(request, f'Student {student_id} registered successfully. Login credentials sent to {response.student_email}.')
-            except Exception as e:
-                import traceback
-                print(f"Email error: {traceback.format_exc()}")
-                messages.warning(request, f'Student {student_id} registered successfully, but email could not be sent. Password: {temp_password}')
+        # Send login credentials in the background if we just created the user here
+        if created_user:
+            job = enqueue(
+                send_student_welcome,
+                {'user_id': user.id, 'login_url': request.build_absolute_uri('/login/')},
+                user=request.user,
+            )
+            messages.success(request, f'Student {student_id} registered successfully. Login credentials will be emailed to {response.student_email} shortly (job #{job.id}).')
         else:
             messages.success(request, f'Student {student_id} registered successfully.')
 
@@ -1771,18 +1524,53 @@ def setup_password(request, token):
 
 # ==================== PUBLIC SURVEY VIEW (FOR STUDENTS) ====================
 
+def _match_by_name(candidates, answer):
+    """First of ``candidates`` (a Department or Program list in name order) whose name contains ``answer``, ignoring case"""
+    answer = answer.lower()
+    return next((candidate for candidate in candidates if answer in candidate.name.lower()), None)
+
+
+def _survey_answer(question, answer_value):
+    """Unsaved SurveyAnswer for one submitted answer, stored in the field its question type uses"""
+    if question.question_type == 'checkbox':
+        # Store as comma-separated string
+        answer_choice = ', '.join(answer_value) if isinstance(answer_value, list) else answer_value
+        return SurveyAnswer(question=question, answer_choice=answer_choice)
+    if question.question_type == 'multiple_choice':
+        return SurveyAnswer(question=question, answer_choice=answer_value)
+    if question.question_type == 'rating':
+        return SurveyAnswer(question=question, answer_rating=int(answer_value) if answer_value else None)
+    if question.question_type == 'date':
+        try:
+            return SurveyAnswer(question=question, answer_date=datetime.strptime(answer_value, '%Y-%m-%d').date())
+        except ValueError:
+            pass
+    return SurveyAnswer(question=question, answer_text=answer_value)
+
+
+def _render_survey_take(request, unique_code, survey_messages):
+    """Render the survey form from its compiled definition (core.survey_cache)"""
+    # Sections, questions and department/program choices come from the
+    # cache, so showing the form does not query the survey tables
+    definition = compiled_survey(unique_code)
+    if definition is None:
+        raise Http404('No active survey found for this link.')
+    return render(request, 'admin_panel/survey_take.html', {
+        'survey': definition,
+        'sections': definition['sections'],
+        'departments': definition['departments'],
+        'programs': definition['programs'],
+        'survey_messages': survey_messages,
+    })
+
+
 def survey_take(request, unique_code):
     """Public view for students to fill out survey"""
-    survey = get_object_or_404(Survey, unique_code=unique_code, status='active')
-    
-    # Get sections with questions
-    sections = survey.sections.all().prefetch_related('questions').order_by('order')
-    
     # Store survey-specific messages in context (not session)
     survey_messages = []
     
     if request.method == 'POST':
-        import json
+        survey = get_object_or_404(Survey, unique_code=unique_code, status='active')
         
         # Get form data
         student_name = request.POST.get('student_name', '').strip()
@@ -1793,20 +1581,17 @@ def survey_take(request, unique_code):
         # Validate required fields (student ID also required)
         if not all([student_name, student_email, provided_student_id]):
             survey_messages.append({'type': 'error', 'message': 'Name, student ID, and university email are required.'})
-            sections = survey.sections.all().prefetch_related('questions')
-            return render(request, 'admin_panel/survey_take.html', {'survey': survey, 'sections': sections, 'survey_messages': survey_messages})
+            return _render_survey_take(request, unique_code, survey_messages)
         
         # Basic email format check
         if '@' not in student_email:
             survey_messages.append({'type': 'error', 'message': 'Invalid email format.'})
-            sections = survey.sections.all().prefetch_related('questions')
-            return render(request, 'admin_panel/survey_take.html', {'survey': survey, 'sections': sections, 'survey_messages': survey_messages})
+            return _render_survey_take(request, unique_code, survey_messages)
         
         # Check if email already submitted for this survey
         if SurveyResponse.objects.filter(survey=survey, student_email=student_email).exists():
             survey_messages.append({'type': 'error', 'message': 'You have already submitted a response for this survey.'})
-            sections = survey.sections.all().prefetch_related('questions')
-            return render(request, 'admin_panel/survey_take.html', {'survey': survey, 'sections': sections, 'survey_messages': survey_messages})
+            return _render_survey_take(request, unique_code, survey_messages)
         
         # Get property owner information if required
     # property_id removed per request
@@ -1824,15 +1609,15 @@ def survey_take(request, unique_code):
             # At minimum require owner email or property name
             if not any([property_owner_email, property_name]):
                 survey_messages.append({'type': 'error', 'message': 'Please provide owner email or property name.'})
-                sections = survey.sections.all().prefetch_related('questions')
-                return render(request, 'admin_panel/survey_take.html', {'survey': survey, 'sections': sections, 'survey_messages': survey_messages})
+                return _render_survey_take(request, unique_code, survey_messages)
         
         # Create survey response
         additional_data = {}
         
-        # Get all answers
+        # Get all answers; the survey's questions are loaded once
+        questions = {question.id: question for question in SurveyQuestion.objects.filter(section__survey=survey)}
         answers_data = {}
-        for question in SurveyQuestion.objects.filter(section__survey=survey).select_related('section'):
+        for question in questions.values():
             answer_value = request.POST.get(f'question_{question.id}')
             
             if question.question_type == 'checkbox':
@@ -1847,16 +1632,12 @@ def survey_take(request, unique_code):
         additional_data['answers'] = answers_data
         if provided_student_id:
             additional_data['student_id'] = provided_student_id
-        if department_id:
-            try:
-                additional_data['department_id'] = int(department_id)
-            except (ValueError, TypeError):
-                pass
-        if program_id:
-            try:
-                additional_data['program_id'] = int(program_id)
-            except (ValueError, TypeError):
-                pass
+        department = None
+        program = None
+        if department_id.isdigit():
+            department = Department.objects.filter(id=department_id, school_id=survey.school_id).first()
+        if program_id.isdigit():
+            program = Program.objects.filter(id=program_id, department__school_id=survey.school_id).first()
         if property_owner_email:
             additional_data['property_owner_email'] = property_owner_email
         # property_id no longer stored
@@ -1869,99 +1650,49 @@ def survey_take(request, unique_code):
         if property_address:
             additional_data['property_address'] = property_address
         
-        # Try to extract department/program from answers if available
+        # Try to extract department/program from answers if available; the
+        # school's departments/programs are loaded once and matched by name
+        school_departments = school_programs = None
         for q_id, answer in answers_data.items():
-            question = SurveyQuestion.objects.get(id=q_id)
-            if 'department' in question.text.lower() and isinstance(answer, str):
-                try:
-                    dept = Department.objects.filter(name__icontains=answer, school=survey.school).first()
-                    if dept:
-                        additional_data['department_id'] = dept.id
-                except:
-                    pass
-            if 'program' in question.text.lower() and isinstance(answer, str):
-                try:
-                    prog = Program.objects.filter(name__icontains=answer, department__school=survey.school).first()
-                    if prog:
-                        additional_data['program_id'] = prog.id
-                except:
-                    pass
-        
-        # Create response
-        response = SurveyResponse.objects.create(
-            survey=survey,
-            student_name=student_name,
-            student_email=student_email,
-            student_phone=student_phone,
-            provided_student_id=provided_student_id,
-            additional_data=additional_data,
-            status='pending'
-        )
-        
-        # Create answers
-        for q_id, answer_value in answers_data.items():
-            question = SurveyQuestion.objects.get(id=q_id)
-            
-            if question.question_type == 'checkbox':
-                # Store as comma-separated string
-                answer_choice = ', '.join(answer_value) if isinstance(answer_value, list) else answer_value
-                SurveyAnswer.objects.create(
-                    response=response,
-                    question=question,
-                    answer_choice=answer_choice
-                )
-            elif question.question_type == 'multiple_choice':
-                SurveyAnswer.objects.create(
-                    response=response,
-                    question=question,
-                    answer_choice=answer_value
-                )
-            elif question.question_type == 'rating':
-                SurveyAnswer.objects.create(
-                    response=response,
-                    question=question,
-                    answer_rating=int(answer_value) if answer_value else None
-                )
-            elif question.question_type == 'date':
-                from datetime import datetime
-                try:
-                    date_obj = datetime.strptime(answer_value, '%Y-%m-%d').date()
-                    SurveyAnswer.objects.create(
-                        response=response,
-                        question=question,
-                        answer_date=date_obj
-                    )
-                except:
-                    SurveyAnswer.objects.create(
-                        response=response,
-                        question=question,
-                        answer_text=answer_value
-                    )
-            else:
-                SurveyAnswer.objects.create(
-                    response=response,
-                    question=question,
-                    answer_text=answer_value
-                )
+            text = questions[q_id].text.lower()
+            if not isinstance(answer, str) or not answer:
+                continue
+            if 'department' in text:
+                if school_departments is None:
+                    school_departments = list(Department.objects.filter(school_id=survey.school_id).order_by('name'))
+                department = _match_by_name(school_departments, answer) or department
+            if 'program' in text:
+                if school_programs is None:
+                    school_programs = list(Program.objects.filter(department__school_id=survey.school_id).order_by('name'))
+                program = _match_by_name(school_programs, answer) or program
+        
+        answers = [
+            _survey_answer(questions[q_id], answer_value)
+            for q_id, answer_value in answers_data.items()
+        ]
+        
+        # Create the response and all of its answers together
+        with transaction.atomic():
+            response = SurveyResponse.objects.create(
+                survey=survey,
+                student_name=student_name,
+                student_email=student_email,
+                student_phone=student_phone,
+                provided_student_id=provided_student_id,
+                additional_data=additional_data,
+                department=department,
+                program=program,
+                status='pending'
+            )
+            for answer in answers:
+                answer.response = response
+            SurveyAnswer.objects.bulk_create(answers)
         
         # Success - redirect to success page (no messages in session)
         return render(request, 'admin_panel/survey_success.html', {'survey': survey, 'response': response})
     
     # GET request - show survey form
-    sections = survey.sections.all().prefetch_related('questions')
-    # Provide department/program options for the form
-    departments = Department.objects.filter(school=survey.school, is_active=True).order_by('name')
-    programs = Program.objects.filter(department__school=survey.school, is_active=True).select_related('department').order_by('name')
-
-    context = {
-        'survey': survey,
-        'sections': sections,
-        'survey_messages': survey_messages,
-        'departments': departments,
-        'programs': programs,
-    }
-    
-    return render(request, 'admin_panel/survey_take.html', context)
+    return _render_survey_take(request, unique_code, survey_messages)
 
 
 @school_admin_required
@@ -1996,3 +1727,11 @@ def delete_student(request, student_id):
     return render(request, 'admin_panel/confirm_delete_student.html', {'student': student})
 
 
+
+
+@school_admin_required
+@require_GET
+def job_progress(request, job_id):
+    """Progress of a background job started by this admin (polled as JSON)"""
+    job = get_object_or_404(Job, id=job_id, created_by=request.user)
+    return JsonResponse(job_status(job))
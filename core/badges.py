@@ -0,0 +1,63 @@
+# core app badges.py
+
+"""Per-user unread counters for the navbar badge.
+
+The counts live in the shared cache (CACHES in settings.py) so
+``api/unread-badge/`` can be polled for one cache read instead of counting
+messages and requests. Message totals are written by the messenger whenever
+they change (send, delete, read; see core.messaging), notification totals
+are dropped by core.signals when a maintenance request changes and
+recomputed on the next read. A missing key is recomputed from the database,
+and the timeout bounds how long a write that bypassed those paths (bulk
+updates, shell fixes) can leave a badge wrong.
+"""
+
+from django.core.cache import cache
+
+BADGE_TIMEOUT = 60 * 60
+
+
+def _messages_key(user_id):
+    return f"core:badge:messages:{user_id}"
+
+
+def _notifications_key(user_id):
+    return f"core:badge:notifications:{user_id}"
+
+
+def pending_notifications(user):
+    """Pending maintenance requests on the user's properties (the notifications feed)."""
+    from .models import MaintenanceRequest
+
+    return MaintenanceRequest.objects.filter(property__owner=user, status="pending").count()
+
+
+def set_unread_messages(user_id, total):
+    cache.set(_messages_key(user_id), total, BADGE_TIMEOUT)
+
+
+def forget_notifications(user_id):
+    cache.delete(_notifications_key(user_id))
+
+
+def get_badge_counts(user):
+    """``{"unread_messages", "unread_notifications"}`` for ``user``."""
+    from .messaging import unread_total
+
+    keys = {
+        "unread_messages": _messages_key(user.id),
+        "unread_notifications": _notifications_key(user.id),
+    }
+    cached = cache.get_many(keys.values())
+    counts = {name: cached.get(key) for name, key in keys.items()}
+
+    missing = {}
+    if counts["unread_messages"] is None:
+        counts["unread_messages"] = missing[keys["unread_messages"]] = unread_total(user)
+    if counts["unread_notifications"] is None:
+        counts["unread_notifications"] = missing[keys["unread_notifications"]] = (
+            pending_notifications(user)
+        )
+    if missing:
+        cache.set_many(missing, BADGE_TIMEOUT)
+    return counts
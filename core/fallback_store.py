@@ -0,0 +1,191 @@
+# core app fallback_store.py
+
+"""Store for emails that could not be delivered over SMTP.
+
+Undeliverable messages used to be written one file each into
+``sent_emails/``, and finding the one just saved meant globbing and
+sorting the whole directory. They are now FallbackEmail rows, unique on
+their Message-ID, holding the exact MIME bytes. :func:`resend` replays
+them over one SMTP connection (``resend_fallback_emails`` command);
+:func:`import_legacy_files` and :func:`purge_resent` keep the store small
+(``compact_fallback_emails`` command).
+"""
+
+import email
+import logging
+import re
+import smtplib
+import time
+from datetime import timedelta
+from email.utils import getaddresses, make_msgid, parseaddr
+from pathlib import Path
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.message import sanitize_address
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger("core.email")
+
+RESEND_BATCH_SIZE = 100
+# Resent messages are kept this long before compaction removes them
+KEEP_RESENT_DAYS = 30
+SMTP_TIMEOUT = 30
+DEFAULT_RESEND_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# What Django's file backend writes after each message
+LEGACY_SEPARATOR = b"\n" + b"-" * 79 + b"\n"
+# Errors that only concern one message; the connection is still usable
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def legacy_dir():
+    return Path(settings.BASE_DIR) / "sent_emails"
+
+
+def store_message(message, error=None, outbox=None):
+    """Save an undeliverable EmailMessage; returns its FallbackEmail row.
+
+    Saving the same message (by Message-ID) twice returns the first row.
+    """
+    from .models import FallbackEmail
+
+    mime = message.message()
+    encoding = message.encoding or settings.DEFAULT_CHARSET
+    stored, _ = FallbackEmail.objects.get_or_create(
+        message_id=mime["Message-ID"],
+        defaults={
+            "outbox": outbox,
+            "subject": str(message.subject)[:255],
+            "from_email": sanitize_address(message.from_email, encoding),
+            "recipients": [sanitize_address(addr, encoding) for addr in message.recipients()],
+            # Same bytes the SMTP backend would have sent
+            "raw": mime.as_bytes(linesep="\r\n"),
+            "error_class": type(error).__name__ if error else "",
+        },
+    )
+    return stored
+
+
+def import_legacy_files(directory=None, dry_run=False):
+    """Move messages from old ``sent_emails/*.log`` files into the store.
+
+    Each imported file is deleted. Returns ``(files, messages)`` counts.
+    """
+    from .models import FallbackEmail
+
+    directory = Path(directory or legacy_dir())
+    if not directory.is_dir():
+        return 0, 0
+    files = messages = 0
+    for path in sorted(directory.glob("*.log")):
+        rows = []
+        for index, chunk in enumerate(path.read_bytes().split(LEGACY_SEPARATOR)):
+            if not chunk.strip():
+                continue
+            raw = re.sub(rb"\r?\n", b"\r\n", chunk.lstrip(b"\r\n"))
+            parsed = email.message_from_bytes(raw)
+            rows.append(FallbackEmail(
+                message_id=parsed["Message-ID"] or make_msgid(f"{path.stem}.{index}"),
+                subject=str(parsed["Subject"] or "").replace("\r\n", "")[:255],
+                from_email=parseaddr(parsed["From"] or "")[1] or settings.DEFAULT_FROM_EMAIL,
+                recipients=[
+                    addr for _, addr in getaddresses(parsed.get_all("To", []) + parsed.get_all("Cc", []))
+                    if addr
+                ],
+                raw=raw,
+                error_class="legacy",
+            ))
+        if not dry_run:
+            # Message-IDs already imported are skipped, so a rerun is harmless
+            FallbackEmail.objects.bulk_create(rows, ignore_conflicts=True)
+            path.unlink()
+        files += 1
+        messages += len(rows)
+    return files, messages
+
+
+def purge_resent(keep_days=KEEP_RESENT_DAYS, dry_run=False):
+    """Delete messages resent more than ``keep_days`` ago; returns how many."""
+    from .models import FallbackEmail
+
+    stale = FallbackEmail.objects.filter(resent_at__lt=timezone.now() - timedelta(days=keep_days))
+    if dry_run:
+        return stale.count()
+    return stale.delete()[0]
+
+
+def pending(ids=None):
+    """Stored messages not resent yet, oldest first."""
+    from .models import FallbackEmail
+
+    queryset = FallbackEmail.objects.filter(resent_at__isnull=True).order_by("id")
+    if ids:
+        queryset = queryset.filter(id__in=ids)
+    return queryset
+
+
+def resend(messages, connection=None):
+    """Replay stored messages over one SMTP connection.
+
+    A message the server refuses is left in the store with its error; any
+    other failure reconnects for the rest. Returns a dict counting the
+    messages ``sent`` and ``failed``.
+    """
+    from .models import FallbackEmail
+
+    counts = {"sent": 0, "failed": 0}
+    pending_messages = list(messages)
+    if not pending_messages:
+        return counts
+    if connection is None:
+        backend = getattr(settings, "EMAIL_RESEND_BACKEND", DEFAULT_RESEND_BACKEND)
+        connection = get_connection(backend, fail_silently=False, timeout=SMTP_TIMEOUT)
+
+    started = time.monotonic()
+    connects = 0
+    try:
+        while pending_messages:
+            try:
+                connection.open()
+            except Exception as error:
+                logger.warning("email.connect_failed", extra={
+                    "messages": len(pending_messages),
+                    "error_class": type(error).__name__,
+                })
+                break
+            connects += 1
+            while pending_messages:
+                stored = pending_messages.pop(0)
+                try:
+                    connection.connection.sendmail(stored.from_email, stored.recipients, bytes(stored.raw))
+                except Exception as error:
+                    counts["failed"] += 1
+                    FallbackEmail.objects.filter(id=stored.id).update(
+                        resend_attempts=F("resend_attempts") + 1,
+                        last_error=f"{type(error).__name__}: {error}",
+                    )
+                    logger.warning("email.resend_failed", extra={
+                        "fallback_id": stored.id,
+                        "recipients": len(stored.recipients),
+                        "error_class": type(error).__name__,
+                    })
+                    if not isinstance(error, MESSAGE_ERRORS):
+                        connection.close()
+                        break
+                    continue
+                counts["sent"] += 1
+                FallbackEmail.objects.filter(id=stored.id).update(
+                    resent_at=timezone.now(),
+                    resend_attempts=F("resend_attempts") + 1,
+                    last_error="",
+                )
+    finally:
+        connection.close()
+    logger.info("email.resend_batch", extra={
+        **counts,
+        "messages": counts["sent"] + counts["failed"],
+        "connections": connects,
+        "duration_ms": round((time.monotonic() - started) * 1000, 1),
+    })
+    return counts
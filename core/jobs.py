@@ -0,0 +1,189 @@
+# core app jobs.py
+
+"""A small database-backed job queue for slow admin work.
+
+Views :func:`enqueue` a task (any importable function) and return the job
+id at once; the ``run_workers`` management command claims queued jobs and
+runs them as ``task(job, **payload)``. A task reports progress with
+:func:`set_progress` and returns a JSON-serializable result.
+
+Claiming is one conditional UPDATE, so it works without row locks (and on
+SQLite). A claimed job is hidden from other workers for a visibility
+timeout, which :func:`set_progress` extends while the task reports
+progress; if its worker dies, the job becomes claimable again once the
+timeout passes, or is marked failed if it has no attempts left. Failed
+jobs are retried with exponential backoff until ``max_attempts`` is
+reached.
+"""
+
+import traceback
+from datetime import timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+# Seconds a claimed job stays hidden from other workers
+VISIBILITY_TIMEOUT = 300
+# Retry n waits RETRY_BASE_DELAY * 2 ** (n - 1) seconds, capped
+RETRY_BASE_DELAY = 10
+RETRY_MAX_DELAY = 3600
+
+
+def task_path(task):
+    return task if isinstance(task, str) else f"{task.__module__}.{task.__qualname__}"
+
+
+def enqueue(task, payload=None, user=None, max_attempts=3):
+    """Queue ``task`` (a function or its dotted path); returns the Job."""
+    from .models import Job
+
+    return Job.objects.create(
+        task=task_path(task),
+        payload=payload or {},
+        created_by=user,
+        max_attempts=max_attempts,
+    )
+
+
+def enqueue_many(task, payloads, user=None, max_attempts=3):
+    """Queue ``task`` once per payload with one INSERT; returns the Jobs."""
+    from .models import Job
+
+    return Job.objects.bulk_create([
+        Job(task=task_path(task), payload=payload, created_by=user, max_attempts=max_attempts)
+        for payload in payloads
+    ])
+
+
+def fail_abandoned(now=None):
+    """Mark jobs whose worker vanished on their last attempt as failed; returns how many."""
+    from .models import Job
+
+    now = now or timezone.now()
+    return Job.objects.filter(
+        status="running", locked_until__lt=now, attempts__gte=F("max_attempts")
+    ).update(
+        status="failed",
+        error="The worker running this job stopped before it finished.",
+        locked_by="",
+        locked_until=None,
+        finished_at=now,
+        updated_at=now,
+    )
+
+
+def claim_job(worker_id, visibility_timeout=VISIBILITY_TIMEOUT):
+    """Claim the oldest runnable job for ``worker_id``; returns it or None."""
+    from .models import Job
+
+    fail_abandoned()
+    while True:
+        now = timezone.now()
+        candidate = (
+            Job.objects.filter(
+                Q(status="queued", run_after__lte=now)
+                | Q(status="running", locked_until__lt=now, attempts__lt=F("max_attempts"))
+            )
+            .order_by("id")
+            .values("id", "status", "locked_until")
+            .first()
+        )
+        if candidate is None:
+            return None
+        # Only one worker's UPDATE can still match the row as it was read
+        claimed = Job.objects.filter(
+            id=candidate["id"],
+            status=candidate["status"],
+            locked_until=candidate["locked_until"],
+        ).update(
+            status="running",
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=visibility_timeout),
+            attempts=F("attempts") + 1,
+            updated_at=now,
+        )
+        if claimed:
+            job = Job.objects.get(id=candidate["id"])
+            job.visibility_timeout = visibility_timeout
+            return job
+
+
+def set_progress(job, done, total=None):
+    """Record ``done`` (of ``total``) steps of a running job.
+
+    Also extends the job's claim, so a long task that keeps reporting
+    progress is not taken over by another worker.
+    """
+    from .models import Job
+
+    now = timezone.now()
+    job.progress_done = done
+    job.locked_until = now + timedelta(seconds=getattr(job, "visibility_timeout", VISIBILITY_TIMEOUT))
+    fields = {"progress_done": done, "locked_until": job.locked_until, "updated_at": now}
+    if total is not None:
+        job.progress_total = total
+        fields["progress_total"] = total
+    Job.objects.filter(id=job.id, status="running", locked_by=job.locked_by).update(**fields)
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0), RETRY_MAX_DELAY)
+
+
+def run_job(job):
+    """Run a claimed job and record its outcome; returns the updated Job.
+
+    The outcome is only stored while ``job`` is still claimed by this
+    worker: if the visibility timeout ran out and another worker took the
+    job over, that worker's run is the one recorded.
+    """
+    from .models import Job
+
+    worker_id = job.locked_by
+    try:
+        result = import_string(job.task)(job, **job.payload)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = "queued"
+            job.run_after = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+        else:
+            job.status = "failed"
+            job.finished_at = timezone.now()
+    else:
+        job.status = "succeeded"
+        job.result = result
+        job.error = ""
+        job.finished_at = timezone.now()
+        if job.progress_done < job.progress_total:
+            job.progress_done = job.progress_total
+    job.locked_until = None
+    job.locked_by = ""
+    job.updated_at = timezone.now()
+    Job.objects.filter(id=job.id, status="running", locked_by=worker_id).update(
+        status=job.status,
+        result=job.result,
+        error=job.error,
+        run_after=job.run_after,
+        locked_until=None,
+        locked_by="",
+        progress_done=job.progress_done,
+        finished_at=job.finished_at,
+        updated_at=job.updated_at,
+    )
+    return job
+
+
+def job_status(job):
+    """The JSON shape of ``job`` served to progress-polling clients."""
+    return {
+        "id": job.id,
+        "status": job.status,
+        "done": job.progress_done,
+        "total": job.progress_total,
+        "attempts": job.attempts,
+        "result": job.result if job.status == "succeeded" else None,
+        "error": job.error.strip().splitlines()[-1] if job.error else "",
+        "finished": job.status in ("succeeded", "failed"),
+    }
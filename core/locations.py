@@ -0,0 +1,163 @@
+# core app locations.py
+
+"""Parsing of free-form post locations into structured columns.
+
+Posts arrive with a location that may be a dict, a JSON/Python-literal dict
+string, or an already formatted ``"province, city, barangay, address"``
+string. ``split_location`` turns any of these into the display string stored
+in ``Post.location`` plus the indexed ``region``/``province``/``city``/
+``barangay`` columns used by the community feed filters.
+"""
+
+import ast
+import json
+
+CARAGA_REGION = "Caraga"
+
+CARAGA_PROVINCES = (
+    "Agusan del Norte",
+    "Agusan del Sur",
+    "Dinagat Islands",
+    "Surigao del Norte",
+    "Surigao del Sur",
+)
+
+LOCATION_COLUMNS = ("region", "province", "city", "barangay")
+
+_PROVINCE_LOOKUP = {name.lower(): name for name in CARAGA_PROVINCES}
+
+# Joining words kept lowercase in place names, as in "Agusan del Norte"
+_LOWERCASE_WORDS = frozenset({"de", "del", "dela", "la", "las", "los", "ng", "sa"})
+
+
+def _clean(value):
+    return str(value or "").strip()
+
+
+def _name_case(value):
+    """Canonical casing of a city or barangay name.
+
+    "BUTUAN city" and "Butuan City" are stored alike, so the feed filters
+    see one spelling per place.
+    """
+    words = []
+    for index, word in enumerate(value.split()):
+        lowered = word.lower()
+        if index and lowered in _LOWERCASE_WORDS:
+            words.append(lowered)
+        else:
+            words.append(lowered[:1].upper() + lowered[1:])
+    return " ".join(words)
+
+
+def _strip_barangay_prefix(value):
+    for prefix in ("brgy.", "brgy", "barangay"):
+        if value.lower().startswith(prefix + " "):
+            return value[len(prefix) :].strip()
+    return value
+
+
+def load_location_dict(value):
+    """Return ``value`` as a dict if it is (or encodes) one, else ``None``."""
+    if isinstance(value, dict):
+        return value
+    if not isinstance(value, str):
+        return None
+    stripped = value.strip()
+    # Only dict-shaped strings are worth parsing
+    if not stripped.startswith("{"):
+        return None
+    try:
+        loaded = json.loads(stripped)
+    except ValueError:
+        try:
+            loaded = ast.literal_eval(stripped)
+        except (ValueError, SyntaxError):
+            return None
+    return loaded if isinstance(loaded, dict) else None
+
+
+def format_location_parts(parts):
+    """Format a location dict as ``"province, city, barangay, address"``."""
+    values = [
+        parts.get("province") or parts.get("state") or "",
+        parts.get("city") or "",
+        parts.get("barangay") or "",
+        parts.get("address") or parts.get("display_name") or "",
+    ]
+    return ", ".join([_clean(v) for v in values if _clean(v)])
+
+
+def _columns_from_dict(parts):
+    columns = {
+        "region": _clean(parts.get("region")),
+        "province": _clean(parts.get("province") or parts.get("state")),
+        "city": _clean(parts.get("city")),
+        "barangay": _strip_barangay_prefix(_clean(parts.get("barangay"))),
+    }
+    return columns
+
+
+def _columns_from_string(text):
+    """Best-effort split of a formatted location string.
+
+    Recognises ``[region, ]province, city, [Brgy. ]barangay[, address]`` when
+    the province is a known Caraga province; anything else only yields a
+    region if it mentions Caraga.
+    """
+    columns = dict.fromkeys(LOCATION_COLUMNS, "")
+    parts = [p.strip() for p in text.split(",") if p.strip()]
+    for index, part in enumerate(parts):
+        province = _PROVINCE_LOOKUP.get(part.lower())
+        if province:
+            columns["province"] = province
+            if index + 1 < len(parts):
+                columns["city"] = parts[index + 1]
+            if index + 2 < len(parts):
+                columns["barangay"] = _strip_barangay_prefix(parts[index + 2])
+            break
+    if "caraga" in text.lower():
+        columns["region"] = CARAGA_REGION
+    return columns
+
+
+def split_location(value):
+    """Return ``(display, columns)`` for a raw post location.
+
+    ``display`` is the single-line string stored in ``Post.location`` and
+    ``columns`` maps each name in ``LOCATION_COLUMNS`` to its value ("" when
+    unknown), with province, city and barangay names in canonical case.
+    """
+    parts = load_location_dict(value)
+    if parts is not None:
+        display = format_location_parts(parts)
+        columns = _columns_from_dict(parts)
+    else:
+        display = _clean(value)
+        columns = _columns_from_string(display)
+
+    if columns["region"] and "caraga" in columns["region"].lower():
+        columns["region"] = CARAGA_REGION
+    province = _PROVINCE_LOOKUP.get(columns["province"].lower())
+    if province:
+        columns["province"] = province
+        columns["region"] = columns["region"] or CARAGA_REGION
+    else:
+        columns["province"] = _name_case(columns["province"])
+    columns["city"] = _name_case(columns["city"])
+    columns["barangay"] = _name_case(columns["barangay"])
+    return display, columns
+
+
+def canonical_column_value(column, value):
+    """``value`` the way :func:`split_location` stores it in ``column``.
+
+    Lets filters match the stored columns exactly (and so use their
+    indexes) whatever case the user typed.
+    """
+    value = _clean(value)
+    if column == "province":
+        return _PROVINCE_LOOKUP.get(value.lower()) or _name_case(value)
+    if column == "barangay":
+        value = _strip_barangay_prefix(value)
+    return _name_case(value)
@@ -0,0 +1,76 @@
+# core app logging_handlers.py
+
+"""Log handlers for structured, non-blocking logging.
+
+:class:`JSONFormatter` renders a record and the fields passed through
+``extra=`` as one JSON object per line, so the output can be parsed.
+:class:`QueuedHandler` only puts records on an in-memory queue; a
+background thread formats and writes them, so a slow stream never holds
+up the request thread. Both are wired up in ``LOGGING`` (settings.py) for
+the ``core.email`` delivery channel.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else came in through ``extra=``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class QueuedHandler(logging.handlers.QueueHandler):
+    """Queue records for a background thread that writes them to ``stream``.
+
+    Records are formatted with :class:`JSONFormatter` on the writer thread.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        target = logging.StreamHandler(stream)
+        target.setFormatter(JSONFormatter())
+        self.listener = logging.handlers.QueueListener(self.queue, target)
+        self.listener.start()
+        self._stopped = False
+        atexit.register(self.stop)
+
+    def prepare(self, record):
+        # Keep ``extra`` fields and exception info for the JSON formatter;
+        # only resolve the message now, while its arguments are current.
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def stop(self):
+        """Write out everything queued so far and stop the writer thread."""
+        if not self._stopped:
+            self._stopped = True
+            self.listener.stop()
+
+    def close(self):
+        self.stop()
+        super().close()
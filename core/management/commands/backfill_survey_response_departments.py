@@ -0,0 +1,104 @@
+"""
+Management command to fill SurveyResponse.department/program from the
+department_id/program_id that survey_take used to keep in additional_data.
+Ids that no longer exist, or that belong to another school, are left unset.
+Safe to run more than once: only responses still missing a department or
+program are visited.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from core.models import Department, Program, SurveyResponse
+from core.stats import refresh_school_stats
+
+
+def _json_id(data, key):
+    """The integer id stored under ``key`` (as a number or a string), or None."""
+    try:
+        return int(data.get(key))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Backfill survey response department/program columns from additional_data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of responses to read and update per batch (default: 500)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many responses would change without saving them',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        dry_run = options['dry_run']
+
+        pending = (
+            SurveyResponse.objects.filter(Q(department__isnull=True) | Q(program__isnull=True))
+            .filter(
+                Q(additional_data__has_key='department_id')
+                | Q(additional_data__has_key='program_id')
+            )
+            .only('id', 'survey__school_id', 'additional_data', 'department_id', 'program_id')
+            .select_related('survey')
+            .order_by('id')
+        )
+
+        last_id = 0
+        scanned = updated = 0
+        schools = set()
+        while True:
+            chunk = list(pending.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            scanned += len(chunk)
+
+            wanted_depts = {_json_id(r.additional_data, 'department_id') for r in chunk}
+            wanted_progs = {_json_id(r.additional_data, 'program_id') for r in chunk}
+            dept_schools = dict(
+                Department.objects.filter(id__in=wanted_depts - {None})
+                .values_list('id', 'school_id')
+            )
+            prog_schools = dict(
+                Program.objects.filter(id__in=wanted_progs - {None})
+                .values_list('id', 'department__school_id')
+            )
+
+            changed = []
+            for response in chunk:
+                school_id = response.survey.school_id
+                dirty = False
+                dept_id = _json_id(response.additional_data, 'department_id')
+                if response.department_id is None and dept_schools.get(dept_id) == school_id:
+                    response.department_id = dept_id
+                    dirty = True
+                prog_id = _json_id(response.additional_data, 'program_id')
+                if response.program_id is None and prog_schools.get(prog_id) == school_id:
+                    response.program_id = prog_id
+                    dirty = True
+                if dirty:
+                    changed.append(response)
+                    schools.add(school_id)
+
+            if changed and not dry_run:
+                with transaction.atomic():
+                    SurveyResponse.objects.bulk_update(changed, ['department', 'program'])
+            updated += len(changed)
+
+        if not dry_run:
+            # bulk_update sends no signals; recount the dashboards it touched
+            for school_id in schools:
+                refresh_school_stats(school_id)
+
+        verb = 'Would update' if dry_run else 'Updated'
+        self.stdout.write(
+            self.style.SUCCESS(f'{verb} {updated} of {scanned} survey response(s).')
+        )
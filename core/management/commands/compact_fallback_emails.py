@@ -0,0 +1,35 @@
+"""
+Management command to keep the fallback email store (core.fallback_store)
+small: imports any old one-file-per-message sent_emails/*.log files into the
+store (deleting the files) and removes messages that were resent more than
+--keep-days ago.
+"""
+from django.core.management.base import BaseCommand
+from core.fallback_store import KEEP_RESENT_DAYS, import_legacy_files, purge_resent
+
+
+class Command(BaseCommand):
+    help = 'Import legacy sent_emails files and purge resent fallback emails'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=KEEP_RESENT_DAYS,
+            help=f'Days to keep messages after they were resent (default: {KEEP_RESENT_DAYS})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without writing anything',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        files, imported = import_legacy_files(dry_run=dry_run)
+        purged = purge_resent(max(0, options['keep_days']), dry_run=dry_run)
+        prefix = '[dry run] ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}Imported {imported} message(s) from {files} legacy file(s); '
+            f'purged {purged} resent message(s).'
+        ))
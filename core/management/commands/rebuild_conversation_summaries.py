@@ -0,0 +1,36 @@
+"""
+Management command to recompute the denormalized summary fields of messenger
+conversations (last message, preview, sender and per-participant unread
+counters). api_send_message/api_delete_message keep them current; run this
+after bulk imports, manual data fixes or restores.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.messaging import summary_expressions
+from core.models import Conversation
+
+
+class Command(BaseCommand):
+    help = 'Recompute last-message and unread-count summaries on all conversations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of conversations to rebuild per UPDATE (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        ids = list(Conversation.objects.order_by('id').values_list('id', flat=True))
+
+        for start in range(0, len(ids), chunk_size):
+            with transaction.atomic():
+                Conversation.objects.filter(
+                    id__in=ids[start:start + chunk_size]
+                ).update(**summary_expressions())
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt summaries of {len(ids)} conversation(s).')
+        )
@@ -0,0 +1,73 @@
+"""
+Management command to replay emails from the fallback store
+(core.fallback_store) once SMTP works again. Messages are sent in batches,
+each over one SMTP connection; refused messages stay in the store with their
+error so a later run can retry them.
+"""
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from core.fallback_store import RESEND_BATCH_SIZE, pending, resend
+
+
+class Command(BaseCommand):
+    help = 'Resend stored fallback emails over pooled SMTP connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'ids',
+            nargs='*',
+            type=int,
+            help='Only resend these FallbackEmail ids (default: every pending message)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=RESEND_BATCH_SIZE,
+            help=f'Number of messages sent per SMTP connection (default: {RESEND_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Stop after this many messages',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the messages that would be resent without sending them',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        limit = options['limit']
+        queryset = pending(options['ids'])
+
+        if options['dry_run']:
+            messages = queryset[:limit] if limit is not None else queryset
+            count = 0
+            for message in messages:
+                count += 1
+                self.stdout.write(f'#{message.id} {message.subject} -> {", ".join(message.recipients)}')
+            self.stdout.write(self.style.SUCCESS(f'[dry run] {count} message(s) would be resent.'))
+            return
+
+        totals = {'sent': 0, 'failed': 0}
+        last_id = 0
+        while limit is None or totals['sent'] + totals['failed'] < limit:
+            close_old_connections()
+            size = batch_size if limit is None else min(batch_size, limit - totals['sent'] - totals['failed'])
+            # Keyset on id, so messages that fail again are not retried in this run
+            batch = list(queryset.filter(id__gt=last_id)[:size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            counts = resend(batch)
+            for key, value in counts.items():
+                totals[key] += value
+            if not any(counts.values()):
+                # Could not connect; the rest would fail the same way
+                break
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Emails resent: {totals['sent']}, failed: {totals['failed']}."
+        ))
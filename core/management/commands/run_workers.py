@@ -0,0 +1,85 @@
+"""
+Management command to run background jobs queued with core.jobs.enqueue
+(bulk survey approval, welcome emails). Runs until interrupted; with --once
+it drains the queue and exits, e.g. from cron.
+"""
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from core.jobs import VISIBILITY_TIMEOUT, claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs with a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Number of jobs to run at the same time (default: 2)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds an idle worker waits before looking for jobs again (default: 2)',
+        )
+        parser.add_argument(
+            '--visibility-timeout',
+            type=int,
+            default=VISIBILITY_TIMEOUT,
+            help=f'Seconds before a job whose worker vanished is retried (default: {VISIBILITY_TIMEOUT})',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no job is left to run',
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        self.options = options
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.counts = {'succeeded': 0, 'queued': 0, 'failed': 0}
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+
+        if workers == 1:
+            self.work(f'{prefix}:0')
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(self.work, f'{prefix}:{i}') for i in range(workers)]
+                try:
+                    for future in futures:
+                        future.result()
+                except KeyboardInterrupt:
+                    self.stopping.set()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Jobs succeeded: {self.counts['succeeded']}, "
+            f"requeued: {self.counts['queued']}, failed: {self.counts['failed']}."
+        ))
+
+    def work(self, worker_id):
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                job = claim_job(worker_id, self.options['visibility_timeout'])
+                if job is None:
+                    if self.options['once']:
+                        return
+                    self.stopping.wait(self.options['poll_interval'])
+                    continue
+                job = run_job(job)
+                with self.lock:
+                    self.counts[job.status] += 1
+                self.stdout.write(f'[{worker_id}] job {job.id} {job.task}: {job.status}')
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
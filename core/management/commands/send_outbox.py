@@ -0,0 +1,56 @@
+"""
+Management command to deliver the email outbox (core.outbox). Each batch is
+sent over one SMTP connection; failed messages are retried with backoff and
+end up in the fallback store (see resend_fallback_emails) once their
+attempts run out. Runs until interrupted; with --once it drains the due
+messages and exits, e.g. from cron.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from core.outbox import OUTBOX_BATCH_SIZE, send_batch
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbox emails in batches over pooled SMTP connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=OUTBOX_BATCH_SIZE,
+            help=f'Number of messages sent per SMTP connection (default: {OUTBOX_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds to wait when no message is due (default: 5)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no message is due',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        totals = {'sent': 0, 'retrying': 0, 'fallback': 0}
+        try:
+            while True:
+                close_old_connections()
+                counts = send_batch(batch_size)
+                for key, value in counts.items():
+                    totals[key] += value
+                if not any(counts.values()):
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Emails sent: {totals['sent']}, retrying: {totals['retrying']}, "
+            f"saved to fallback: {totals['fallback']}."
+        ))
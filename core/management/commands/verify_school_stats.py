@@ -0,0 +1,46 @@
+"""
+Management command to check the SchoolStats rollup rows against live counts.
+Signals keep the rollups current; drift can come from bulk updates, raw SQL
+or rows moved between schools. Run with --fix to rewrite drifted rows.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import School, SchoolStats
+from core.stats import STAT_FIELDS, compute_school_stats
+
+
+class Command(BaseCommand):
+    help = 'Verify (and with --fix, rebuild) the per-school statistics rollup'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Rewrite rollup rows that are missing or have drifted',
+        )
+
+    def handle(self, *args, **options):
+        stored = {row.school_id: row for row in SchoolStats.objects.all()}
+        drifted = 0
+
+        for school in School.objects.order_by('id'):
+            expected = compute_school_stats(school.id)
+            row = stored.get(school.id)
+            differences = [
+                field for field in STAT_FIELDS
+                if row is None or getattr(row, field) != expected[field]
+            ]
+            if not differences:
+                continue
+
+            drifted += 1
+            label = 'missing' if row is None else ', '.join(differences)
+            self.stdout.write(f'{school.name}: {label}')
+            if options['fix']:
+                with transaction.atomic():
+                    SchoolStats.objects.update_or_create(school=school, defaults=expected)
+
+        verb = 'Rebuilt' if options['fix'] else 'Found'
+        self.stdout.write(
+            self.style.SUCCESS(f'{verb} {drifted} school statistics row(s) out of step.')
+        )
@@ -0,0 +1,258 @@
+# core app messaging.py
+
+"""Messenger queries and the events pushed to each user's SSE stream.
+
+:func:`conversation_summaries` builds the conversation list in a fixed
+number of queries. Views call the ``publish_*`` helpers after a message is
+sent, deleted or read; these refresh the cached navbar badge (core.badges)
+and reach the user's open tabs through :mod:`core.pubsub` and
+:func:`event_stream`, so the messenger no longer has to poll.
+"""
+
+import json
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Substr
+
+from .badges import set_unread_messages
+from .pubsub import publish, subscribe
+
+MESSAGE_PAGE_SIZE = 30
+MAX_MESSAGE_PAGE_SIZE = 100
+
+# Seconds between keep-alive comments on an idle stream
+STREAM_HEARTBEAT = 15
+# Reconnect delay (milliseconds) suggested to EventSource clients
+STREAM_RETRY_MS = 5000
+
+
+def user_channel(user_id):
+    return f"messenger:user:{user_id}"
+
+
+def unread_total(user):
+    """Unread messages addressed to ``user`` across all conversations."""
+    from .models import Conversation
+
+    totals = Conversation.objects.aggregate(
+        as_p1=Sum("participant1_unread_count", filter=Q(participant1=user)),
+        as_p2=Sum("participant2_unread_count", filter=Q(participant2=user)),
+    )
+    return (totals["as_p1"] or 0) + (totals["as_p2"] or 0)
+
+
+def summary_expressions():
+    """``update()`` kwargs recomputing Conversation's denormalized summary fields."""
+    from .models import Conversation, Message
+
+    newest = Message.objects.filter(conversation=OuterRef("pk")).order_by("-id")
+
+    def unread_for(reader, watermark):
+        counts = (
+            Message.objects.filter(conversation=OuterRef("pk"), id__gt=OuterRef(watermark))
+            .exclude(sender=OuterRef(reader))
+            .order_by()
+            .values("conversation")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        return Coalesce(Subquery(counts), 0)
+
+    preview = newest.annotate(
+        preview=Substr("content", 1, Conversation.PREVIEW_LENGTH)
+    ).values("preview")[:1]
+    return {
+        "last_message": Subquery(newest.values("id")[:1]),
+        "last_message_preview": Coalesce(Subquery(preview), Value("")),
+        "last_sender": Subquery(newest.values("sender_id")[:1]),
+        "last_message_at": Subquery(newest.values("created_at")[:1]),
+        "participant1_unread_count": unread_for(
+            "participant1", "participant1_last_read_message_id"
+        ),
+        "participant2_unread_count": unread_for(
+            "participant2", "participant2_last_read_message_id"
+        ),
+    }
+
+
+def conversation_summaries(user):
+    """The conversation list of ``user``, newest activity first.
+
+    Reads the denormalized summary fields on Conversation and joins both
+    participants, so the list costs one query plus one for the other
+    participants' avatars, however many conversations there are.
+    """
+    from .models import Conversation, Message, UserProfile
+
+    conversations = list(
+        Conversation.objects.filter(Q(participant1=user) | Q(participant2=user))
+        .select_related("participant1", "participant2")
+        .order_by("-updated_at")
+    )
+
+    other_ids = {conv.get_other_user(user).id for conv in conversations}
+    avatars = {
+        profile.user_id: profile.get_profile_photo()
+        for profile in UserProfile.objects.filter(user_id__in=other_ids).only(
+            "user_id", "profile_picture"
+        )
+    }
+
+    summaries = []
+    for conv in conversations:
+        other_user = conv.get_other_user(user)
+        summaries.append(
+            {
+                "id": conv.id,
+                "participant": {
+                    "id": other_user.id,
+                    "name": other_user.get_full_name() or other_user.username,
+                    "username": other_user.username,
+                    "avatar": avatars.get(other_user.id),
+                },
+                "last_message": {
+                    "content": conv.last_message_preview,
+                    "sender_id": conv.last_sender_id,
+                    "created_at": conv.last_message_at.isoformat(),
+                    "is_read": conv.is_read_by_recipient(
+                        Message(id=conv.last_message_id, sender_id=conv.last_sender_id)
+                    ),
+                }
+                if conv.last_message_id
+                else None,
+                "unread_count": conv.get_unread_count(user),
+                "updated_at": conv.updated_at.isoformat(),
+            }
+        )
+    return summaries
+
+
+def parse_message_limit(value):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return MESSAGE_PAGE_SIZE
+    return max(1, min(limit, MAX_MESSAGE_PAGE_SIZE))
+
+
+def message_page(conversation, before=None, since=None, limit=MESSAGE_PAGE_SIZE):
+    """One page of a conversation's history, oldest first.
+
+    By default (or with ``before``, a message id) the page holds the
+    ``limit`` newest messages older than the cursor; with ``since`` it holds
+    the messages newer than that id, for clients that already hold the
+    history. Either way the page is a keyset range on the message id, so its
+    cost does not grow with the length of the conversation.
+
+    Returns ``(messages, has_more)``; ``has_more`` means older messages
+    remain (history mode) or newer ones remain (``since`` mode).
+    """
+    from .models import Message
+
+    qs = Message.objects.filter(conversation=conversation)
+    if since is not None:
+        rows = list(qs.filter(id__gt=since).order_by("id")[: limit + 1])
+        return rows[:limit], len(rows) > limit
+    if before is not None:
+        qs = qs.filter(id__lt=before)
+    rows = list(qs.order_by("-id")[: limit + 1])
+    page = rows[:limit]
+    page.reverse()
+    return page, len(rows) > limit
+
+
+def serialize_messages(messages, conversation):
+    """Serialize ``messages``; senders and avatars come from the two participants.
+
+    Load ``conversation`` with ``select_related("participant1__profile",
+    "participant2__profile")`` to serialize any page without further queries.
+    """
+    participants = {
+        conversation.participant1_id: conversation.participant1,
+        conversation.participant2_id: conversation.participant2,
+    }
+    avatars = {}
+    for user_id, participant in participants.items():
+        profile = getattr(participant, "profile", None)
+        avatars[user_id] = profile.get_profile_photo() if profile else None
+
+    data = []
+    for msg in messages:
+        sender = participants.get(msg.sender_id) or msg.sender
+        data.append(
+            {
+                "id": msg.id,
+                "sender_id": msg.sender_id,
+                "sender_name": sender.get_full_name() or sender.username,
+                "sender_avatar": avatars.get(msg.sender_id),
+                "content": msg.content,
+                "is_read": conversation.is_read_by_recipient(msg),
+                "created_at": msg.created_at.isoformat(),
+            }
+        )
+    return data
+
+
+def _publish_unread(user):
+    total = unread_total(user)
+    set_unread_messages(user.id, total)
+    publish(user_channel(user.id), {"event": "unread", "data": {"unread": total}})
+
+
+def publish_new_message(message, recipient):
+    """Push a sent message to both participants and the recipient's new unread total."""
+    payload = {
+        "id": message.id,
+        "conversation_id": message.conversation_id,
+        "sender_id": message.sender_id,
+        "content": message.content,
+        "created_at": message.created_at.isoformat(),
+    }
+
+    def send():
+        for user_id in (message.sender_id, recipient.id):
+            publish(user_channel(user_id), {"event": "new_message", "data": payload})
+        _publish_unread(recipient)
+
+    transaction.on_commit(send)
+
+
+def publish_message_deleted(message, recipient):
+    payload = {"id": message.id, "conversation_id": message.conversation_id}
+
+    def send():
+        for user_id in (message.sender_id, recipient.id):
+            publish(user_channel(user_id), {"event": "message_deleted", "data": payload})
+        _publish_unread(recipient)
+
+    transaction.on_commit(send)
+
+
+def publish_unread(user):
+    """Push ``user``'s unread total, e.g. after they read a conversation."""
+    transaction.on_commit(lambda: _publish_unread(user))
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def event_stream(subscription, initial_events=(), heartbeat=STREAM_HEARTBEAT):
+    """Yield SSE frames for ``subscription`` until the client disconnects."""
+    try:
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        for event in initial_events:
+            yield format_sse(event["event"], event["data"])
+        while True:
+            event = await subscription.get(timeout=heartbeat)
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield format_sse(event["event"], event["data"])
+    finally:
+        subscription.close()
+
+
+def subscribe_user(user_id):
+    return subscribe(user_channel(user_id))
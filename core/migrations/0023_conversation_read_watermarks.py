@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:51
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def derive_watermarks(apps, schema_editor):
+    """Set each participant's watermark from today's Message.is_read flags
+
+    A participant has read everything below the oldest message still unread
+    for them, or the whole conversation if nothing is unread.
+    """
+    Conversation = apps.get_model('core', 'Conversation')
+    Message = apps.get_model('core', 'Message')
+
+    newest = Message.objects.filter(conversation=OuterRef('pk')).order_by('-id').values('id')[:1]
+
+    def watermark(reader_field):
+        oldest_unread = (
+            Message.objects.filter(conversation=OuterRef('pk'), is_read=False)
+            .exclude(sender=OuterRef(reader_field))
+            .order_by('id')
+            .values('id')[:1]
+        )
+        return Coalesce(Subquery(oldest_unread) - 1, Subquery(newest), Value(0))
+
+    Conversation.objects.update(
+        participant1_last_read_message_id=watermark('participant1'),
+        participant2_last_read_message_id=watermark('participant2'),
+    )
+
+
+def restore_read_flags(apps, schema_editor):
+    Message = apps.get_model('core', 'Message')
+    Message.objects.filter(
+        sender=F('conversation__participant1'),
+        id__lte=F('conversation__participant2_last_read_message_id'),
+    ).update(is_read=True)
+    Message.objects.filter(
+        sender=F('conversation__participant2'),
+        id__lte=F('conversation__participant1_last_read_message_id'),
+    ).update(is_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_add_survey_recipient_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='participant1_last_read_message_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='participant2_last_read_message_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(derive_watermarks, restore_read_flags),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+    ]
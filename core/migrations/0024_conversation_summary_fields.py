@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+
+
+def fill_summaries(apps, schema_editor):
+    """Compute the new summary fields from existing messages"""
+    Conversation = apps.get_model('core', 'Conversation')
+    Message = apps.get_model('core', 'Message')
+
+    newest = Message.objects.filter(conversation=OuterRef('pk')).order_by('-id')
+
+    def unread_for(reader, watermark):
+        counts = (
+            Message.objects.filter(conversation=OuterRef('pk'), id__gt=OuterRef(watermark))
+            .exclude(sender=OuterRef(reader))
+            .order_by()
+            .values('conversation')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        return Coalesce(Subquery(counts), 0)
+
+    preview = newest.annotate(preview=Substr('content', 1, 100)).values('preview')[:1]
+    Conversation.objects.update(
+        last_message=Subquery(newest.values('id')[:1]),
+        last_message_preview=Coalesce(Subquery(preview), Value('')),
+        last_sender=Subquery(newest.values('sender_id')[:1]),
+        last_message_at=Subquery(newest.values('created_at')[:1]),
+        participant1_unread_count=unread_for('participant1', 'participant1_last_read_message_id'),
+        participant2_unread_count=unread_for('participant2', 'participant2_last_read_message_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_conversation_read_watermarks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_sender',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='participant1_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='participant2_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
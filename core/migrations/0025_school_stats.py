@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_conversation_summary_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchoolStats',
+            fields=[
+                ('school', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='core.school')),
+                ('total_students', models.PositiveIntegerField(default=0)),
+                ('total_properties', models.PositiveIntegerField(default=0)),
+                ('pending_properties', models.PositiveIntegerField(default=0)),
+                ('verified_properties', models.PositiveIntegerField(default=0)),
+                ('rejected_properties', models.PositiveIntegerField(default=0)),
+                ('suspended_properties', models.PositiveIntegerField(default=0)),
+                ('low_rating_properties', models.PositiveIntegerField(default=0)),
+                ('active_boarding_assignments', models.PositiveIntegerField(default=0)),
+                ('open_critical_emergencies', models.PositiveIntegerField(default=0)),
+                ('pending_survey_responses', models.PositiveIntegerField(default=0)),
+                ('department_response_counts', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'School Statistics',
+                'verbose_name_plural': 'School Statistics',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_outbound_email'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='outboundemail',
+            name='fallback_path',
+        ),
+        migrations.CreateModel(
+            name='FallbackEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_id', models.CharField(max_length=255, unique=True)),
+                ('subject', models.CharField(blank=True, max_length=255)),
+                ('from_email', models.CharField(max_length=254)),
+                ('recipients', models.JSONField(default=list)),
+                ('raw', models.BinaryField()),
+                ('error_class', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resent_at', models.DateTimeField(blank=True, null=True)),
+                ('resend_attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('outbox', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='fallback', to='core.outboundemail')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['resent_at', 'id'], name='core_fallba_resent__e4172f_idx')],
+            },
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.contrib.auth.models import User
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Greatest
+from django.utils import timezone
 
 
 class School(models.Model):
@@ -572,6 +575,21 @@ class SurveyResponse(models.Model):
     additional_data = models.JSONField(
         default=dict, blank=True, help_text="Other survey responses"
     )
+    # Department/program picked on the survey (before a Student exists)
+    department = models.ForeignKey(
+        Department,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="survey_responses",
+    )
+    program = models.ForeignKey(
+        Program,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="survey_responses",
+    )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
     reviewed_by = models.ForeignKey(
         User,
@@ -776,9 +794,28 @@ class Conversation(models.Model):
     participant2 = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="conversations_as_p2"
     )
+    # Read watermarks: id of the newest message each participant has seen.
+    # A message is unread for its recipient while its id is above theirs.
+    participant1_last_read_message_id = models.PositiveBigIntegerField(default=0)
+    participant2_last_read_message_id = models.PositiveBigIntegerField(default=0)
+    # Denormalized summary of the latest activity, maintained by
+    # record_message()/forget_message() (rebuild: rebuild_conversation_summaries)
+    last_message = models.ForeignKey(
+        "Message", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    last_message_preview = models.CharField(max_length=100, blank=True)
+    last_sender = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    # Messages above each participant's read watermark
+    participant1_unread_count = models.PositiveIntegerField(default=0)
+    participant2_unread_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    PREVIEW_LENGTH = 100
+
     class Meta:
         ordering = ["-updated_at"]
         # Ensure unique conversations between two users (order-independent)
@@ -799,14 +836,84 @@ class Conversation(models.Model):
         """Get the most recent message in this conversation"""
         return self.messages.latest("created_at") if self.messages.exists() else None
 
+    def last_read_field(self, user):
+        """Name of the read-watermark field belonging to ``user``"""
+        if user.id == self.participant1_id:
+            return "participant1_last_read_message_id"
+        return "participant2_last_read_message_id"
+
+    def last_read_message_id(self, user):
+        return getattr(self, self.last_read_field(user))
+
+    def unread_field(self, user):
+        """Name of the unread-counter field belonging to ``user``"""
+        if user.id == self.participant1_id:
+            return "participant1_unread_count"
+        return "participant2_unread_count"
+
+    def is_read_by_recipient(self, message):
+        """Whether the participant who received ``message`` has read it"""
+        if message.sender_id == self.participant1_id:
+            return message.id <= self.participant2_last_read_message_id
+        return message.id <= self.participant1_last_read_message_id
+
     def get_unread_count(self, user):
         """Get count of unread messages for a specific user"""
-        return (
-            self.messages.filter(sender__isnull=False)
-            .exclude(sender=user)
-            .filter(is_read=False)
-            .count()
+        return getattr(self, self.unread_field(user))
+
+    def mark_read(self, user):
+        """Move ``user``'s watermark to the newest message; one UPDATE of this row.
+
+        Returns True if anything new was marked read.
+        """
+        field = self.last_read_field(user)
+        unread_field = self.unread_field(user)
+        newest = Subquery(
+            Message.objects.filter(conversation=OuterRef("pk")).order_by("-id").values("id")[:1]
+        )
+        updated = Conversation.objects.filter(pk=self.pk, **{f"{field}__lt": newest}).update(
+            **{field: newest, unread_field: 0}
+        )
+        if updated:
+            self.refresh_from_db(fields=[field, unread_field])
+        return bool(updated)
+
+    def record_message(self, message):
+        """Update the summary fields for a newly sent ``message`` (one UPDATE)"""
+        recipient_unread = (
+            "participant2_unread_count"
+            if message.sender_id == self.participant1_id
+            else "participant1_unread_count"
         )
+        Conversation.objects.filter(pk=self.pk).update(
+            last_message=message,
+            last_message_preview=message.content[: self.PREVIEW_LENGTH],
+            last_sender_id=message.sender_id,
+            last_message_at=message.created_at,
+            updated_at=message.created_at,
+            **{recipient_unread: F(recipient_unread) + 1},
+        )
+
+    def forget_message(self, message):
+        """Update the summary fields after ``message`` was deleted"""
+        changes = {}
+        if not self.is_read_by_recipient(message):
+            field = (
+                "participant2_unread_count"
+                if message.sender_id == self.participant1_id
+                else "participant1_unread_count"
+            )
+            changes[field] = Greatest(F(field) - 1, 0)
+        if self.last_message_id in (None, message.id):
+            previous = self.messages.exclude(id=message.id).order_by("-id").first()
+            changes.update(
+                last_message=previous,
+                last_message_preview=previous.content[: self.PREVIEW_LENGTH] if previous else "",
+                last_sender_id=previous.sender_id if previous else None,
+                last_message_at=previous.created_at if previous else None,
+            )
+        if changes:
+            Conversation.objects.filter(pk=self.pk).update(**changes)
 
 
 class Message(models.Model):
@@ -819,7 +926,7 @@ class Message(models.Model):
         User, on_delete=models.CASCADE, related_name="sent_messages"
     )
     content = models.TextField()
-    is_read = models.BooleanField(default=False)
+    # Read state lives on Conversation as per-participant watermarks
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -832,3 +939,160 @@ class Message(models.Model):
     def __str__(self):
         preview = self.content[:50] + "..." if len(self.content) > 50 else self.content
         return f"{self.sender.username}: {preview}"
+
+
+class SchoolStats(models.Model):
+    """Rollup of the admin dashboard figures, one row per school
+
+    Kept current by core.signals, which add the difference each saved or
+    deleted student, property, boarding assignment, emergency log or
+    survey response makes (see core/stats.py); verify_school_stats
+    repairs drift.
+    """
+
+    school = models.OneToOneField(
+        School, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    total_students = models.PositiveIntegerField(default=0)
+    total_properties = models.PositiveIntegerField(default=0)
+    pending_properties = models.PositiveIntegerField(default=0)
+    verified_properties = models.PositiveIntegerField(default=0)
+    rejected_properties = models.PositiveIntegerField(default=0)
+    suspended_properties = models.PositiveIntegerField(default=0)
+    low_rating_properties = models.PositiveIntegerField(default=0)
+    active_boarding_assignments = models.PositiveIntegerField(default=0)
+    open_critical_emergencies = models.PositiveIntegerField(default=0)
+    pending_survey_responses = models.PositiveIntegerField(default=0)
+    # {"<department id>": response count}
+    department_response_counts = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "School Statistics"
+        verbose_name_plural = "School Statistics"
+
+    def __str__(self):
+        return f"Statistics for {self.school.name}"
+
+
+class Job(models.Model):
+    """A unit of background work for the run_workers command
+
+    ``task`` is the dotted path of a function called as
+    ``task(job, **payload)``; see core/jobs.py for queueing, claiming and
+    retries.
+    """
+
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    ]
+
+    task = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # Not picked up before this time (retry backoff)
+    run_after = models.DateTimeField(default=timezone.now)
+    # A running job whose worker has not finished by this time is claimable again
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="jobs"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+            models.Index(fields=["status", "locked_until"]),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} {self.task} ({self.status})"
+
+
+class OutboundEmail(models.Model):
+    """An email in the outbox, delivered by the send_outbox command
+
+    Delivery is retried with backoff; once ``max_attempts`` is used up the
+    message is kept as a FallbackEmail (``fallback``) instead; see
+    core/outbox.py.
+    """
+
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("sending", "Sending"),
+        ("sent", "Sent"),
+        ("fallback", "Saved to fallback"),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Set while a sender holds the message; an expired claim is retried
+    claimed_by = models.CharField(max_length=100, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+            models.Index(fields=["status", "claimed_until"]),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+
+class FallbackEmail(models.Model):
+    """An email that could not be delivered over SMTP, kept for resending
+
+    Replaces the one-file-per-message sent_emails/ directory: messages are
+    looked up by their Message-ID, replayed by resend_fallback_emails and
+    purged by compact_fallback_emails (see core/fallback_store.py).
+    """
+
+    message_id = models.CharField(max_length=255, unique=True)
+    outbox = models.OneToOneField(
+        OutboundEmail,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="fallback",
+    )
+    subject = models.CharField(max_length=255, blank=True)
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    # The complete MIME message, replayed byte for byte
+    raw = models.BinaryField()
+    error_class = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    resent_at = models.DateTimeField(null=True, blank=True)
+    resend_attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [models.Index(fields=["resent_at", "id"])]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
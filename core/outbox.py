@@ -0,0 +1,237 @@
+# core app outbox.py
+
+"""Outbound email queue.
+
+Views and jobs call :func:`queue_email` instead of talking to SMTP in the
+request; the ``send_outbox`` management command (which must be kept
+running, see README) calls :func:`send_batch`, which claims due messages
+and delivers them over a single SMTP connection per batch. Flows where the
+user waits for the email (password reset codes) call :func:`send_now`,
+which tries SMTP once in the request and leaves the message to the outbox
+if that fails. A message that fails is retried with exponential backoff; when
+its attempts run out it is kept in the fallback store (core/fallback_store.py)
+so ``resend_fallback_emails`` can replay it later.
+Each delivery is logged on the ``core.email`` channel.
+"""
+
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .fallback_store import store_message
+
+logger = logging.getLogger("core.email")
+
+OUTBOX_BATCH_SIZE = 50
+# Seconds a claimed batch stays hidden from other senders
+CLAIM_TIMEOUT = 300
+SMTP_TIMEOUT = 30
+# Shorter for send_now: the user is waiting on the response
+IMMEDIATE_SMTP_TIMEOUT = 10
+# Retry n waits RETRY_BASE_DELAY * 2 ** (n - 1) seconds, capped
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 3600
+# Delivery backend; the site-wide EMAIL_BACKEND does its own file fallback
+DEFAULT_OUTBOX_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+
+
+def queue_email(subject, body, recipients, from_email=None):
+    """Put a message in the outbox; returns the OutboundEmail row."""
+    from .models import OutboundEmail
+
+    return OutboundEmail.objects.create(
+        subject=subject[:255],
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(recipients),
+    )
+
+
+def as_message(email, connection=None):
+    return EmailMessage(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        connection=connection,
+        headers={"X-Outbox-Id": str(email.id)},
+    )
+
+
+def send_now(subject, body, recipients, from_email=None, connection=None):
+    """Queue a message and try to deliver it right away; returns the OutboundEmail.
+
+    If SMTP fails the message stays queued with the usual backoff, so the
+    ``send_outbox`` command delivers it later.
+    """
+    from .models import OutboundEmail
+
+    email = queue_email(subject, body, recipients, from_email)
+    token = uuid.uuid4().hex
+    claimed = OutboundEmail.objects.filter(id=email.id, status="queued").update(
+        status="sending",
+        claimed_by=token,
+        claimed_until=timezone.now() + timedelta(seconds=CLAIM_TIMEOUT),
+        attempts=F("attempts") + 1,
+    )
+    if not claimed:
+        return email
+    email.refresh_from_db()
+
+    if connection is None:
+        backend = getattr(settings, "EMAIL_OUTBOX_BACKEND", DEFAULT_OUTBOX_BACKEND)
+        connection = get_connection(backend, fail_silently=False, timeout=IMMEDIATE_SMTP_TIMEOUT)
+    started = time.monotonic()
+    try:
+        if not connection.send_messages([as_message(email, connection)]):
+            raise RuntimeError("The SMTP server did not accept the message")
+    except Exception as error:
+        _mark_failed(email, error)
+    else:
+        _mark_sent(email)
+        logger.info("email.sent", extra={
+            "outbox_id": email.id,
+            "recipients": len(email.to),
+            "attempts": email.attempts,
+            "fallback": False,
+            "immediate": True,
+            "send_ms": _elapsed_ms(started),
+        })
+    finally:
+        connection.close()
+    email.refresh_from_db()
+    return email
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0), RETRY_MAX_DELAY)
+
+
+def claim_batch(batch_size=OUTBOX_BATCH_SIZE, claim_timeout=CLAIM_TIMEOUT):
+    """Claim up to ``batch_size`` due messages for this sender; returns them."""
+    from .models import OutboundEmail
+
+    now = timezone.now()
+    due = Q(status="queued", next_attempt_at__lte=now) | Q(status="sending", claimed_until__lt=now)
+    ids = list(OutboundEmail.objects.filter(due).order_by("id").values_list("id", flat=True)[:batch_size])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # Re-checking ``due`` drops rows another sender claimed in the meantime
+    OutboundEmail.objects.filter(due, id__in=ids).update(
+        status="sending",
+        claimed_by=token,
+        claimed_until=now + timedelta(seconds=claim_timeout),
+        attempts=F("attempts") + 1,
+    )
+    return list(OutboundEmail.objects.filter(claimed_by=token, status="sending").order_by("id"))
+
+
+def _mark_sent(email):
+    from .models import OutboundEmail
+
+    OutboundEmail.objects.filter(id=email.id, claimed_by=email.claimed_by).update(
+        status="sent", sent_at=timezone.now(), claimed_by="", claimed_until=None, last_error=""
+    )
+    return "sent"
+
+
+def _mark_failed(email, error):
+    """Schedule a retry of ``email``, or save it to the fallback store; returns the outcome."""
+    from .models import OutboundEmail
+
+    fallback = None
+    fields = {"claimed_by": "", "claimed_until": None, "last_error": f"{type(error).__name__}: {error}"}
+    if email.attempts < email.max_attempts:
+        fields.update(status="queued", next_attempt_at=timezone.now() + timedelta(seconds=retry_delay(email.attempts)))
+        outcome = "retrying"
+    else:
+        fallback = store_message(as_message(email), error, outbox=email)
+        fields.update(status="fallback")
+        outcome = "fallback"
+    OutboundEmail.objects.filter(id=email.id, claimed_by=email.claimed_by).update(**fields)
+    logger.warning(f"email.{outcome}", extra={
+        "outbox_id": email.id,
+        "recipients": len(email.to),
+        "attempts": email.attempts,
+        "fallback": outcome == "fallback",
+        "fallback_id": fallback.id if fallback else None,
+        "error_class": type(error).__name__,
+    })
+    return outcome
+
+
+def send_batch(batch_size=OUTBOX_BATCH_SIZE, connection=None):
+    """Deliver one batch of due messages over one SMTP connection.
+
+    Returns a dict counting the messages ``sent``, scheduled for
+    ``retrying`` and saved to ``fallback``; all zero if nothing was due.
+    """
+    counts = {"sent": 0, "retrying": 0, "fallback": 0}
+    emails = claim_batch(batch_size)
+    if not emails:
+        return counts
+
+    if connection is None:
+        backend = getattr(settings, "EMAIL_OUTBOX_BACKEND", DEFAULT_OUTBOX_BACKEND)
+        connection = get_connection(backend, fail_silently=False, timeout=SMTP_TIMEOUT)
+    pending = list(emails)
+    batch_started = time.monotonic()
+    connects = 0
+    try:
+        while pending:
+            started = time.monotonic()
+            try:
+                connection.open()
+            except Exception as error:
+                logger.warning("email.connect_failed", extra={
+                    "messages": len(pending),
+                    "connect_ms": _elapsed_ms(started),
+                    "error_class": type(error).__name__,
+                })
+                # Nothing in this batch can go out now; try again later
+                for email in pending:
+                    counts[_mark_failed(email, error)] += 1
+                break
+            connects += 1
+            connect_ms = _elapsed_ms(started)
+            while pending:
+                email = pending.pop(0)
+                started = time.monotonic()
+                try:
+                    if not connection.send_messages([as_message(email, connection)]):
+                        raise RuntimeError("The SMTP server did not accept the message")
+                except Exception as error:
+                    counts[_mark_failed(email, error)] += 1
+                    # The connection may be unusable now; reconnect for the rest
+                    connection.close()
+                    break
+                counts[_mark_sent(email)] += 1
+                logger.info("email.sent", extra={
+                    "outbox_id": email.id,
+                    "recipients": len(email.to),
+                    "attempts": email.attempts,
+                    "fallback": False,
+                    "connect_ms": connect_ms,
+                    "send_ms": _elapsed_ms(started),
+                })
+                connect_ms = 0
+    finally:
+        connection.close()
+    logger.info("email.batch", extra={
+        **counts,
+        "messages": len(emails),
+        "connections": connects,
+        "duration_ms": _elapsed_ms(batch_started),
+    })
+    return counts
+
+
+def _elapsed_ms(started):
+    return round((time.monotonic() - started) * 1000, 1)
@@ -0,0 +1,133 @@
+# core app pubsub.py
+
+"""Publish/subscribe fan-out for the messenger's server-sent event streams.
+
+Sync views publish events with :func:`publish`; async SSE views receive them
+through :func:`subscribe`. The backend is chosen by the
+``MESSENGER_PUBSUB_BACKEND`` setting (a dotted path to a :class:`PubSub`
+subclass). The default :class:`InProcessPubSub` only reaches subscribers in
+the same process, which is enough for a single ASGI worker; a multi-worker
+deployment needs a backend over a shared broker (e.g. Redis pub/sub) that
+implements the same two methods.
+"""
+
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_BACKEND = "core.pubsub.InProcessPubSub"
+
+# Events a slow subscriber may have queued before new ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """An async iterator of the events published to one channel."""
+
+    def __init__(self, pubsub, channel):
+        self.pubsub = pubsub
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def deliver(self, event):
+        """Hand ``event`` to the subscriber's loop; safe from any thread."""
+        def put():
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                pass
+
+        try:
+            self.loop.call_soon_threadsafe(put)
+        except RuntimeError:
+            # The subscriber's event loop has already shut down
+            self.close()
+
+    async def get(self, timeout=None):
+        """The next event, or ``None`` if ``timeout`` seconds pass first."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.pubsub.unsubscribe(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+
+class PubSub:
+    """Backend interface: fan ``publish``ed events out to ``subscribe``rs."""
+
+    def publish(self, channel, event):
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        """Return a :class:`Subscription`; must be called from a running loop."""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class InProcessPubSub(PubSub):
+    """Fan-out to subscribers living in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+        return len(subscribers)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_pubsub():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, "MESSENGER_PUBSUB_BACKEND", DEFAULT_BACKEND)
+                _backend = import_string(path)()
+    return _backend
+
+
+def publish(channel, event):
+    return get_pubsub().publish(channel, event)
+
+
+def subscribe(channel):
+    return get_pubsub().subscribe(channel)
@@ -0,0 +1,194 @@
+# core app signals.py
+
+"""Keep derived data in step with its source rows.
+
+* Cached navbar badge counts (core/badges.py) are dropped when a
+  maintenance request changes.
+* SchoolStats rollups (core/stats.py) take the difference a counted
+  student, property, boarding assignment, emergency log or survey response
+  makes when it is created, changes state or is deleted.
+* Compiled survey definitions (core/survey_cache.py) get a new version when
+  a survey, or its school's departments or programs, change.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import badges, stats, survey_cache
+from .models import (
+    BoardingAssignment,
+    Department,
+    EmergencyLog,
+    MaintenanceRequest,
+    Program,
+    Property,
+    Student,
+    Survey,
+    SurveyResponse,
+)
+
+
+@receiver(post_save, sender=MaintenanceRequest, dispatch_uid="core_badge_request_saved")
+@receiver(post_delete, sender=MaintenanceRequest, dispatch_uid="core_badge_request_deleted")
+def forget_owner_notification_badge(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    owner_id = (
+        Property.objects.filter(id=instance.property_id)
+        .values_list("owner_id", flat=True)
+        .first()
+    )
+    if owner_id is not None:
+        transaction.on_commit(lambda: badges.forget_notifications(owner_id))
+
+
+# The column through which each counted model belongs to a school
+_SCHOOL_KEYS = {
+    Student: "school_id",
+    Property: "school_id",
+    BoardingAssignment: "student_id",
+    EmergencyLog: "property_id",
+    SurveyResponse: "survey_id",
+}
+
+# Columns whose values decide what a counted row adds to its school's rollup
+_TRACKED_COLUMNS = {
+    Student: ("school_id", "department_id"),
+    Property: ("school_id", "status", "safety_rating"),
+    BoardingAssignment: ("student_id", "status"),
+    EmergencyLog: ("property_id", "severity", "status"),
+    SurveyResponse: ("survey_id", "status", "department_id", "student_id"),
+}
+
+
+# The relation each counted model reaches its school through
+_PARENTS = {BoardingAssignment: "student", EmergencyLog: "property", SurveyResponse: "survey"}
+
+
+def _school_of(model, key, instance=None):
+    if key is None or model in (Student, Property):
+        return key
+    cached = instance._state.fields_cache.get(_PARENTS[model]) if instance is not None else None
+    if cached is not None and cached.pk == key:
+        # Already loaded with the row (e.g. SurveyResponse(survey=survey))
+        return cached.school_id
+    parent = {BoardingAssignment: Student, EmergencyLog: Property, SurveyResponse: Survey}[model]
+    return parent.objects.filter(id=key).values_list("school_id", flat=True).first()
+
+
+def _tracked_state(model, instance):
+    # Read from __dict__ so a deferred column is not fetched; None if one is
+    values = instance.__dict__
+    columns = _TRACKED_COLUMNS[model]
+    if any(column not in values for column in columns):
+        return None
+    return {column: values[column] for column in columns}
+
+
+def _response_department(state):
+    """The department a survey response in ``state`` counts under (see stats.response_department)."""
+    if state["department_id"] is not None or state["student_id"] is None:
+        return state["department_id"]
+    return Student.objects.filter(id=state["student_id"]).values_list("department_id", flat=True).first()
+
+
+def _apply_change(model, old, new, instance=None):
+    """Move the rollup figures from the row's ``old`` state to its ``new`` one (either may be None)."""
+    schools = {}
+    deltas = {}
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None:
+            continue
+        key = state[_SCHOOL_KEYS[model]]
+        if key not in schools:
+            schools[key] = _school_of(model, key, instance)
+        counts, departments = deltas.setdefault(schools[key], ({}, {}))
+        for field in stats.counted_fields(model._meta.model_name, state):
+            counts[field] = counts.get(field, 0) + sign
+        if model is SurveyResponse:
+            department = _response_department(state)
+            if department is not None:
+                departments[department] = departments.get(department, 0) + sign
+    for school_id, (counts, departments) in deltas.items():
+        stats.apply_deltas(school_id, counts, departments)
+
+
+@receiver(post_init, sender=Student, dispatch_uid="core_stats_student_loaded")
+@receiver(post_init, sender=Property, dispatch_uid="core_stats_property_loaded")
+@receiver(post_init, sender=BoardingAssignment, dispatch_uid="core_stats_assignment_loaded")
+@receiver(post_init, sender=EmergencyLog, dispatch_uid="core_stats_emergency_loaded")
+@receiver(post_init, sender=SurveyResponse, dispatch_uid="core_stats_response_loaded")
+def remember_counted_state(sender, instance, **kwargs):
+    instance._stats_state = _tracked_state(sender, instance)
+
+
+@receiver(post_save, sender=Student, dispatch_uid="core_stats_student_saved")
+@receiver(post_save, sender=Property, dispatch_uid="core_stats_property_saved")
+@receiver(post_save, sender=BoardingAssignment, dispatch_uid="core_stats_assignment_saved")
+@receiver(post_save, sender=EmergencyLog, dispatch_uid="core_stats_emergency_saved")
+@receiver(post_save, sender=SurveyResponse, dispatch_uid="core_stats_response_saved")
+def count_saved_row(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    old = None if created else getattr(instance, "_stats_state", None)
+    new = _tracked_state(sender, instance)
+    instance._stats_state = new
+    if old == new and not created:
+        return
+    moved_parent = (
+        sender in (Student, Property)
+        and old is not None
+        and new is not None
+        and (old["school_id"] != new["school_id"] or old.get("department_id") != new.get("department_id"))
+    )
+    if new is None or (old is None and not created) or moved_parent:
+        # A deferred column hides what changed, or rows counted through this
+        # one (assignments, emergencies, responses) moved with it: recount
+        key = _SCHOOL_KEYS[sender]
+        for state in (old, new):
+            school_key = (state or {}).get(key, instance.__dict__.get(key))
+            stats.schedule_refresh(_school_of(sender, school_key))
+        return
+    _apply_change(sender, old, new, instance)
+
+
+@receiver(post_delete, sender=Student, dispatch_uid="core_stats_student_deleted")
+@receiver(post_delete, sender=Property, dispatch_uid="core_stats_property_deleted")
+@receiver(post_delete, sender=BoardingAssignment, dispatch_uid="core_stats_assignment_deleted")
+@receiver(post_delete, sender=EmergencyLog, dispatch_uid="core_stats_emergency_deleted")
+@receiver(post_delete, sender=SurveyResponse, dispatch_uid="core_stats_response_deleted")
+def uncount_deleted_row(sender, instance, **kwargs):
+    old = getattr(instance, "_stats_state", None) or _tracked_state(sender, instance)
+    if old is None:
+        stats.schedule_refresh(_school_of(sender, getattr(instance, _SCHOOL_KEYS[sender])))
+        return
+    _apply_change(sender, old, None, instance)
+
+
+@receiver(post_save, sender=Survey, dispatch_uid="core_survey_cache_survey_saved")
+@receiver(post_delete, sender=Survey, dispatch_uid="core_survey_cache_survey_deleted")
+def bump_survey_definition(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    unique_code = instance.unique_code
+    transaction.on_commit(lambda: survey_cache.bump_version(unique_code))
+
+
+@receiver(post_save, sender=Department, dispatch_uid="core_survey_cache_department_saved")
+@receiver(post_delete, sender=Department, dispatch_uid="core_survey_cache_department_deleted")
+def bump_survey_definitions_of_department(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    school_id = instance.school_id
+    transaction.on_commit(lambda: survey_cache.bump_school_surveys(school_id))
+
+
+@receiver(post_save, sender=Program, dispatch_uid="core_survey_cache_program_saved")
+@receiver(post_delete, sender=Program, dispatch_uid="core_survey_cache_program_deleted")
+def bump_survey_definitions_of_program(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    school_id = Department.objects.filter(id=instance.department_id).values_list("school_id", flat=True).first()
+    if school_id is not None:
+        transaction.on_commit(lambda: survey_cache.bump_school_surveys(school_id))
@@ -0,0 +1,223 @@
+# core app stats.py
+
+"""Per-school dashboard statistics and their SchoolStats rollup rows.
+
+The admin dashboard reads the stored :class:`~core.models.SchoolStats`
+row. When a counted row is created, changes state or is deleted,
+core.signals works out which figures it stopped and started counting
+towards (:func:`counted_fields`) and :func:`apply_deltas` adds the
+difference to the rollup in the same transaction, with one UPDATE.
+
+:func:`compute_school_stats` counts everything for one school from scratch.
+It builds a school's row on first use and repairs it (verify_school_stats,
+and :func:`schedule_refresh` for the rare changes a delta cannot follow,
+such as a student moving school, and for bulk updates that send no
+signals).
+"""
+
+import threading
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Q, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+STAT_FIELDS = (
+    "total_students",
+    "total_properties",
+    "pending_properties",
+    "verified_properties",
+    "rejected_properties",
+    "suspended_properties",
+    "low_rating_properties",
+    "active_boarding_assignments",
+    "open_critical_emergencies",
+    "pending_survey_responses",
+    "department_response_counts",
+)
+
+
+# Property statuses with a figure of their own
+PROPERTY_STATUS_FIELDS = {
+    "pending": "pending_properties",
+    "verified": "verified_properties",
+    "rejected": "rejected_properties",
+    "suspended": "suspended_properties",
+}
+LOW_SAFETY_RATING = 3.0
+CRITICAL_SEVERITIES = ("high", "critical")
+OPEN_EMERGENCY_STATUSES = ("open", "investigating")
+
+
+def response_department():
+    """The department a survey response counts under.
+
+    The department picked on the survey, else the linked student's
+    department.
+    """
+    return Coalesce("department_id", "student__department_id", output_field=IntegerField())
+
+
+def compute_school_stats(school_id):
+    """Count the dashboard figures of one school; returns a dict of STAT_FIELDS."""
+    from .models import BoardingAssignment, EmergencyLog, Property, Student, SurveyResponse
+
+    properties = Property.objects.filter(school_id=school_id).aggregate(
+        total=Count("id"),
+        pending=Count("id", filter=Q(status="pending")),
+        verified=Count("id", filter=Q(status="verified")),
+        rejected=Count("id", filter=Q(status="rejected")),
+        suspended=Count("id", filter=Q(status="suspended")),
+        low_rating=Count("id", filter=Q(status="verified", safety_rating__lt=LOW_SAFETY_RATING)),
+    )
+    department_counts = (
+        SurveyResponse.objects.filter(survey__school_id=school_id)
+        .annotate(department_key=response_department())
+        .values("department_key")
+        .annotate(total=Count("id"))
+        .values_list("department_key", "total")
+    )
+    return {
+        "total_students": Student.objects.filter(school_id=school_id).count(),
+        "total_properties": properties["total"],
+        "pending_properties": properties["pending"],
+        "verified_properties": properties["verified"],
+        "rejected_properties": properties["rejected"],
+        "suspended_properties": properties["suspended"],
+        "low_rating_properties": properties["low_rating"],
+        "active_boarding_assignments": BoardingAssignment.objects.filter(
+            student__school_id=school_id, status="active"
+        ).count(),
+        "open_critical_emergencies": EmergencyLog.objects.filter(
+            property__school_id=school_id,
+            severity__in=CRITICAL_SEVERITIES,
+            status__in=OPEN_EMERGENCY_STATUSES,
+        ).count(),
+        "pending_survey_responses": SurveyResponse.objects.filter(
+            survey__school_id=school_id, status="pending"
+        ).count(),
+        # JSON object keys are strings; keep them that way in memory too
+        "department_response_counts": {
+            str(dept_id): total
+            for dept_id, total in department_counts
+            if dept_id is not None
+        },
+    }
+
+
+def counted_fields(model_name, state):
+    """The integer figures one row counts towards, as :func:`compute_school_stats` counts them.
+
+    ``model_name`` is the row's ``_meta.model_name`` and ``state`` its
+    tracked column values (see core.signals); department counts of survey
+    responses are handled by the caller.
+    """
+    if model_name == "student":
+        return ["total_students"]
+    if model_name == "property":
+        fields = ["total_properties"]
+        if state["status"] in PROPERTY_STATUS_FIELDS:
+            fields.append(PROPERTY_STATUS_FIELDS[state["status"]])
+        rating = state["safety_rating"]
+        if state["status"] == "verified" and rating is not None and rating < LOW_SAFETY_RATING:
+            fields.append("low_rating_properties")
+        return fields
+    if model_name == "boardingassignment":
+        return ["active_boarding_assignments"] if state["status"] == "active" else []
+    if model_name == "emergencylog":
+        critical = state["severity"] in CRITICAL_SEVERITIES and state["status"] in OPEN_EMERGENCY_STATUSES
+        return ["open_critical_emergencies"] if critical else []
+    if model_name == "surveyresponse":
+        return ["pending_survey_responses"] if state["status"] == "pending" else []
+    return []
+
+
+def apply_deltas(school_id, counts, departments=None):
+    """Add ``counts`` ({figure: delta}) and ``departments`` ({department id: delta}) to a rollup row.
+
+    A school without a row yet gets one built from live counts instead,
+    which already include the change. Figures never drop below zero, so
+    earlier drift cannot make the update fail.
+    """
+    from .models import SchoolStats
+
+    counts = {field: delta for field, delta in counts.items() if delta}
+    departments = {str(key): delta for key, delta in (departments or {}).items() if delta}
+    if school_id is None or not (counts or departments):
+        return
+    updates = {
+        field: Greatest(F(field) + delta, Value(0)) for field, delta in counts.items()
+    }
+    rows = SchoolStats.objects.filter(school_id=school_id)
+    # Part of the caller's transaction when there is one, without a savepoint
+    with transaction.atomic(savepoint=False):
+        if departments:
+            # JSON counts cannot be updated in SQL portably; lock and merge
+            row = rows.select_for_update().only("department_response_counts").first()
+            if row is None:
+                refresh_school_stats(school_id)
+                return
+            merged = dict(row.department_response_counts)
+            for key, delta in departments.items():
+                total = merged.get(key, 0) + delta
+                if total > 0:
+                    merged[key] = total
+                else:
+                    merged.pop(key, None)
+            updates["department_response_counts"] = merged
+        if not rows.update(updated_at=timezone.now(), **updates):
+            refresh_school_stats(school_id)
+
+
+def refresh_school_stats(school_id):
+    """Recompute and store the rollup row of one school; returns it (or None)."""
+    from .models import School, SchoolStats
+
+    if not School.objects.filter(id=school_id).exists():
+        # The school itself was deleted (its rows cascade with it)
+        return None
+    stats, _ = SchoolStats.objects.update_or_create(
+        school_id=school_id, defaults=compute_school_stats(school_id)
+    )
+    return stats
+
+
+def get_school_stats(school):
+    """The rollup row of ``school``, built on first use."""
+    from .models import SchoolStats
+
+    try:
+        return SchoolStats.objects.get(school=school)
+    except SchoolStats.DoesNotExist:
+        return refresh_school_stats(school.id)
+
+
+# School ids with a refresh pending on this thread's connection
+_pending = threading.local()
+
+
+def _pending_ids():
+    if not hasattr(_pending, "ids"):
+        _pending.ids = set()
+    return _pending.ids
+
+
+def _refresh_pending(school_id):
+    pending = _pending_ids()
+    if school_id in pending:
+        pending.discard(school_id)
+        refresh_school_stats(school_id)
+
+
+def schedule_refresh(school_id):
+    """Refresh the rollup of ``school_id`` once the current transaction commits.
+
+    However often a transaction schedules a school, it is recomputed once:
+    the first callback to run refreshes it and the rest find nothing to
+    do. Every call still registers a callback, so a refresh survives the
+    rollback of the savepoint that first scheduled it.
+    """
+    if school_id is None:
+        return
+    _pending_ids().add(school_id)
+    transaction.on_commit(lambda: _refresh_pending(school_id))
@@ -0,0 +1,116 @@
+# core app survey_cache.py
+
+"""Compiled survey definitions for the public ``survey/<unique_code>/`` page.
+
+A definition is the survey plus its sections, questions and the school's
+department/program choices, flattened into plain dicts so the page renders
+from two cache reads instead of the survey tables. It lives in the shared
+cache (CACHES in settings.py, so every worker sees a bump) under the
+survey's current version; core.signals bumps the version when the survey
+is saved or deleted (survey_create saves it in the same transaction as its
+sections) and when one of the school's departments or programs changes.
+Bumping leaves the old definition to expire instead of deleting it, and
+versions are random tokens rather than counters, so an evicted version key
+can never resurrect a stale definition.
+"""
+
+import uuid
+
+from django.core.cache import cache
+
+SURVEY_CACHE_TIMEOUT = 60 * 60
+
+
+def _version_key(unique_code):
+    return f"core:survey:version:{unique_code}"
+
+
+def _definition_key(unique_code, version):
+    return f"core:survey:definition:{unique_code}:{version}"
+
+
+def survey_version(unique_code):
+    key = _version_key(unique_code)
+    version = cache.get(key)
+    if version is None:
+        # Another process may be doing the same; whoever adds first wins
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*unique_codes):
+    cache.set_many({_version_key(code): uuid.uuid4().hex for code in unique_codes}, None)
+
+
+def bump_school_surveys(school_id):
+    """Bump every survey of a school, e.g. when its department/program choices change."""
+    from .models import Survey
+
+    codes = list(Survey.objects.filter(school_id=school_id).values_list("unique_code", flat=True))
+    if codes:
+        bump_version(*codes)
+
+
+def compile_survey(survey):
+    """Plain-dict definition of ``survey`` as the survey_take page shows it."""
+    from .models import Department, Program
+
+    sections = survey.sections.prefetch_related("questions")
+    departments = Department.objects.filter(school_id=survey.school_id, is_active=True).order_by("name")
+    programs = (
+        Program.objects.filter(department__school_id=survey.school_id, is_active=True)
+        .select_related("department")
+        .order_by("name")
+    )
+    return {
+        "id": survey.id,
+        "school_id": survey.school_id,
+        "unique_code": survey.unique_code,
+        "title": survey.title,
+        "description": survey.description,
+        "require_property_info": survey.require_property_info,
+        "sections": [
+            {
+                "id": section.id,
+                "title": section.title,
+                "color": section.color,
+                "questions": [
+                    {
+                        "id": question.id,
+                        "text": question.text,
+                        "question_type": question.question_type,
+                        "options": question.options,
+                        "is_required": question.is_required,
+                    }
+                    for question in section.questions.all()
+                ],
+            }
+            for section in sections
+        ],
+        "departments": [{"id": dept.id, "name": dept.name} for dept in departments],
+        "programs": [
+            {
+                "id": prog.id,
+                "name": prog.name,
+                "department_id": prog.department_id,
+                "department_name": prog.department.name,
+            }
+            for prog in programs
+        ],
+    }
+
+
+def compiled_survey(unique_code):
+    """The active survey's compiled definition, or ``None`` if there is no such survey."""
+    from .models import Survey
+
+    key = _definition_key(unique_code, survey_version(unique_code))
+    definition = cache.get(key)
+    if definition is None:
+        survey = Survey.objects.filter(unique_code=unique_code, status="active").first()
+        if survey is None:
+            return None
+        definition = compile_survey(survey)
+        cache.set(key, definition, SURVEY_CACHE_TIMEOUT)
+    return definition
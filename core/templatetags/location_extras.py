@@ -2,7 +2,8 @@
 
 from django import template
 import json
-import ast
+
+from core.locations import format_location_parts, load_location_dict
 
 register = template.Library()
 
@@ -18,30 +19,11 @@ def format_location(value):
     """
     if not value:
         return ''
-    # If it's a dict-like object
-    if isinstance(value, dict):
-        parts = [value.get('province') or value.get('state') or '', value.get('city') or '', value.get('barangay') or '', value.get('address') or value.get('display_name') or '']
-        return ', '.join([p for p in parts if p and str(p).strip()])
-
-    # If string, try to parse JSON or Python literal
-    if isinstance(value, str):
-        s = value.strip()
-        # Try JSON
-        try:
-            parsed = json.loads(s)
-        except Exception:
-            try:
-                parsed = ast.literal_eval(s)
-            except Exception:
-                parsed = None
-        if isinstance(parsed, dict):
-            parts = [parsed.get('province') or parsed.get('state') or '', parsed.get('city') or '', parsed.get('barangay') or '', parsed.get('address') or parsed.get('display_name') or '']
-            return ', '.join([p for p in parts if p and str(p).strip()])
-        # Not a dict-like string -- return as-is
-        return s
-
-    # Fallback
-    return str(value)
+    # Only dict-like values need parsing; formatted strings are returned as-is
+    parts = load_location_dict(value)
+    if parts is not None:
+        return format_location_parts(parts)
+    return str(value).strip()
 
 
 @register.filter
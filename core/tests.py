@@ -1,3 +1,339 @@
-from django.test import TestCase
+import socketserver
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core.fallback_store import LEGACY_SEPARATOR, import_legacy_files, resend, store_message
+from core.locations import canonical_column_value, split_location
+from core.models import FallbackEmail, OutboundEmail
+from core.outbox import queue_email, send_batch, send_now
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept mail, like a local mail catcher."""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 localhost test SMTP")
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().rstrip("\r\n")
+            if not line:
+                return
+            command = line.split(" ", 1)[0].upper()
+            if command == "EHLO":
+                self.reply("250 localhost")
+            elif command in ("MAIL", "RSET"):
+                recipients = []
+                self.reply("250 OK")
+            elif command in ("HELO", "NOOP"):
+                self.reply("250 OK")
+            elif command == "RCPT":
+                address = line.split(":", 1)[1].strip(" <>")
+                if address in server.rejected:
+                    self.reply("550 No such user")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while (chunk := self.rfile.readline().decode()) not in (".\r\n", ""):
+                    data.append(chunk)
+                server.messages.append((recipients, "".join(data)))
+                self.reply("250 OK queued")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.connections = 0
+        self.messages = []
+        self.rejected = set()
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+class LocalSMTPTestCase(TestCase):
+    """Points the SMTP settings at a LocalSMTPServer and BASE_DIR at a temp dir."""
+
+    def setUp(self):
+        self.smtp = LocalSMTPServer().__enter__()
+        self.addCleanup(self.smtp.__exit__)
+        self.fallback_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.fallback_root.cleanup)
+        settings = override_settings(
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=self.smtp.server_address[1],
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False,
+            BASE_DIR=Path(self.fallback_root.name),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+
+class OutboxTests(LocalSMTPTestCase):
+    def test_batch_shares_one_connection(self):
+        for i in range(5):
+            queue_email(f"Hello {i}", "Body", [f"s{i}@example.com"])
+
+        self.assertEqual(send_batch(), {"sent": 5, "retrying": 0, "fallback": 0})
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(len(self.smtp.messages), 5)
+        self.assertIn("X-Outbox-Id:", self.smtp.messages[0][1])
+        self.assertFalse(OutboundEmail.objects.exclude(status="sent").exists())
+        # Nothing left to send
+        self.assertEqual(send_batch(), {"sent": 0, "retrying": 0, "fallback": 0})
+
+    def test_failed_message_backs_off_then_falls_back_to_store(self):
+        self.smtp.rejected.add("bad@example.com")
+        bad = queue_email("Hello", "Body", ["bad@example.com"])
+        queue_email("Hello", "Body", ["good@example.com"])
+        OutboundEmail.objects.filter(id=bad.id).update(max_attempts=2)
+
+        self.assertEqual(send_batch(), {"sent": 1, "retrying": 1, "fallback": 0})
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), ("queued", 1))
+        self.assertGreater(bad.next_attempt_at, timezone.now())
+        self.assertIn("SMTPRecipientsRefused", bad.last_error)
+        # Still backing off
+        self.assertEqual(send_batch(), {"sent": 0, "retrying": 0, "fallback": 0})
+
+        OutboundEmail.objects.filter(id=bad.id).update(next_attempt_at=timezone.now())
+        self.assertEqual(send_batch(), {"sent": 0, "retrying": 0, "fallback": 1})
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, "fallback")
+        self.assertEqual(bad.fallback.recipients, ["bad@example.com"])
+        self.assertEqual(bad.fallback.error_class, "SMTPRecipientsRefused")
+        self.assertIn(f"X-Outbox-Id: {bad.id}", bytes(bad.fallback.raw).decode())
+
+    def test_unreachable_server_retries_whole_batch(self):
+        queue_email("Hello", "Body", ["a@example.com"])
+        queue_email("Hello", "Body", ["b@example.com"])
+        self.smtp.__exit__()
+        self.assertEqual(send_batch(), {"sent": 0, "retrying": 2, "fallback": 0})
+
+    def test_send_now_delivers_in_the_request(self):
+        email = send_now("Access code", "123456", ["a@example.com"])
+        self.assertEqual((email.status, email.attempts), ("sent", 1))
+        self.assertEqual(len(self.smtp.messages), 1)
+
+    def test_send_now_leaves_failures_to_the_outbox(self):
+        self.smtp.__exit__()
+        email = send_now("Access code", "123456", ["a@example.com"])
+        self.assertEqual((email.status, email.attempts), ("queued", 1))
+        self.assertIn("ConnectionRefusedError", email.last_error)
+
+    def test_send_outbox_command(self):
+        queue_email("Hello", "Body", ["a@example.com"])
+        out = StringIO()
+        call_command("send_outbox", "--once", stdout=out)
+        self.assertIn("Emails sent: 1", out.getvalue())
+
+
+class FallbackStoreTests(LocalSMTPTestCase):
+    def _store(self, to, subject="Hello"):
+        from django.core.mail import EmailMessage
+
+        return store_message(EmailMessage(subject, "Body", "admin@example.com", to), ConnectionRefusedError())
+
+    def test_send_email_with_feedback_returns_stored_message(self):
+        from core.email_backend import send_email_with_feedback
+
+        self.smtp.__exit__()
+        used_fallback, result, message_id = send_email_with_feedback(
+            "Hello", "Body", "admin@example.com", ["a@example.com"]
+        )
+        self.assertEqual((used_fallback, result), (True, 1))
+        stored = FallbackEmail.objects.get(message_id=message_id)
+        self.assertEqual((stored.recipients, stored.error_class), (["a@example.com"], "ConnectionRefusedError"))
+
+    def test_resend_uses_one_connection_and_keeps_refused(self):
+        self.smtp.rejected.add("bad@example.com")
+        first = self._store(["a@example.com"])
+        bad = self._store(["bad@example.com"])
+        last = self._store(["b@example.com", "c@example.com"])
+
+        self.assertEqual(resend(FallbackEmail.objects.order_by("id")), {"sent": 2, "failed": 1})
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual([rcpts for rcpts, _ in self.smtp.messages], [["a@example.com"], ["b@example.com", "c@example.com"]])
+        self.assertIn(first.message_id, self.smtp.messages[0][1])
+        for row in (first, bad, last):
+            row.refresh_from_db()
+        self.assertIsNotNone(first.resent_at)
+        self.assertIsNone(bad.resent_at)
+        self.assertEqual(bad.resend_attempts, 1)
+        self.assertIn("SMTPRecipientsRefused", bad.last_error)
+
+    def test_resend_command_skips_resent_messages(self):
+        self._store(["a@example.com"])
+        self._store(["b@example.com"])
+        out = StringIO()
+        call_command("resend_fallback_emails", "--batch-size", "1", stdout=out)
+        self.assertIn("Emails resent: 2, failed: 0", out.getvalue())
+        self.assertEqual(self.smtp.connections, 2)
+
+        call_command("resend_fallback_emails", stdout=out)
+        self.assertEqual(len(self.smtp.messages), 2)
+
+    def test_compaction_imports_legacy_files_and_purges_resent(self):
+        from django.core.mail import EmailMessage
+
+        directory = Path(self.fallback_root.name, "sent_emails")
+        directory.mkdir()
+        messages = [
+            EmailMessage(f"Old {i}", "Body", "admin@example.com", [f"s{i}@example.com"]).message().as_bytes()
+            for i in range(2)
+        ]
+        (directory / "20251109-153347-1.log").write_bytes(b"".join(m + LEGACY_SEPARATOR for m in messages))
+        old = self._store(["a@example.com"])
+        FallbackEmail.objects.filter(id=old.id).update(resent_at=timezone.now() - timedelta(days=40))
+
+        out = StringIO()
+        call_command("compact_fallback_emails", stdout=out)
+        self.assertIn("Imported 2 message(s) from 1 legacy file(s); purged 1", out.getvalue())
+        self.assertFalse(any(directory.iterdir()))
+        imported = FallbackEmail.objects.order_by("id")
+        self.assertEqual([row.recipients for row in imported], [["s0@example.com"], ["s1@example.com"]])
+        self.assertEqual(imported[0].subject, "Old 0")
+        # Importing the same messages again does not duplicate them
+        (directory / "again.log").write_bytes(messages[0] + LEGACY_SEPARATOR)
+        self.assertEqual(import_legacy_files(directory), (1, 1))
+        self.assertEqual(FallbackEmail.objects.count(), 2)
+
+        resend(FallbackEmail.objects.all())
+        self.assertEqual(len(self.smtp.messages), 2)
+
+
+class EmailDeliveryLoggingTests(LocalSMTPTestCase):
+    def _send(self):
+        from django.core.mail import EmailMessage
+
+        from core.email_backend import FallbackEmailBackend
+
+        backend = FallbackEmailBackend()
+        message = EmailMessage("Hello", "Body", "admin@example.com", ["a@example.com", "b@example.com"])
+        with self.assertLogs("core.email", level="INFO") as logs:
+            sent = backend.send_messages([message])
+        self.assertEqual(sent, 1)
+        return logs.records[-1]
+
+    def test_smtp_send_is_logged_with_timings(self):
+        record = self._send()
+        self.assertEqual(record.getMessage(), "email.sent")
+        self.assertEqual((record.recipients, record.fallback), (2, False))
+        self.assertGreaterEqual(record.connect_ms, 0)
+        self.assertGreaterEqual(record.send_ms, 0)
+        self.assertEqual(len(self.smtp.messages), 1)
+
+    def test_fallback_is_logged_with_error_class(self):
+        self.smtp.__exit__()
+        record = self._send()
+        self.assertEqual(record.getMessage(), "email.fallback")
+        self.assertEqual(record.levelname, "WARNING")
+        self.assertTrue(record.fallback)
+        self.assertEqual(record.error_class, "ConnectionRefusedError")
+        self.assertEqual(record.fallback_ids, list(FallbackEmail.objects.values_list("id", flat=True)))
+
+    def test_queued_handler_writes_json_lines_off_thread(self):
+        import json
+        import logging
+
+        from core.logging_handlers import QueuedHandler
+
+        stream = StringIO()
+        handler = QueuedHandler(stream)
+        logger = logging.getLogger("core.tests.queued")
+        logger.addHandler(handler)
+        logger.propagate = False
+        self.addCleanup(logger.removeHandler, handler)
+        try:
+            logger.warning("email.%s", "fallback", extra={"recipients": 3, "error_class": "SMTPException"})
+            try:
+                raise ValueError("boom")
+            except ValueError:
+                logger.exception("email.failed")
+        finally:
+            handler.close()
+
+        first, second = (json.loads(line) for line in stream.getvalue().splitlines())
+        self.assertEqual(first["event"], "email.fallback")
+        self.assertEqual((first["recipients"], first["error_class"]), (3, "SMTPException"))
+        self.assertEqual(first["level"], "WARNING")
+        self.assertIn("ValueError: boom", second["exc_info"])
+
+
+class SplitLocationTests(SimpleTestCase):
+    def test_dict(self):
+        display, columns = split_location({
+            "region": "caraga region",
+            "province": "agusan del norte",
+            "city": "BUTUAN CITY",
+            "barangay": "Brgy. san vicente",
+            "address": "Purok 2",
+        })
+        self.assertEqual(display, "agusan del norte, BUTUAN CITY, Brgy. san vicente, Purok 2")
+        self.assertEqual(columns, {
+            "region": "Caraga",
+            "province": "Agusan del Norte",
+            "city": "Butuan City",
+            "barangay": "San Vicente",
+        })
+
+    def test_json_string(self):
+        display, columns = split_location('{"state": "Surigao del Sur", "city": "tandag city"}')
+        self.assertEqual(display, "Surigao del Sur, tandag city")
+        self.assertEqual(columns, {
+            "region": "Caraga",
+            "province": "Surigao del Sur",
+            "city": "Tandag City",
+            "barangay": "",
+        })
+
+    def test_free_text(self):
+        display, columns = split_location(" Caraga, AGUSAN DEL SUR, san jose de buan, barangay poblacion, Purok 3 ")
+        self.assertEqual(display, "Caraga, AGUSAN DEL SUR, san jose de buan, barangay poblacion, Purok 3")
+        self.assertEqual(columns, {
+            "region": "Caraga",
+            "province": "Agusan del Sur",
+            "city": "San Jose de Buan",
+            "barangay": "Poblacion",
+        })
+
+    def test_filter_values_match_the_stored_columns(self):
+        _, columns = split_location("Surigao del Norte, SURIGAO city, Brgy. Taft")
+        typed = {"province": "surigao DEL norte", "city": "surigao City", "barangay": "barangay TAFT"}
+        for column, value in typed.items():
+            self.assertEqual(canonical_column_value(column, value), columns[column])
+
+    def test_free_text_without_a_known_province(self):
+        display, columns = split_location("Near the market, Cebu")
+        self.assertEqual(display, "Near the market, Cebu")
+        self.assertEqual(set(columns.values()), {""})
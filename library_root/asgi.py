@@ -3,6 +3,14 @@ ASGI config for library_root project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the site through this module (e.g. ``uvicorn library_root.asgi:application``)
+so the messenger's server-sent event streams (``api/messenger/stream/``) run
+on the event loop instead of tying up one worker thread per open tab.
+
+This is required for live messenger updates. Under WSGI (plain
+``runserver``, gunicorn sync workers) the stream endpoint answers 503 and
+the messenger page falls back to polling every few seconds.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
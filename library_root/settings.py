@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -139,6 +140,26 @@ LOGOUT_REDIRECT_URL = "accounts:login"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Shared cache. Unread badge counts (core/badges.py), compiled survey
+# definitions (core/survey_cache.py) and feed page generations
+# (properties/feed.py) are invalidated through the cache, so every worker
+# process must see the same one; the per-process default (LocMemCache)
+# would keep serving stale values. Deployment: create the table once with
+# ``python manage.py createcachetable``, or switch to Redis, e.g.
+# {"BACKEND": "django.core.cache.backends.redis.RedisCache",
+#  "LOCATION": "redis://127.0.0.1:6379"} (needs the redis package).
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "django_cache",
+    }
+}
+
+# Messenger live updates (core/pubsub.py). The in-process backend reaches
+# streams served by the same ASGI worker; point this at a shared-broker
+# backend when running several workers.
+MESSENGER_PUBSUB_BACKEND = "core.pubsub.InProcessPubSub"
+
 # Email Configuration
 # Using custom fallback backend that tries SMTP first, then saves to files if SMTP fails
 EMAIL_BACKEND = "core.email_backend.FallbackEmailBackend"
@@ -159,6 +180,31 @@ EMAIL_USE_SSL = False
 # FROM address
 DEFAULT_FROM_EMAIL = "johnmartdepaz77@gmail.com"
 
+# Email delivery log (core.email): one JSON line per send with recipient
+# count, SMTP connect/send latency, fallback use and error class. Records
+# are written by a background thread so logging never blocks a request.
+# The test runner discards them; tests read them with assertLogs.
+TESTING = sys.argv[1:2] == ["test"]
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "email_delivery": (
+            {"class": "logging.NullHandler"}
+            if TESTING
+            else {"()": "core.logging_handlers.QueuedHandler"}
+        ),
+    },
+    "loggers": {
+        "core.email": {
+            "handlers": ["email_delivery"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
+
 # Alternative backends (uncomment to use):
 # Option 1: File-based only (saves emails to files - good for testing)
 # EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
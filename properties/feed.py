@@ -0,0 +1,470 @@
+# properties app feed.py
+
+"""Community feed engine shared by the property owner and student dashboards.
+
+Public posts of both roles live in ``properties.Post``. The feed orders them
+by ``(created_at, id)`` (or by day and a seeded rotation of each post's stored
+random rank for the "mixed" order) and pages through the result with an
+opaque keyset cursor, so fetching any page only touches about ``limit`` rows
+of a partial index over public posts instead of loading every post.
+
+Serialized pages are cached without the viewer's ``liked`` flags, which are
+overlaid per request with a single query. Cache keys carry a generation
+number that post, comment, image and like writes bump (see
+``properties.signals``), so a write retires every cached page at once; the
+cache is shared by all workers (CACHES in settings.py), so they all see it.
+"""
+
+import base64
+import hashlib
+import json
+import random
+import time as time_module
+from collections import defaultdict
+
+from core.locations import CARAGA_REGION, canonical_column_value
+from django.core.cache import cache
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import FEED_RANK_LIMIT, Comment, Post, PostImage, PostReaction
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+FEED_COMMENT_PREVIEW = 3
+
+ORDER_LATEST = "latest"
+ORDER_MIXED = "mixed"
+FEED_ORDERS = (ORDER_LATEST, ORDER_MIXED)
+
+# Sessions draw their "mixed" seed from a fixed pool so cached pages are shared
+FEED_SEED_POOL = 32
+
+FEED_CACHE_TIMEOUT = 60
+FEED_CACHE_GENERATION_KEY = "properties:feed:generation"
+FEED_CACHE_HITS_KEY = "properties:feed:hits"
+FEED_CACHE_MISSES_KEY = "properties:feed:misses"
+
+
+class InvalidCursor(ValueError):
+    """Raised when a feed cursor cannot be decoded."""
+
+
+def new_feed_seed():
+    return random.randrange(FEED_SEED_POOL) * (FEED_RANK_LIMIT // FEED_SEED_POOL) + 1
+
+
+def _sort_key(post, order):
+    """The cursor key of ``post``: its ordering columns, without the id."""
+    if order == ORDER_MIXED:
+        return [post.feed_day, post.feed_rank]
+    return [post.created_at]
+
+
+def encode_cursor(order, seed, sort_key, post_id):
+    key = [v.isoformat() if hasattr(v, "isoformat") else v for v in sort_key]
+    payload = json.dumps({"o": order, "s": seed, "k": key + [post_id]})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return ``{"order", "seed", "key"}`` for a cursor, or ``None`` if empty.
+
+    ``key`` is the sort key of the last post on the previous page followed
+    by its id.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        order, seed = payload["o"], int(payload["s"])
+        *sort_key, post_id = payload["k"]
+        if order == ORDER_MIXED:
+            bucket_raw, rank = sort_key
+            sort_key = [parse_date(bucket_raw), int(rank)]
+        elif order == ORDER_LATEST:
+            (created_raw,) = sort_key
+            sort_key = [parse_datetime(created_raw)]
+        else:
+            raise ValueError(order)
+    except (KeyError, TypeError, ValueError):
+        raise InvalidCursor("Invalid feed cursor")
+    if None in sort_key or not isinstance(post_id, int):
+        raise InvalidCursor("Invalid feed cursor")
+    return {"order": order, "seed": seed, "key": sort_key + [post_id]}
+
+
+def parse_page_size(value):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _location_q(filters):
+    """Translate the dashboard's location filters into indexed WHERE clauses.
+
+    Filter values are put in the canonical case the columns are stored in
+    (core.locations), so whatever the user typed is matched exactly.
+    """
+    q = Q()
+    if not filters:
+        return q
+    region = (filters.get("region") or "").strip()
+    # Only the Caraga region is served by the feed
+    if region and "caraga" in region.lower():
+        q &= Q(region=CARAGA_REGION)
+    for column in ("province", "city", "barangay"):
+        value = canonical_column_value(column, filters.get(column))
+        if value:
+            q &= Q(**{column: value})
+    return q
+
+
+def _keyset_q(sort_fields, cursor_key):
+    """Rows that sort strictly after ``cursor_key`` in ``(*sort_fields, id)`` descending."""
+    *values, cursor_id = cursor_key
+    q = Q(id__lt=cursor_id)
+    for field, value in reversed(list(zip(sort_fields, values))):
+        q = Q(**{f"{field}__lt": value}) | (Q(**{field: value}) & q)
+    return q
+
+
+def _mixed_page(qs, limit, cursor_key, seed):
+    """The first ``limit + 1`` posts of ``qs`` in "mixed" order after ``cursor_key``.
+
+    Within a day posts follow their stored ``feed_rank`` descending, rotated
+    by ``seed``: ranks below the seed first, then the rest. Each of those two
+    runs is one seek of ``prop_post_mixed_idx``, and the page moves on to
+    older days only while it is not full, so a page never reads more than
+    about ``limit`` rows per day it covers.
+    """
+    runs = (Q(feed_rank__lt=seed), Q(feed_rank__gte=seed))
+    if cursor_key is None:
+        day = qs.order_by("-feed_day").values_list("feed_day", flat=True).first()
+        after = None
+    else:
+        day, *after = cursor_key
+    posts = []
+    while day is not None:
+        first_run = 1 if after and after[0] >= seed else 0
+        for run in range(first_run, len(runs)):
+            run_qs = qs.filter(runs[run], feed_day=day)
+            if after and run == first_run:
+                run_qs = run_qs.filter(_keyset_q(["feed_rank"], after))
+            posts.extend(run_qs.order_by("-feed_rank", "-id")[: limit + 1])
+        if len(posts) > limit:
+            break
+        after = None
+        day = (
+            qs.filter(feed_day__lt=day)
+            .order_by("-feed_day")
+            .values_list("feed_day", flat=True)
+            .first()
+        )
+    return posts[: limit + 1]
+
+
+def fetch_feed_page(
+    limit=DEFAULT_PAGE_SIZE, cursor=None, filters=None, order=ORDER_LATEST, seed=0
+):
+    """Return ``(posts, next_cursor)`` for one page of the feed.
+
+    ``order`` is ``"latest"`` (newest first) or ``"mixed"``: days newest
+    first, shuffled within each day by ``seed``. The same seed always yields
+    the same order, so pages never overlap or skip posts. A cursor carries
+    its own order and seed and overrides the arguments. ``next_cursor`` is
+    ``None`` on the last page.
+    """
+    cursor_key = None
+    if cursor is not None:
+        order, seed, cursor_key = cursor["order"], cursor["seed"], cursor["key"]
+
+    qs = Post.objects.filter(is_public=True).filter(_location_q(filters))
+    if order == ORDER_MIXED:
+        posts = _mixed_page(qs, limit, cursor_key, seed)
+    else:
+        if cursor_key is not None:
+            qs = qs.filter(_keyset_q(["created_at"], cursor_key))
+        posts = list(qs.order_by("-created_at", "-id")[: limit + 1])
+    has_more = len(posts) > limit
+    posts = posts[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = posts[-1]
+        next_cursor = encode_cursor(order, seed, _sort_key(last, order), last.id)
+    return posts, next_cursor
+
+
+def _time_display(created_at, now):
+    post_age = now - created_at
+    if post_age.days > 0:
+        return f"{post_age.days}d ago"
+    if post_age.seconds > 3600:
+        return f"{post_age.seconds // 3600}h ago"
+    if post_age.seconds > 60:
+        return f"{post_age.seconds // 60}m ago"
+    return "just now"
+
+
+def _latest_comments(post_ids, per_post):
+    """The newest ``per_post`` comments of each post, in one windowed query."""
+    ranked = (
+        Comment.objects.filter(post_id__in=post_ids)
+        .annotate(
+            rank=Window(
+                expression=RowNumber(),
+                partition_by=[F("post_id")],
+                order_by=[F("created_at").desc(), F("id").desc()],
+            )
+        )
+        .filter(rank__lte=per_post)
+        .select_related("author")
+        .order_by("post_id", "rank")
+    )
+    latest = defaultdict(list)
+    for comment in ranked:
+        latest[comment.post_id].append(comment)
+    return latest
+
+
+def liked_post_ids(post_ids, user):
+    """The subset of ``post_ids`` that ``user`` has liked."""
+    if not post_ids or user is None or not user.is_authenticated:
+        return set()
+    return set(
+        PostReaction.objects.filter(user=user, post_id__in=post_ids).values_list(
+            "post_id", flat=True
+        )
+    )
+
+
+def enrich_feed_posts(posts, request_user=None):
+    """Load everything the feed cards need for ``posts`` in bulk.
+
+    Runs a fixed number of queries per page (images, latest comments, liked
+    posts and author profiles) no matter how many posts are on it. Returns
+    a dict keyed by post id. Without ``request_user`` every ``liked`` flag
+    is left ``False``.
+    """
+    from core.models import UserProfile
+
+    post_ids = [post.id for post in posts]
+    extras = {
+        post.id: {
+            "images": [],
+            "comments": [],
+            # Denormalized on the post; see api_post_comments
+            "comments_count": post.comment_count,
+            "liked": False,
+            "profile": None,
+        }
+        for post in posts
+    }
+    if not post_ids:
+        return extras
+
+    for image in PostImage.objects.filter(post_id__in=post_ids).order_by("id"):
+        extras[image.post_id]["images"].append(image.image.url)
+
+    for post_id, comments in _latest_comments(post_ids, FEED_COMMENT_PREVIEW).items():
+        extras[post_id]["comments"] = comments
+
+    for post_id in liked_post_ids(post_ids, request_user):
+        extras[post_id]["liked"] = True
+
+    author_ids = {post.author_id for post in posts if post.author_id}
+    if author_ids:
+        profiles = {
+            profile.user_id: profile
+            for profile in UserProfile.objects.filter(user_id__in=author_ids).only(
+                "user_id", "role", "profile_picture"
+            )
+        }
+        for post in posts:
+            extras[post.id]["profile"] = profiles.get(post.author_id)
+
+    return extras
+
+
+def serialize_feed_post(post, extra, now=None):
+    """Serialize a post returned by :func:`fetch_feed_page` for the feed API.
+
+    ``extra`` is the post's entry from :func:`enrich_feed_posts`.
+    """
+    from .views import _format_location_value
+
+    now = now or timezone.now()
+    source_key = post.source
+    user_type = post.author_role
+
+    comments_data = [
+        {
+            "id": c.id,
+            "author": c.author_name
+            or (c.author.get_full_name() if c.author else "Anonymous"),
+            "text": c.text,
+            "timestamp": c.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        for c in extra["comments"]
+    ]
+
+    # Get author role, preferring the author's profile over the post's role
+    author_role = post.get_author_role_display()
+    author_profile_picture = ""
+    profile = extra["profile"]
+    if profile:
+        if profile.role == "student":
+            author_role = "Student"
+        elif profile.role == "property_owner":
+            author_role = "Property Owner"
+        if profile.profile_picture:
+            author_profile_picture = profile.profile_picture.url
+
+    return {
+        "id": post.public_id,
+        "author_id": post.author_id,
+        "author_name": post.author_name or "Anonymous",
+        "author_profile_picture": author_profile_picture,
+        "author_role": author_role,
+        "message": post.message,
+        "location": _format_location_value(post.location) or "",
+        "likes": post.likes,
+        "images": extra["images"],
+        "comments": comments_data,
+        "comments_count": extra["comments_count"],
+        "timestamp": _time_display(post.created_at, now),
+        "created_at": post.created_at.isoformat(),
+        "created_display": timezone.localtime(post.created_at).strftime(
+            "%b %d, %Y %H:%M"
+        ),
+        "user_type": user_type,
+        "source": source_key,
+        "liked": extra["liked"],
+    }
+
+
+def _counter_incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        return cache.incr(key)
+
+
+def feed_generation():
+    # Start from the clock, not 1, so a generation lost to eviction can
+    # never come back and revive pages cached under the old number.
+    return cache.get_or_set(
+        FEED_CACHE_GENERATION_KEY, int(time_module.time() * 1000), None
+    )
+
+
+def bump_feed_generation():
+    """Retire every cached feed page; called after post/comment/like writes."""
+    try:
+        cache.incr(FEED_CACHE_GENERATION_KEY)
+    except ValueError:
+        feed_generation()
+
+
+def feed_cache_stats():
+    hits = cache.get(FEED_CACHE_HITS_KEY, 0)
+    misses = cache.get(FEED_CACHE_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+        "generation": feed_generation(),
+        "timeout": FEED_CACHE_TIMEOUT,
+    }
+
+
+def _page_cache_key(limit, cursor_token, filters, order, seed):
+    raw = json.dumps(
+        [limit, cursor_token, sorted(filters.items()), order, seed], separators=(",", ":")
+    )
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f"properties:feed:page:{feed_generation()}:{digest}"
+
+
+def _build_shared_page(limit, cursor, filters, order, seed):
+    """The user-independent part of a feed page, ready to be cached."""
+    posts, next_cursor = fetch_feed_page(
+        limit=limit, cursor=cursor, filters=filters, order=order, seed=seed
+    )
+    extras = enrich_feed_posts(posts)
+    now = timezone.now()
+    return {
+        # "pk" is the row id for the liked overlay; "id" is the public id
+        # (Post.public_id), which differs for posts copied from students
+        "posts": [
+            dict(serialize_feed_post(post, extras[post.id], now), pk=post.id)
+            for post in posts
+        ],
+        "order": cursor["order"] if cursor else order,
+        "next_cursor": next_cursor,
+    }
+
+
+def feed_page_response(request):
+    """Build the JSON payload for ``GET api/community-feed/``."""
+    limit = parse_page_size(request.GET.get("limit"))
+    filters = {
+        key: request.GET.get(key, "").strip()
+        for key in ("region", "province", "city", "barangay")
+    }
+    cursor_token = request.GET.get("cursor", "").strip()
+    try:
+        cursor = decode_cursor(cursor_token)
+    except InvalidCursor as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    order = request.GET.get("order", ORDER_MIXED)
+    if order not in FEED_ORDERS:
+        order = ORDER_MIXED
+    # One shuffle per session keeps "mixed" pages stable across requests
+    seed = request.session.get("feed_seed")
+    if seed is None:
+        seed = request.session["feed_seed"] = new_feed_seed()
+
+    key_seed = seed if (cursor["order"] if cursor else order) == ORDER_MIXED else 0
+    cache_key = _page_cache_key(limit, cursor_token, filters, order, key_seed)
+    page = cache.get(cache_key)
+    if page is None:
+        _counter_incr(FEED_CACHE_MISSES_KEY)
+        cache_status = "miss"
+        page = _build_shared_page(limit, cursor, filters, order, seed)
+        cache.set(cache_key, page, FEED_CACHE_TIMEOUT)
+    else:
+        _counter_incr(FEED_CACHE_HITS_KEY)
+        cache_status = "hit"
+
+    now = timezone.now()
+    liked = liked_post_ids([post["pk"] for post in page["posts"]], request.user)
+    posts = []
+    for post in page["posts"]:
+        post = dict(post, liked=post["pk"] in liked)
+        del post["pk"]
+        post["timestamp"] = _time_display(parse_datetime(post["created_at"]), now)
+        posts.append(post)
+
+    response = JsonResponse(
+        {
+            "success": True,
+            "posts": posts,
+            "limit": limit,
+            "order": page["order"],
+            "next_cursor": page["next_cursor"],
+            "has_more": page["next_cursor"] is not None,
+        }
+    )
+    response["X-Feed-Cache"] = cache_status
+    return response
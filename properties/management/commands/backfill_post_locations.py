@@ -0,0 +1,53 @@
+"""
+Management command to fill the structured location columns (region, province,
+city, barangay) of existing community posts from their free-form ``location``
+string. Safe to re-run; rows are processed in id-ordered chunks.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.locations import LOCATION_COLUMNS
+from properties.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Backfill structured location columns on community posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of posts to load and update per batch (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        fields = ['location', *LOCATION_COLUMNS]
+
+        updated = 0
+        last_id = 0
+        while True:
+            chunk = list(
+                Post.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .only('id', *fields)[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+
+            changed = []
+            for post in chunk:
+                before = [getattr(post, field) for field in fields]
+                post.set_location(post.location)
+                if [getattr(post, field) for field in fields] != before:
+                    changed.append(post)
+
+            if changed:
+                with transaction.atomic():
+                    Post.objects.bulk_update(changed, fields)
+                updated += len(changed)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Updated locations of {updated} post(s).')
+        )
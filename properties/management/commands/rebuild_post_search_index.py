@@ -0,0 +1,26 @@
+"""
+Management command to rebuild the community post search index (properties_post_fts).
+Signals keep the index current; run this after bulk imports, raw SQL edits or restores.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from properties import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index over community posts and comments'
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            self.stdout.write(
+                self.style.WARNING('Search index needs SQLite FTS5; nothing to rebuild on this database.')
+            )
+            return
+
+        search.ensure_index_table()
+        with transaction.atomic():
+            count = search.rebuild_index()
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully indexed {count} public post(s).')
+        )
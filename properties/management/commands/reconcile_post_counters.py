@@ -0,0 +1,66 @@
+"""
+Management command to repair drift in the denormalized ``likes`` and
+``comment_count`` counters of community posts. Counters are
+normally kept in step by api_toggle_like/api_post_comments; run this after
+bulk deletes or manual data fixes.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from properties.models import Comment, Post, PostReaction
+
+
+def _count_of(model):
+    counts = (
+        model.objects.filter(post=OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+class Command(BaseCommand):
+    help = 'Recompute likes and comment_count on community posts where they drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of drifted posts to repair per UPDATE (default: 500)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many posts have drifted',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+
+        drifted_ids = list(
+            Post.objects.annotate(
+                actual_comments=_count_of(Comment),
+                actual_likes=_count_of(PostReaction),
+            )
+            .filter(~Q(comment_count=F('actual_comments')) | ~Q(likes=F('actual_likes')))
+            .values_list('id', flat=True)
+        )
+
+        if not options['dry_run']:
+            for start in range(0, len(drifted_ids), chunk_size):
+                with transaction.atomic():
+                    Post.objects.filter(
+                        id__in=drifted_ids[start:start + chunk_size]
+                    ).update(
+                        comment_count=_count_of(Comment),
+                        likes=_count_of(PostReaction),
+                    )
+
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(
+            self.style.SUCCESS(f'{verb} {len(drifted_ids)} post(s) with drifted counters.')
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0003_post_feed_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='barangay',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='city',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='province',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='region',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+    ]
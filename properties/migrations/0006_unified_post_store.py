@@ -0,0 +1,112 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:41
+
+from django.db import migrations, models
+
+CHUNK_SIZE = 500
+
+
+def copy_student_posts(apps, schema_editor):
+    """Stream students.Post (and its images, comments, reactions) into properties.Post.
+
+    Rows are copied in id-ordered chunks so memory stays flat however many
+    posts exist. Each copied post remembers its old id in legacy_student_id.
+    bulk_create stamps "now" on the auto_now_add created_at columns, so the
+    original timestamps are written back afterwards.
+    """
+    StudentPost = apps.get_model('students', 'Post')
+    StudentPostImage = apps.get_model('students', 'PostImage')
+    StudentComment = apps.get_model('students', 'Comment')
+    StudentPostReaction = apps.get_model('students', 'PostReaction')
+    Post = apps.get_model('properties', 'Post')
+    PostImage = apps.get_model('properties', 'PostImage')
+    Comment = apps.get_model('properties', 'Comment')
+    PostReaction = apps.get_model('properties', 'PostReaction')
+
+    last_id = 0
+    while True:
+        chunk = list(StudentPost.objects.filter(id__gt=last_id).order_by('id')[:CHUNK_SIZE])
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+        old_ids = [post.id for post in chunk]
+
+        posts = Post.objects.bulk_create([
+            Post(
+                author_id=post.author_id,
+                author_name=post.author_name,
+                author_role='student',
+                legacy_student_id=post.id,
+                message=post.message,
+                location=post.location,
+                region=post.region,
+                province=post.province,
+                city=post.city,
+                barangay=post.barangay,
+                likes=post.likes,
+                comment_count=post.comment_count,
+                is_public=post.is_public,
+            )
+            for post in chunk
+        ])
+        new_ids = dict(
+            Post.objects.filter(legacy_student_id__in=old_ids).values_list('legacy_student_id', 'id')
+        )
+        _restore_created_at(Post, posts, chunk)
+
+        PostImage.objects.bulk_create([
+            PostImage(post_id=new_ids[image.post_id], image=image.image.name)
+            for image in StudentPostImage.objects.filter(post_id__in=old_ids).order_by('id')
+        ])
+        old_comments = list(StudentComment.objects.filter(post_id__in=old_ids).order_by('id'))
+        comments = Comment.objects.bulk_create([
+            Comment(
+                post_id=new_ids[comment.post_id],
+                author_id=comment.author_id,
+                author_name=comment.author_name,
+                text=comment.text,
+            )
+            for comment in old_comments
+        ])
+        _restore_created_at(Comment, comments, old_comments)
+        old_reactions = list(StudentPostReaction.objects.filter(post_id__in=old_ids).order_by('id'))
+        reactions = PostReaction.objects.bulk_create([
+            PostReaction(post_id=new_ids[reaction.post_id], user_id=reaction.user_id)
+            for reaction in old_reactions
+        ])
+        _restore_created_at(PostReaction, reactions, old_reactions)
+
+
+def _restore_created_at(model, copies, originals):
+    """Give bulk-created ``copies`` the created_at of their ``originals``.
+
+    Relies on bulk_create setting primary keys, as it does on SQLite and
+    PostgreSQL.
+    """
+    for copy, original in zip(copies, originals):
+        copy.created_at = original.created_at
+    model.objects.bulk_update(copies, ['created_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0005_post_comment_count'),
+        ('students', '0005_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='author_role',
+            field=models.CharField(choices=[('property_owner', 'Property Owner'), ('student', 'Student')], default='property_owner', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='legacy_student_id',
+            field=models.PositiveBigIntegerField(blank=True, null=True, unique=True),
+        ),
+        # Nothing to undo: students 0006 is unapplied first and brings the
+        # student tables back empty, so the copies stay here as the only
+        # record of those posts (as property-owner posts once author_role goes).
+        migrations.RunPython(copy_student_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+# Keep in step with properties/search.py
+FTS_TABLE = 'properties_post_fts'
+
+
+def _has_fts5(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return 'ENABLE_FTS5' in {row[0] for row in cursor.fetchall()}
+
+
+def create_search_index(apps, schema_editor):
+    """Create and fill the FTS5 index (SQLite with FTS5 only; otherwise icontains is used)"""
+    if not _has_fts5(schema_editor.connection):
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "message, location, comments, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, message, location, comments) "
+        "SELECT p.id, p.message, COALESCE(p.location, ''), "
+        "COALESCE((SELECT group_concat(c.text, char(10)) FROM properties_comment c "
+        "WHERE c.post_id = p.id), '') "
+        "FROM properties_post p WHERE p.is_public"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0006_unified_post_store'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0007_post_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='prop_post_feed_idx',
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-created_at', '-id'], name='prop_post_feed_idx'),
+        ),
+    ]
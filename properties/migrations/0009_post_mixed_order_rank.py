@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:05
+
+import django.utils.timezone
+import properties.models
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+CHUNK_SIZE = 500
+
+
+def fill_feed_order(apps, schema_editor):
+    """Give existing posts their local creation day and their own random rank.
+
+    AddField evaluates a callable default once, so every existing row starts
+    with today's date and the same rank.
+    """
+    Post = apps.get_model('properties', 'Post')
+    last_id = 0
+    while True:
+        chunk = list(
+            Post.objects.filter(id__gt=last_id).order_by('id').only('id', 'created_at')[:CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+        for post in chunk:
+            post.feed_day = timezone.localdate(post.created_at)
+            post.feed_rank = properties.models.random_feed_rank()
+        Post.objects.bulk_update(chunk, ['feed_day', 'feed_rank'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0008_post_feed_partial_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='feed_day',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='feed_rank',
+            field=models.PositiveIntegerField(default=properties.models.random_feed_rank),
+        ),
+        migrations.RunPython(fill_feed_order, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-feed_day', '-feed_rank', '-id'], name='prop_post_mixed_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:20
+
+from django.db import migrations
+from django.db.models import Max
+
+
+def move_post_ids_past_legacy_ids(apps, schema_editor):
+    """Keep new post ids clear of the old student post ids.
+
+    Student URLs resolve legacy_student_id first, so a post created after
+    0006 whose id equals a copied post's old id answered for that post.
+    Such posts get a fresh legacy_student_id (their public id) above every
+    id in use, and the id sequence moves past all of them.
+    """
+    Post = apps.get_model('properties', 'Post')
+    legacy_ids = Post.objects.filter(legacy_student_id__isnull=False).values('legacy_student_id')
+    top = max(
+        Post.objects.aggregate(top=Max('id'))['top'] or 0,
+        Post.objects.aggregate(top=Max('legacy_student_id'))['top'] or 0,
+    )
+    shadowed = Post.objects.filter(
+        author_role='student', legacy_student_id__isnull=True, id__in=legacy_ids
+    ).order_by('id')
+    for post in shadowed:
+        top += 1
+        post.legacy_student_id = top
+        post.save(update_fields=['legacy_student_id'])
+    if not top:
+        return
+
+    connection = schema_editor.connection
+    table = Post._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # AUTOINCREMENT tables take their next id from sqlite_sequence
+            cursor.execute(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s", [top, table]
+            )
+            cursor.execute(
+                "INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s "
+                "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)",
+                [table, top, table],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence(%s, 'id'), GREATEST(%s, "
+                f"(SELECT COALESCE(MAX(id), 1) FROM {connection.ops.quote_name(table)})))",
+                [table, top],
+            )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0009_post_mixed_order_rank'),
+    ]
+
+    operations = [
+        # Ids handed out meanwhile are not given back
+        migrations.RunPython(move_post_ids_past_legacy_ids, migrations.RunPython.noop),
+    ]
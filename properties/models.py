@@ -1,21 +1,103 @@
 # properties app models.py
 
+import random
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+from core.locations import split_location
+
+# URL/feed source key for each author role (``/api/post/<source>/<id>/``)
+SOURCE_ROLES = {
+    "property": "property_owner",
+    "student": "student",
+}
+ROLE_SOURCES = {role: source for source, role in SOURCE_ROLES.items()}
+
+# Exclusive upper bound of Post.feed_rank; feed seeds are drawn below it too
+FEED_RANK_LIMIT = 2**31 - 1
+
+
+def random_feed_rank():
+    return random.randrange(FEED_RANK_LIMIT)
 
 
 class Post(models.Model):
+    """A community post by a property owner or a student.
+
+    Both roles share this table; ``author_role`` tells them apart. Student
+    posts used to live in ``students.Post`` and keep their old id in
+    ``legacy_student_id``.
+    """
+
+    AUTHOR_ROLE_CHOICES = [
+        ("property_owner", "Property Owner"),
+        ("student", "Student"),
+    ]
+
     author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     author_name = models.CharField(max_length=255, blank=True, null=True)
+    author_role = models.CharField(
+        max_length=20, choices=AUTHOR_ROLE_CHOICES, default="property_owner"
+    )
+    legacy_student_id = models.PositiveBigIntegerField(null=True, blank=True, unique=True)
     message = models.TextField(blank=True)
     location = models.CharField(max_length=255, blank=True, null=True)
+    # Structured copy of ``location`` used by the feed filters (core.locations)
+    region = models.CharField(max_length=100, blank=True, default="", db_index=True)
+    province = models.CharField(max_length=100, blank=True, default="", db_index=True)
+    city = models.CharField(max_length=100, blank=True, default="", db_index=True)
+    barangay = models.CharField(max_length=100, blank=True, default="", db_index=True)
+    # Denormalized counters, kept in step with PostReaction/Comment rows by F() updates
     likes = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
     is_public = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # "mixed" feed order: the local day the post was made and a fixed random
+    # rank within that day (see properties/feed.py)
+    feed_day = models.DateField(default=timezone.localdate)
+    feed_rank = models.PositiveIntegerField(default=random_feed_rank)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the community feed (see properties/feed.py).
+            # Partial, because the feed filters on the bare boolean
+            # ``WHERE is_public``, which SQLite cannot seek an
+            # ``(is_public, ...)`` index with.
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(is_public=True),
+                name="prop_post_feed_idx",
+            ),
+            models.Index(
+                fields=["-feed_day", "-feed_rank", "-id"],
+                condition=models.Q(is_public=True),
+                name="prop_post_mixed_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Post {self.id} by {self.author or self.author_name}"
 
+    @property
+    def source(self):
+        """The ``property``/``student`` key used by the feed and post URLs."""
+        return ROLE_SOURCES.get(self.author_role, "property")
+
+    @property
+    def public_id(self):
+        """The ``<post_id>`` of the post's URLs: student posts keep their old id."""
+        if self.author_role == "student" and self.legacy_student_id is not None:
+            return self.legacy_student_id
+        return self.id
+
+    def set_location(self, raw_location):
+        """Store ``raw_location`` as a display string plus structured columns."""
+        display, columns = split_location(raw_location)
+        self.location = display
+        for field, value in columns.items():
+            setattr(self, field, value[:100])
+
 
 class PostImage(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='images')
@@ -0,0 +1,281 @@
+# properties app search.py
+
+"""Full-text search over community posts and their comments.
+
+Public posts are mirrored into an SQLite FTS5 table (``properties_post_fts``)
+with one row per post: its message, its location and the text of all of its
+comments. ``properties.signals`` keeps the table in sync on every post and
+comment write; ``rebuild_post_search_index`` recreates it from scratch.
+Results are ranked with ``bm25`` and paged with a keyset cursor on
+``(score, post id)``.
+
+A new comment is appended to its post's row; comment edits and deletes
+rebuild the row once per post when the transaction commits. On databases
+without FTS5 (not SQLite, or SQLite built without it) the search falls back
+to ``icontains`` matching.
+"""
+
+import base64
+import json
+import re
+import threading
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils import timezone
+
+from .feed import enrich_feed_posts, parse_page_size, serialize_feed_post
+from .models import Comment, Post
+
+FTS_TABLE = "properties_post_fts"
+
+# bm25 column weights: message, location, comments
+BM25_WEIGHTS = (4.0, 2.0, 1.0)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class InvalidSearchCursor(ValueError):
+    """Raised when a search cursor cannot be decoded."""
+
+
+# Whether each database (by alias) has FTS5, probed once per process
+_fts_support = {}
+
+
+def fts_available(using=None):
+    db = using or connection
+    if db.alias not in _fts_support:
+        supported = False
+        if db.vendor == "sqlite":
+            with db.cursor() as cursor:
+                cursor.execute("PRAGMA compile_options")
+                supported = "ENABLE_FTS5" in {row[0] for row in cursor.fetchall()}
+        _fts_support[db.alias] = supported
+    return _fts_support[db.alias]
+
+
+def ensure_index_table():
+    """Create the FTS5 table if it is missing (migration 0007 normally does)."""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "message, location, comments, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+
+def build_match_query(text):
+    """Turn free text into a safe FTS5 query: every word must match.
+
+    Words are quoted so user input can never be parsed as FTS5 syntax; the
+    last word is a prefix match so partially typed words still find posts.
+    """
+    tokens = _TOKEN_RE.findall(text or "")
+    if not tokens:
+        return ""
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _index_rows(posts):
+    """``(rowid, message, location, comments)`` rows for ``posts``."""
+    post_ids = [post.id for post in posts]
+    comments = {}
+    for post_id, text in (
+        Comment.objects.filter(post_id__in=post_ids)
+        .order_by("id")
+        .values_list("post_id", "text")
+    ):
+        comments.setdefault(post_id, []).append(text)
+    return [
+        (post.id, post.message or "", post.location or "", "\n".join(comments.get(post.id, [])))
+        for post in posts
+    ]
+
+
+def index_posts(posts):
+    """Insert or replace the index rows of ``posts`` (non-public posts are removed)."""
+    if not fts_available():
+        return
+    posts = list(posts)
+    if not posts:
+        return
+    public = [post for post in posts if post.is_public]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(post.id,) for post in posts]
+        )
+        if public:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, message, location, comments) "
+                "VALUES (%s, %s, %s, %s)",
+                _index_rows(public),
+            )
+
+
+def reindex_post(post_id):
+    post = Post.objects.filter(id=post_id).only("id", "message", "location", "is_public").first()
+    if post is None:
+        unindex_post(post_id)
+    else:
+        index_posts([post])
+
+
+def append_comment(post_id, text):
+    """Add one new comment's text to its post's row, without rereading the others."""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        # No row (a non-public post) means nothing to update
+        cursor.execute(
+            f"UPDATE {FTS_TABLE} SET comments = CASE WHEN comments = '' THEN %s "
+            "ELSE comments || char(10) || %s END WHERE rowid = %s",
+            [text or "", text or "", post_id],
+        )
+
+
+# Post ids with a reindex pending on this thread's connection
+_pending = threading.local()
+
+
+def _pending_ids():
+    if not hasattr(_pending, "ids"):
+        _pending.ids = set()
+    return _pending.ids
+
+
+def _reindex_pending(post_id):
+    pending = _pending_ids()
+    if post_id in pending:
+        pending.discard(post_id)
+        reindex_post(post_id)
+
+
+def schedule_reindex(post_id):
+    """Reindex ``post_id`` once the current transaction commits.
+
+    Deleting a post with a hundred comments, or editing many comments in
+    one transaction, rebuilds the post's row once rather than per comment.
+    """
+    _pending_ids().add(post_id)
+    transaction.on_commit(lambda: _reindex_pending(post_id))
+
+
+def unindex_post(post_id):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [post_id])
+
+
+def rebuild_index():
+    """Repopulate the whole index from ``properties_post``; returns the row count."""
+    if not fts_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, message, location, comments) "
+            "SELECT p.id, p.message, COALESCE(p.location, ''), "
+            "COALESCE((SELECT group_concat(c.text, char(10)) FROM properties_comment c "
+            "WHERE c.post_id = p.id), '') "
+            "FROM properties_post p WHERE p.is_public"
+        )
+        return cursor.rowcount
+
+
+def encode_cursor(score, post_id):
+    payload = json.dumps([score, post_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return ``(score, post_id)`` for a cursor, or ``None`` if empty."""
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        score, post_id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(score), int(post_id)
+    except (TypeError, ValueError):
+        raise InvalidSearchCursor("Invalid search cursor")
+
+
+def _search_fts(match, limit, cursor):
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    sql = (
+        f"SELECT rowid, score FROM ("
+        f"SELECT rowid, bm25({FTS_TABLE}, {weights}) AS score "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)"
+    )
+    params = [match]
+    if cursor is not None:
+        # bm25 is lower-is-better, so later pages have higher scores
+        sql += " WHERE score > %s OR (score = %s AND rowid > %s)"
+        params += [cursor[0], cursor[0], cursor[1]]
+    sql += " ORDER BY score, rowid LIMIT %s"
+    params.append(limit + 1)
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        return [(row[0], row[1]) for row in db_cursor.fetchall()]
+
+
+def _search_fallback(text, limit, cursor):
+    qs = Post.objects.filter(is_public=True)
+    for token in _TOKEN_RE.findall(text):
+        qs = qs.filter(
+            Q(message__icontains=token)
+            | Q(location__icontains=token)
+            | Q(comments__text__icontains=token)
+        )
+    if cursor is not None:
+        qs = qs.filter(id__lt=cursor[1])
+    ids = qs.distinct().order_by("-id").values_list("id", flat=True)[: limit + 1]
+    return [(post_id, 0.0) for post_id in ids]
+
+
+def search_posts(text, limit, cursor=None):
+    """Return ``(posts, next_cursor)`` for the best matches of ``text``."""
+    if fts_available():
+        match = build_match_query(text)
+        hits = _search_fts(match, limit, cursor) if match else []
+    else:
+        hits = _search_fallback(text, limit, cursor)
+
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+    loaded = Post.objects.in_bulk([post_id for post_id, _ in hits])
+    posts = [loaded[post_id] for post_id, _ in hits if post_id in loaded]
+
+    next_cursor = None
+    if has_more and hits:
+        next_cursor = encode_cursor(hits[-1][1], hits[-1][0])
+    return posts, next_cursor
+
+
+def search_page_response(request):
+    """Build the JSON payload for ``GET api/community-search/``."""
+    query = request.GET.get("q", "").strip()
+    limit = parse_page_size(request.GET.get("limit"))
+    try:
+        cursor = decode_cursor(request.GET.get("cursor", "").strip())
+    except InvalidSearchCursor as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    posts, next_cursor = search_posts(query, limit, cursor) if query else ([], None)
+    extras = enrich_feed_posts(posts, request.user)
+    now = timezone.now()
+    return JsonResponse(
+        {
+            "success": True,
+            "query": query,
+            "posts": [serialize_feed_post(post, extras[post.id], now) for post in posts],
+            "limit": limit,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
+        }
+    )
@@ -0,0 +1,60 @@
+# properties app signals.py
+
+"""Keep the community search index and the feed page cache in step with posts.
+
+The search index (properties/search.py) lives in the same database, so post
+writes and new comments update it in the same transaction; comment edits
+and deletes rebuild their post's row once, after the commit. The feed
+cache generation (properties/feed.py) is bumped
+only once the write has committed, so no reader can cache the old rows
+under the new generation.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import search
+from .feed import bump_feed_generation
+from .models import Comment, Post, PostImage, PostReaction
+
+
+@receiver(post_save, sender=Post, dispatch_uid="properties_index_post")
+def index_saved_post(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.reindex_post(instance.id)
+
+
+@receiver(post_delete, sender=Post, dispatch_uid="properties_unindex_post")
+def unindex_deleted_post(sender, instance, **kwargs):
+    search.unindex_post(instance.id)
+
+
+@receiver(post_save, sender=Comment, dispatch_uid="properties_index_comment")
+def index_saved_comment(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        search.append_comment(instance.post_id, instance.text)
+    else:
+        search.schedule_reindex(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment, dispatch_uid="properties_unindex_comment")
+def unindex_deleted_comment(sender, instance, **kwargs):
+    search.schedule_reindex(instance.post_id)
+
+
+@receiver(post_save, sender=Post, dispatch_uid="properties_feed_post_saved")
+@receiver(post_delete, sender=Post, dispatch_uid="properties_feed_post_deleted")
+@receiver(post_save, sender=Comment, dispatch_uid="properties_feed_comment_saved")
+@receiver(post_delete, sender=Comment, dispatch_uid="properties_feed_comment_deleted")
+@receiver(post_save, sender=PostImage, dispatch_uid="properties_feed_image_saved")
+@receiver(post_delete, sender=PostImage, dispatch_uid="properties_feed_image_deleted")
+@receiver(post_save, sender=PostReaction, dispatch_uid="properties_feed_like_saved")
+@receiver(post_delete, sender=PostReaction, dispatch_uid="properties_feed_like_deleted")
+def retire_cached_feed_pages(sender, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(bump_feed_generation)
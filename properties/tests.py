@@ -1,3 +1,652 @@
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from . import search, views
+from .feed import ORDER_LATEST, ORDER_MIXED, decode_cursor, fetch_feed_page, new_feed_seed
+from .models import Comment, Post, PostReaction
+
+
+class CommunityFeedQueryBudgetTests(TestCase):
+    """The feed must cost a fixed number of queries per page, not per post."""
+
+    # session + user lookups, page keys, post rows and the enrichment
+    # queries; reads and writes of the database cache table are not counted
+    QUERY_BUDGET = 16
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="viewer", password="pass1234")
+        author = User.objects.create_user(username="author", password="pass1234")
+        now = timezone.now()
+        for i in range(15):
+            for role in ("property_owner", "student"):
+                post = Post.objects.create(
+                    author=author,
+                    author_name="Author",
+                    author_role=role,
+                    message=f"post {i}",
+                )
+                for j in range(5):
+                    Comment.objects.create(post=post, author=author, text=f"comment {j}")
+                Post.objects.filter(id=post.id).update(
+                    created_at=now - timedelta(minutes=i), comment_count=5
+                )
+        liked_post = Post.objects.filter(author_role="property_owner").first()
+        PostReaction.objects.create(post=liked_post, user=cls.user)
+        Post.objects.filter(id=liked_post.id).update(likes=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username="viewer", password="pass1234")
+        # The first feed request stores the session's shuffle seed
+        self.client.get(reverse("properties:api_community_feed"))
+
+    def _fetch(self, limit, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                reverse("properties:api_community_feed"), {"limit": limit, **params}
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(
+            [q for q in ctx.captured_queries if "django_cache" not in q["sql"]]
+        )
+
+    def test_query_count_independent_of_page_size(self):
+        small, small_queries = self._fetch(2)
+        large, large_queries = self._fetch(20)
+        self.assertEqual(len(small["posts"]), 2)
+        self.assertEqual(len(large["posts"]), 20)
+        self.assertEqual(small_queries, large_queries)
+        self.assertLessEqual(large_queries, self.QUERY_BUDGET)
+
+    def test_enriched_fields(self):
+        data, _ = self._fetch(30)
+        for post in data["posts"]:
+            self.assertEqual(post["comments_count"], 5)
+            self.assertEqual(len(post["comments"]), 3)
+            self.assertEqual(post["comments"][0]["text"], "comment 4")
+        liked = [p for p in data["posts"] if p["liked"]]
+        self.assertEqual(len(liked), 1)
+        self.assertEqual(liked[0]["source"], "property")
+
+    def test_mixed_order_pages_are_stable(self):
+        walks = []
+        for _ in range(2):
+            seen, cursor = [], ""
+            while True:
+                data, _ = self._fetch(4, order="mixed", cursor=cursor)
+                seen.extend((p["source"], p["id"]) for p in data["posts"])
+                if not data["has_more"]:
+                    break
+                cursor = data["next_cursor"]
+            walks.append(seen)
+        self.assertEqual(walks[0], walks[1])
+        self.assertEqual(len(walks[0]), 30)
+        self.assertEqual(len(set(walks[0])), 30)
+
+
+class FeedQueryPlanTests(TestCase):
+    """Feed pages must seek an index, not scan and sort the posts table."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username="planner", password="pass1234")
+        for i in range(30):
+            Post.objects.create(author=author, message=f"post {i}", is_public=i % 5 != 0)
+
+    def _plans(self, **kwargs):
+        """The ``EXPLAIN QUERY PLAN`` of each posts query run by fetch_feed_page."""
+        with CaptureQueriesContext(connection) as ctx:
+            posts, next_cursor = fetch_feed_page(**kwargs)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in ctx.captured_queries:
+                if 'FROM "properties_post"' in query["sql"]:
+                    cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+                    plans.append(" / ".join(row[-1] for row in cursor.fetchall()))
+        return posts, next_cursor, plans
+
+    def test_latest_pages_seek_the_feed_index(self):
+        _, next_cursor, plans = self._plans(limit=5, order=ORDER_LATEST)
+        _, _, cursor_plans = self._plans(limit=5, cursor=decode_cursor(next_cursor))
+        for plan in plans + cursor_plans:
+            self.assertIn("USING INDEX prop_post_feed_idx", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+        self.assertIn("SEARCH", cursor_plans[0])
+
+    def test_location_filters_seek_their_column_index(self):
+        post = Post(author=Post.objects.first().author, message="room")
+        post.set_location("Agusan del Norte, Butuan City, Libertad")
+        post.save()
+        posts, _, plans = self._plans(
+            limit=5, order=ORDER_LATEST, filters={"city": "BUTUAN city", "barangay": "brgy. libertad"}
+        )
+        self.assertEqual(posts, [post])
+        self.assertRegex(plans[0], r"SEARCH properties_post USING INDEX properties_post_(city|barangay)_")
+
+    def test_mixed_pages_seek_one_day_at_a_time(self):
+        today = timezone.localdate()
+        Post.objects.filter(id__in=Post.objects.order_by("id")[:10].values("id")).update(
+            feed_day=today - timedelta(days=3)
+        )
+        seen, cursor = [], None
+        while True:
+            posts, next_cursor, plans = self._plans(
+                limit=4, cursor=cursor, order=ORDER_MIXED, seed=new_feed_seed()
+            )
+            for index, plan in enumerate(plans):
+                self.assertIn("USING INDEX prop_post_mixed_idx", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+                # Only the first page's lookup of the newest day reads the
+                # index from its start, and it stops after one entry
+                if cursor is not None or index:
+                    self.assertTrue(plan.startswith("SEARCH"), plan)
+            seen.extend(posts)
+            if next_cursor is None:
+                break
+            cursor = decode_cursor(next_cursor)
+        self.assertEqual(len(seen), 24)
+        self.assertEqual(len({post.id for post in seen}), 24)
+        days = [post.feed_day for post in seen]
+        self.assertEqual(days, sorted(days, reverse=True))
+
+
+class FeedPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username="alice", password="pass1234")
+        self.bob = User.objects.create_user(username="bob", password="pass1234")
+        self.post = Post.objects.create(author=self.alice, message="cached post")
+        self.feed_url = reverse("properties:api_community_feed")
+
+    def _fetch(self, username):
+        self.client.login(username=username, password="pass1234")
+        response = self.client.get(self.feed_url, {"order": "latest"})
+        self.assertEqual(response.status_code, 200)
+        return response["X-Feed-Cache"], response.json()["posts"]
+
+    def test_shared_page_with_per_user_liked_overlay(self):
+        PostReaction.objects.create(post=self.post, user=self.alice)
+        status, posts = self._fetch("alice")
+        self.assertEqual((status, posts[0]["liked"]), ("miss", True))
+        status, posts = self._fetch("bob")
+        self.assertEqual((status, posts[0]["liked"]), ("hit", False))
+
+    def test_writes_retire_cached_pages(self):
+        self.assertEqual(self._fetch("bob")[0], "miss")
+        self.assertEqual(self._fetch("bob")[0], "hit")
+        like_url = reverse("properties:api_toggle_like", args=["property", self.post.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(like_url)
+        status, posts = self._fetch("bob")
+        self.assertEqual(status, "miss")
+        self.assertEqual((posts[0]["likes"], posts[0]["liked"]), (1, True))
+
+    def test_liked_overlay_uses_row_ids_of_copied_student_posts(self):
+        # Copied from the old students tables: public id 9000, another row id
+        copied = Post.objects.create(
+            author=self.alice, author_role="student", legacy_student_id=9000, message="copied"
+        )
+        PostReaction.objects.create(post=copied, user=self.bob)
+        status, posts = self._fetch("bob")
+        liked = {post["id"]: post["liked"] for post in posts}
+        self.assertEqual(liked, {9000: True, self.post.id: False})
+        self.assertNotIn("pk", posts[0])
+
+    def test_stats_are_admin_only(self):
+        from core.models import UserProfile
+
+        self._fetch("bob")
+        self._fetch("bob")
+        url = reverse("properties:api_community_feed_cache_stats")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        UserProfile.objects.create(user=self.bob, role="school_admin")
+        stats = self.client.get(url).json()["cache"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+
+class PostCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="liker", password="pass1234")
+        self.client.login(username="liker", password="pass1234")
+        self.post = Post.objects.create(
+            author=self.user, author_role="student", message="hello"
+        )
+
+    def test_toggle_like_updates_counter(self):
+        url = reverse("properties:api_toggle_like", args=["student", self.post.id])
+        self.assertEqual(self.client.post(url).json()["likes"], 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, 1)
+        self.assertEqual(self.client.post(url).json()["likes"], 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, 0)
+
+    def test_comment_updates_counter(self):
+        url = reverse("properties:api_post_comments", args=["student", self.post.id])
+        for expected in (1, 2):
+            response = self.client.post(
+                url, data={"text": "nice"}, content_type="application/json"
+            )
+            self.assertEqual(response.json()["comment_count"], expected)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+
+    def test_edit_keeps_counters_changed_meanwhile(self):
+        load = views._get_post_or_404
+
+        def load_then_like(source, post_id):
+            loaded = load(source, post_id)
+            # A like and a comment land while the edit is in flight
+            Post.objects.filter(id=self.post.id).update(likes=5, comment_count=2)
+            return loaded
+
+        url = reverse("properties:api_edit_post", args=["student", self.post.id])
+        with mock.patch.object(views, "_get_post_or_404", load_then_like):
+            response = self.client.patch(
+                url, data={"message": "edited"}, content_type="application/json"
+            )
+        self.assertTrue(response.json()["success"])
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.message, self.post.likes, self.post.comment_count), ("edited", 5, 2))
+
+    def test_legacy_student_post_id_still_resolves(self):
+        self.post.legacy_student_id = self.post.id + 1000
+        self.post.save(update_fields=["legacy_student_id"])
+        url = reverse(
+            "properties:api_post_comments", args=["student", self.post.legacy_student_id]
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["post"]["id"], self.post.legacy_student_id)
+
+    def _move_ids_past_legacy_ids(self):
+        from importlib import import_module
+        from types import SimpleNamespace
+
+        from django.apps import apps
+
+        migration = import_module("properties.migrations.0010_post_ids_past_legacy_ids")
+        # The migration only needs the editor's connection
+        migration.move_post_ids_past_legacy_ids(apps, SimpleNamespace(connection=connection))
+
+    def _like(self, post):
+        url = reverse("properties:api_toggle_like", args=[post.source, post.public_id])
+        self.client.post(url)
+        post.refresh_from_db()
+        return post.likes
+
+    def test_new_post_ids_never_collide_with_legacy_ids(self):
+        # Copied posts whose old ids are the next ids the table would hand out
+        copied = [
+            Post.objects.create(
+                author=self.user, author_role="student", legacy_student_id=self.post.id + 3 + n
+            )
+            for n in (1, 2, 3)
+        ]
+        self._move_ids_past_legacy_ids()
+        newer = Post.objects.create(author=self.user, author_role="student", message="newer")
+        self.assertGreater(newer.id, max(post.legacy_student_id for post in copied))
+        self.assertEqual(self._like(newer), 1)
+        self.assertEqual([self._like(post) for post in copied], [1, 1, 1])
+
+    def test_shadowed_post_gets_a_public_id_of_its_own(self):
+        # Created before the fix: its id is a copied post's old id
+        copied = Post.objects.create(
+            author=self.user, author_role="student", legacy_student_id=self.post.id
+        )
+        self._move_ids_past_legacy_ids()
+        self.post.refresh_from_db()
+        self.assertNotEqual(self.post.public_id, copied.public_id)
+        self.assertGreater(self.post.public_id, copied.id)
+        self.assertEqual((self._like(self.post), self._like(copied)), (1, 1))
+
+
+class PostLocationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="locator", password="pass1234")
+
+    def _post(self, location, **columns):
+        # Saved as older code did: the columns are not derived from location
+        return Post.objects.create(author=self.user, message="room", location=location, **columns)
+
+    def test_backfill_fills_and_normalizes_columns(self):
+        unparsed = self._post("Agusan del Norte, butuan city, Brgy. Libertad")
+        miscased = self._post(
+            "Agusan del Norte, BUTUAN CITY, Doongan",
+            region="Caraga", province="Agusan del Norte", city="BUTUAN CITY", barangay="Doongan",
+        )
+        untouched = self._post("Cebu")
+        out = StringIO()
+        call_command("backfill_post_locations", "--chunk-size", "2", stdout=out)
+        self.assertIn("Updated locations of 2 post(s).", out.getvalue())
+        for post in (unparsed, miscased, untouched):
+            post.refresh_from_db()
+        self.assertEqual(
+            (unparsed.region, unparsed.province, unparsed.city, unparsed.barangay),
+            ("Caraga", "Agusan del Norte", "Butuan City", "Libertad"),
+        )
+        self.assertEqual(miscased.city, "Butuan City")
+        self.assertEqual(untouched.city, "")
+        out = StringIO()
+        call_command("backfill_post_locations", stdout=out)
+        self.assertIn("Updated locations of 0 post(s).", out.getvalue())
+
+    def test_feed_filters_ignore_case_but_match_whole_names(self):
+        butuan = Post(author=self.user, message="room")
+        butuan.set_location("Agusan del Norte, Butuan City, Libertad")
+        butuan.save()
+        other = Post(author=self.user, message="room")
+        other.set_location("Agusan del Norte, Butuan, Libertad")
+        other.save()
+        self.client.login(username="locator", password="pass1234")
+        response = self.client.get(
+            reverse("properties:api_community_feed"),
+            {"province": "AGUSAN DEL NORTE", "city": "butuan city"},
+        )
+        self.assertEqual([p["id"] for p in response.json()["posts"]], [butuan.id])
+
+
+class CommunitySearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="searcher", password="pass1234")
+        self.client.login(username="searcher", password="pass1234")
+        self.url = reverse("properties:api_community_search")
+
+    def _post(self, message, role="property_owner", **kwargs):
+        return Post.objects.create(
+            author=self.user, author_role=role, message=message, **kwargs
+        )
+
+    def _search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_matches_message_location_and_comments(self):
+        by_message = self._post("Bedspace near the campus gate")
+        by_location = self._post("Room for rent", location="Butuan City, Agusan del Norte")
+        by_comment = self._post("Any vacancies?", role="student")
+        Comment.objects.create(post=by_comment, author=self.user, text="Try the bedspace on 5th")
+        self._post("Hidden bedspace", is_public=False)
+
+        ids = {p["id"] for p in self._search(q="bedspace")["posts"]}
+        self.assertEqual(ids, {by_message.id, by_comment.id})
+        ids = {p["id"] for p in self._search(q="butu")["posts"]}
+        self.assertEqual(ids, {by_location.id})
+
+    def test_index_follows_edits_and_deletes(self):
+        post = self._post("Looking for a roommate")
+        post.message = "Looking for a boardmate"
+        post.save()
+        self.assertEqual(self._search(q="roommate")["posts"], [])
+        self.assertEqual(len(self._search(q="boardmate")["posts"]), 1)
+        post.delete()
+        self.assertEqual(self._search(q="boardmate")["posts"], [])
+
+    def test_new_comments_are_appended_without_rereading_the_thread(self):
+        post = self._post("Room near the plaza")
+        Comment.objects.create(post=post, author=self.user, text="Is it still open?")
+        with CaptureQueriesContext(connection) as queries:
+            Comment.objects.create(post=post, author=self.user, text="Has aircon")
+        self.assertFalse(
+            [q for q in queries.captured_queries if 'FROM "properties_comment"' in q["sql"]]
+        )
+        self.assertEqual(len(self._search(q="still open aircon")["posts"]), 1)
+
+    def test_comment_edits_and_deletes_reindex_once_on_commit(self):
+        post = self._post("Room near the plaza")
+        comments = [
+            Comment.objects.create(post=post, author=self.user, text=f"ask {i}") for i in range(3)
+        ]
+        with mock.patch.object(search, "reindex_post", wraps=search.reindex_post) as reindex:
+            with self.captureOnCommitCallbacks(execute=True):
+                comments[0].text = "balcony"
+                comments[0].save()
+                comments[1].delete()
+            self.assertEqual(reindex.call_count, 1)
+        self.assertEqual(len(self._search(q="balcony")["posts"]), 1)
+        self.assertEqual(self._search(q="ask 1")["posts"], [])
+
+    def test_fts_probe_reads_sqlite_compile_options(self):
+        db = mock.MagicMock(alias="probe", vendor="sqlite")
+        db.cursor.return_value.__enter__.return_value.fetchall.return_value = [("ENABLE_FTS4",)]
+        with mock.patch.dict(search._fts_support, clear=True):
+            self.assertFalse(search.fts_available(db))
+            db.cursor.return_value.__enter__.return_value.fetchall.return_value = [("ENABLE_FTS5",)]
+            # The answer is kept for the life of the process
+            self.assertFalse(search.fts_available(db))
+            search._fts_support.clear()
+            self.assertTrue(search.fts_available(db))
+
+    def test_cursor_pages_cover_every_match_once(self):
+        for i in range(7):
+            self._post(f"wifi ready room {i}" + " wifi" * (i % 3))
+        seen, cursor = [], ""
+        while True:
+            data = self._search(q="wifi", limit=3, cursor=cursor)
+            seen.extend(p["id"] for p in data["posts"])
+            if not data["has_more"]:
+                break
+            cursor = data["next_cursor"]
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_query_syntax_is_not_interpreted(self):
+        self._post('Room "A" OR NEAR(')
+        self.assertEqual(len(self._search(q='"A" OR NEAR(')["posts"]), 1)
+
+
+class MessengerStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="pass1234")
+        cls.tenant = User.objects.create_user(username="tenant", password="pass1234")
+
+    def test_send_message_publishes_to_both_participants(self):
+        from core.messaging import user_channel
+
+        self.client.login(username="tenant", password="pass1234")
+        url = reverse("properties:api_send_message", args=[self.owner.id])
+        with mock.patch("core.messaging.publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(url, {"data": json.dumps({"content": "Is the room free?"})})
+        events = [(call.args[0], call.args[1]["event"]) for call in publish.call_args_list]
+        self.assertIn((user_channel(self.owner.id), "new_message"), events)
+        self.assertIn((user_channel(self.tenant.id), "new_message"), events)
+        unread = [c.args[1] for c in publish.call_args_list if c.args[1]["event"] == "unread"]
+        self.assertEqual(unread, [{"event": "unread", "data": {"unread": 1}}])
+
+    def test_stream_refuses_wsgi_so_the_page_polls(self):
+        self.client.login(username="owner", password="pass1234")
+        response = self.client.get(reverse("properties:api_messenger_stream"))
+        self.assertEqual(response.status_code, 503)
+
+    async def test_stream_delivers_published_events(self):
+        from core.messaging import user_channel
+        from core.pubsub import publish
+
+        await self.async_client.aforce_login(self.owner)
+        response = await self.async_client.get(reverse("properties:api_messenger_stream"))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b"retry:"))
+        self.assertEqual(await anext(stream), b'event: unread\ndata: {"unread": 0}\n\n')
+
+        publish(user_channel(self.owner.id), {"event": "new_message", "data": {"id": 7}})
+        self.assertEqual(await anext(stream), b'event: new_message\ndata: {"id": 7}\n\n')
+        await stream.aclose()
+
+
+class ConversationListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from core.models import Conversation, Message
+
+        cls.me = User.objects.create_user(username="me", password="pass1234")
+        for i in range(12):
+            other = User.objects.create_user(username=f"contact{i}", password="pass1234")
+            conv = Conversation.objects.create(
+                participant1=cls.me, participant2=other
+            )
+            Message.objects.create(conversation=conv, sender=cls.me, content="hi")
+            for j in range(i % 3):
+                Message.objects.create(conversation=conv, sender=other, content=f"reply {j}")
+        call_command("rebuild_conversation_summaries", stdout=StringIO())
+
+    def test_list_costs_fixed_queries(self):
+        self.client.login(username="me", password="pass1234")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("properties:api_conversations"))
+        conversations = response.json()["conversations"]
+        self.assertEqual(len(conversations), 12)
+        # session, user, conversations with summaries, avatars
+        self.assertLessEqual(len(ctx.captured_queries), 4)
+
+        by_name = {c["participant"]["username"]: c for c in conversations}
+        self.assertEqual(by_name["contact0"]["unread_count"], 0)
+        self.assertEqual(by_name["contact0"]["last_message"]["content"], "hi")
+        self.assertEqual(by_name["contact5"]["unread_count"], 2)
+        self.assertEqual(by_name["contact5"]["last_message"]["content"], "reply 1")
+
+
+class MessageHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from core.models import Conversation, Message
+
+        cls.owner = User.objects.create_user(username="owner", password="pass1234")
+        cls.tenant = User.objects.create_user(username="tenant", password="pass1234")
+        cls.conv = Conversation.objects.create(participant1=cls.owner, participant2=cls.tenant)
+        cls.ids = [
+            Message.objects.create(
+                conversation=cls.conv,
+                sender=cls.owner if i % 2 else cls.tenant,
+                content=f"message {i}",
+            ).id
+            for i in range(25)
+        ]
+        call_command("rebuild_conversation_summaries", stdout=StringIO())
+
+    def setUp(self):
+        self.client.login(username="owner", password="pass1234")
+        self.url = reverse("properties:api_conversation_messages", args=[self.conv.id])
+
+    def test_history_pages_newest_first(self):
+        seen, before = [], ""
+        while True:
+            with CaptureQueriesContext(connection) as ctx:
+                data = self.client.get(self.url, {"limit": 10, "before": before}).json()
+            self.assertLessEqual(len(ctx.captured_queries), 6)
+            page = [m["id"] for m in data["messages"]]
+            self.assertEqual(page, sorted(page))
+            seen = page + seen
+            if not data["has_more"]:
+                break
+            before = data["next_before"]
+        self.assertEqual(seen, self.ids)
+
+    def test_since_returns_only_newer_messages(self):
+        data = self.client.get(self.url, {"since": self.ids[-3]}).json()
+        self.assertEqual([m["id"] for m in data["messages"]], self.ids[-2:])
+        self.assertEqual(data["latest_id"], self.ids[-1])
+        data = self.client.get(self.url, {"since": self.ids[-1]}).json()
+        self.assertEqual(data["messages"], [])
+        self.assertEqual(data["latest_id"], self.ids[-1])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.url, {"before": "x"}).status_code, 400)
+
+    def test_opening_moves_read_watermark(self):
+        self.conv.refresh_from_db()
+        self.assertEqual(self.conv.get_unread_count(self.owner), 13)
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(self.url, {"limit": 5}).json()
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.conv.refresh_from_db()
+        self.assertEqual(self.conv.participant1_last_read_message_id, self.ids[-1])
+        self.assertEqual(self.conv.get_unread_count(self.owner), 0)
+        self.assertEqual(self.conv.get_unread_count(self.tenant), 12)
+        read_flags = {m["sender_id"]: m["is_read"] for m in data["messages"]}
+        self.assertEqual(read_flags, {self.tenant.id: True, self.owner.id: False})
+
+
+class ConversationSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="pass1234")
+        cls.tenant = User.objects.create_user(username="tenant", password="pass1234")
+
+    def _send(self, username, recipient, content):
+        self.client.login(username=username, password="pass1234")
+        url = reverse("properties:api_send_message", args=[recipient.id])
+        return self.client.post(url, {"data": json.dumps({"content": content})}).json()
+
+    def test_send_and_delete_maintain_summary(self):
+        from core.models import Conversation
+
+        self._send("tenant", self.owner, "first")
+        sent = self._send("tenant", self.owner, "x" * 150)
+        conv = Conversation.objects.get(id=sent["conversation_id"])
+        self.assertEqual(conv.last_message_id, sent["message"]["id"])
+        self.assertEqual(conv.last_message_preview, "x" * 100)
+        self.assertEqual(conv.last_sender_id, self.tenant.id)
+        self.assertEqual(conv.get_unread_count(self.owner), 2)
+        self.assertEqual(conv.get_unread_count(self.tenant), 0)
+
+        self.client.delete(reverse("properties:api_delete_message", args=[sent["message"]["id"]]))
+        conv.refresh_from_db()
+        self.assertEqual(conv.last_message_preview, "first")
+        self.assertEqual(conv.get_unread_count(self.owner), 1)
+
+        fields = ("last_message_id", "participant1_unread_count", "participant2_unread_count")
+        before = {field: getattr(conv, field) for field in fields}
+        call_command("rebuild_conversation_summaries", stdout=StringIO())
+        conv.refresh_from_db()
+        self.assertEqual(before, {field: getattr(conv, field) for field in fields})
+
+
+class UnreadBadgeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="pass1234")
+        cls.tenant = User.objects.create_user(username="tenant", password="pass1234")
+
+    def setUp(self):
+        cache.clear()
+
+    def _badge(self, username):
+        self.client.login(username=username, password="pass1234")
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(reverse("properties:api_unread_badge")).json()
+        return data, ctx.captured_queries
+
+    def test_badge_follows_send_and_read_without_sql(self):
+        self.assertEqual(self._badge("owner")[0]["unread_messages"], 0)
+
+        self.client.login(username="tenant", password="pass1234")
+        send_url = reverse("properties:api_send_message", args=[self.owner.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            sent = self.client.post(send_url, {"data": json.dumps({"content": "hello"})})
+        data, queries = self._badge("owner")
+        self.assertEqual((data["unread_messages"], data["total"]), (1, 1))
+        # Only the session and user lookups of the login machinery
+        self.assertFalse([q for q in queries if "core_" in q["sql"]])
 
-# Create your tests here.
+        url = reverse(
+            "properties:api_conversation_messages", args=[sent.json()["conversation_id"]]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(url)
+        self.assertEqual(self._badge("owner")[0]["unread_messages"], 0)
@@ -61,6 +61,8 @@ urlpatterns = [
         views.api_delete_message,
         name="api_delete_message",
     ),
+    path("api/messenger/stream/", views.api_messenger_stream, name="api_messenger_stream"),
+    path("api/unread-badge/", views.api_unread_badge, name="api_unread_badge"),
     # User Profile API Endpoint
     path("api/user/<int:user_id>/", views.api_user_profile, name="api_user_profile"),
     # Full page messenger
@@ -69,6 +71,16 @@ urlpatterns = [
     path("api/create-post/", views.api_create_post, name="api_create_post"),
     # Community Feed API
     path("api/community-feed/", views.api_community_feed, name="api_community_feed"),
+    path(
+        "api/community-feed/cache-stats/",
+        views.api_community_feed_cache_stats,
+        name="api_community_feed_cache_stats",
+    ),
+    path(
+        "api/community-search/",
+        views.api_community_search,
+        name="api_community_search",
+    ),
     path(
         "api/post/<str:source>/<int:post_id>/toggle-like/",
         views.api_toggle_like,
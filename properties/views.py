@@ -3,9 +3,11 @@
 import ast
 import base64
 import json
-import random
 import uuid
 
+from asgiref.sync import sync_to_async
+from core import badges, messaging
+from core.locations import format_location_parts, load_location_dict
 from core.models import (
     BoardingAssignment,
     MaintenanceRequest,
@@ -18,61 +20,63 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.core.files.base import ContentFile
-from django.db import models
-from django.http import Http404, JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.db import models, transaction
+from django.db.models import F
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from students.models import Comment as StudentsComment
-from students.models import Post as StudentsPost
-from students.models import PostReaction as StudentsPostReaction
 
-# Post models (created below in properties.models)
-from .models import Comment, Post, PostImage, PostReaction
+# Post models (shared by property owners and students)
+from .feed import feed_cache_stats, feed_page_response
+from .search import search_page_response
+from .models import SOURCE_ROLES, Comment, Post, PostImage, PostReaction
 
 ALLOWED_SECTIONS = {"home", "my-home", "survey", "notifications", "trash", "profile"}
 
-SOURCE_MODEL_MAP = {
-    "property": (Post, Comment, PostReaction),
-    "student": (StudentsPost, StudentsComment, StudentsPostReaction),
-}
-
 
 def _normalize_source(source):
     key = (source or "").lower()
-    if key not in SOURCE_MODEL_MAP:
+    if key not in SOURCE_ROLES:
         raise Http404("Invalid post source")
-    return key, SOURCE_MODEL_MAP[key]
+    return key
+
+
+def _get_post_or_404(source, post_id, queryset=None):
+    """Resolve ``/api/post/<source>/<post_id>/`` to a post.
+
+    Student posts copied over from the old students tables answer on their
+    previous ids (``legacy_student_id``, see ``Post.public_id``); only student
+    posts written since then are looked up by ``id``. Migration 0010 keeps
+    the two apart: new ids start above every legacy id.
+    """
+    source_key = _normalize_source(source)
+    qs = (queryset if queryset is not None else Post.objects).filter(
+        author_role=SOURCE_ROLES[source_key]
+    )
+    if source_key == "student":
+        post = (
+            qs.filter(legacy_student_id=post_id).first()
+            or qs.filter(id=post_id, legacy_student_id__isnull=True).first()
+        )
+    else:
+        post = qs.filter(id=post_id).first()
+    if post is None:
+        raise Http404("Post not found")
+    return source_key, post
 
 
 def _format_location_value(value):
     if not value:
         return ""
-    if isinstance(value, dict):
-        parts = [
-            value.get("province") or value.get("state") or "",
-            value.get("city") or "",
-            value.get("barangay") or "",
-            value.get("address") or value.get("display_name") or "",
-        ]
-        return ", ".join([str(p).strip() for p in parts if p and str(p).strip()])
-    if isinstance(value, str):
-        stripped = value.strip()
-        try:
-            loaded = json.loads(stripped)
-            if isinstance(loaded, dict):
-                return _format_location_value(loaded)
-        except Exception:
-            try:
-                loaded = ast.literal_eval(stripped)
-                if isinstance(loaded, dict):
-                    return _format_location_value(loaded)
-            except Exception:
-                pass
-        return stripped
-    return str(value)
+    # Stored locations are already formatted; only legacy dict values need parsing
+    parts = load_location_dict(value)
+    if parts is not None:
+        return format_location_parts(parts)
+    return str(value).strip()
 
 
 def _serialize_comment(comment, request_user=None):
@@ -113,7 +117,7 @@ def _serialize_post(post_obj, source_key):
         author_profile_picture = post_obj.author.profile.profile_picture.url
 
     return {
-        "id": post_obj.id,
+        "id": post_obj.public_id,
         "author_name": post_obj.author.get_full_name()
         if post_obj.author
         else (post_obj.author_name or "Anonymous"),
@@ -177,7 +181,7 @@ def owner_dashboard(request, section="home"):
     # Build a public posts feed (includes others' posts and your own) - ordered by newest first (news feed algorithm)
     try:
         posts_qs = (
-            Post.objects.filter(is_public=True)
+            Post.objects.filter(is_public=True, author_role="property_owner")
             .select_related("author")
             .prefetch_related("images", "comments")
             .order_by("-created_at")[:50]
@@ -190,7 +194,7 @@ def owner_dashboard(request, section="home"):
                 liked = PostReaction.objects.filter(post=p, user=request.user).exists()
             owner_posts.append(
                 {
-                    "id": p.id,
+                    "id": p.public_id,
                     "likes": p.likes,
                     "author": p.author,  # Pass author object for profile picture access
                     "author_id": p.author.id if p.author else None,
@@ -419,62 +423,24 @@ def api_create_post(request):
         location = raw_location
         if not location and request.user.profile:
             profile = request.user.profile
-            location_parts = []
-            if profile.boarding_region:
-                location_parts.append(profile.boarding_region)
-            if profile.boarding_province:
-                location_parts.append(profile.boarding_province)
-            if profile.boarding_city:
-                location_parts.append(profile.boarding_city)
-            if profile.boarding_barangay:
-                location_parts.append(f"Brgy. {profile.boarding_barangay}")
-            if profile.boarding_address:
-                location_parts.append(profile.boarding_address)
-            location = ", ".join(location_parts) if location_parts else ""
-
-        # Normalize location: if client sent a JSON/object string, convert to a readable single string
-        def normalize_location(loc_raw):
-            if not loc_raw:
-                return ""
-            if isinstance(loc_raw, str):
-                s = loc_raw.strip()
-                try:
-                    parsed = json.loads(s)
-                except json.JSONDecodeError:
-                    try:
-                        parsed = ast.literal_eval(s)
-                    except Exception:
-                        parsed = None
-                if isinstance(parsed, dict):
-                    parts = [
-                        parsed.get("province") or parsed.get("state") or "",
-                        parsed.get("city") or "",
-                        parsed.get("barangay") or "",
-                        parsed.get("address") or parsed.get("display_name") or "",
-                    ]
-                    parts = [p for p in parts if p and str(p).strip()]
-                    return ", ".join(parts)
-                return s
-            if isinstance(loc_raw, dict):
-                parts = [
-                    loc_raw.get("province") or loc_raw.get("state") or "",
-                    loc_raw.get("city") or "",
-                    loc_raw.get("barangay") or "",
-                    loc_raw.get("address") or loc_raw.get("display_name") or "",
-                ]
-                parts = [p for p in parts if p and str(p).strip()]
-                return ", ".join(parts)
-            return str(loc_raw)
-
-        location = normalize_location(location)
-
-        post = Post.objects.create(
+            location = {
+                "region": profile.boarding_region,
+                "province": profile.boarding_province,
+                "city": profile.boarding_city,
+                "barangay": profile.boarding_barangay,
+                "address": profile.boarding_address,
+            }
+
+        post = Post(
             author=request.user,
             author_name=request.user.get_full_name(),
+            author_role="property_owner",
             message=content,
-            location=location,
             is_public=True,
         )
+        # Normalizes JSON/object strings into a readable string + location columns
+        post.set_location(location)
+        post.save()
 
         # Handle uploaded files
         files = request.FILES.getlist("images")
@@ -483,7 +449,7 @@ def api_create_post(request):
 
         # Render the post HTML using the partial
         post_dict = {
-            "id": post.id,
+            "id": post.public_id,
             "likes": post.likes,
             "author_id": post.author.id if post.author else None,
             "author_full_name": post.author.get_full_name()
@@ -694,92 +660,55 @@ def api_get_trashed_rooms(request, property_id):
 @require_http_methods(["GET"])
 def api_conversations(request):
     """Get all conversations for the current user"""
-    from core.models import Conversation
-
-    conversations = (
-        Conversation.objects.filter(
-            models.Q(participant1=request.user) | models.Q(participant2=request.user)
-        )
-        .prefetch_related("messages")
-        .order_by("-updated_at")
-    )
-
-    conv_data = []
-    for conv in conversations:
-        other_user = conv.get_other_user(request.user)
-        last_message = conv.get_last_message()
-        unread_count = conv.get_unread_count(request.user)
-
-        conv_data.append(
-            {
-                "id": conv.id,
-                "participant": {
-                    "id": other_user.id,
-                    "name": other_user.get_full_name() or other_user.username,
-                    "username": other_user.username,
-                    "avatar": other_user.profile.get_profile_photo()
-                    if hasattr(other_user, "profile")
-                    else None,
-                },
-                "last_message": {
-                    "content": last_message.content[:100] if last_message else "",
-                    "sender_id": last_message.sender.id if last_message else None,
-                    "created_at": last_message.created_at.isoformat()
-                    if last_message
-                    else None,
-                    "is_read": last_message.is_read if last_message else True,
-                }
-                if last_message
-                else None,
-                "unread_count": unread_count,
-                "updated_at": conv.updated_at.isoformat(),
-            }
-        )
-
-    return JsonResponse({"conversations": conv_data})
+    return JsonResponse({"conversations": messaging.conversation_summaries(request.user)})
 
 
 @login_required
 @require_http_methods(["GET"])
 def api_conversation_messages(request, conversation_id):
-    """Get all messages in a conversation"""
-    from core.models import Conversation, Message
+    """Get a page of messages in a conversation
+
+    Returns the newest ``limit`` messages, or those older than ``before``
+    (a message id, see ``next_before``). ``since=<message_id>`` returns only
+    the messages newer than that id instead.
+    """
+    from core.models import Conversation
 
     # Find conversation where user is either participant1 or participant2
     try:
-        conv = Conversation.objects.filter(
-            models.Q(id=conversation_id, participant1=request.user)
-            | models.Q(id=conversation_id, participant2=request.user)
-        ).first()
+        conv = (
+            Conversation.objects.filter(
+                models.Q(id=conversation_id, participant1=request.user)
+                | models.Q(id=conversation_id, participant2=request.user)
+            )
+            .select_related("participant1__profile", "participant2__profile")
+            .first()
+        )
         if not conv:
             return JsonResponse({"error": "Conversation not found"}, status=404)
     except:
         return JsonResponse({"error": "Conversation not found"}, status=404)
 
-    messages_qs = Message.objects.filter(conversation=conv).select_related("sender")
-
-    # Mark messages as read
-    Message.objects.filter(conversation=conv).exclude(sender=request.user).update(
-        is_read=True
-    )
+    try:
+        before = int(request.GET["before"]) if request.GET.get("before") else None
+        since = int(request.GET["since"]) if request.GET.get("since") else None
+    except ValueError:
+        return JsonResponse({"error": "Invalid message cursor"}, status=400)
+    limit = messaging.parse_message_limit(request.GET.get("limit"))
 
-    messages_data = []
-    for msg in messages_qs:
-        messages_data.append(
-            {
-                "id": msg.id,
-                "sender_id": msg.sender.id,
-                "sender_name": msg.sender.get_full_name() or msg.sender.username,
-                "sender_avatar": msg.sender.profile.get_profile_photo()
-                if hasattr(msg.sender, "profile")
-                else None,
-                "content": msg.content,
-                "is_read": msg.is_read,
-                "created_at": msg.created_at.isoformat(),
-            }
-        )
+    # Mark messages as read: moves this user's watermark, a single-row update
+    if conv.mark_read(request.user):
+        messaging.publish_unread(request.user)
 
-    return JsonResponse({"messages": messages_data})
+    page, has_more = messaging.message_page(conv, before=before, since=since, limit=limit)
+    return JsonResponse(
+        {
+            "messages": messaging.serialize_messages(page, conv),
+            "has_more": has_more,
+            "next_before": page[0].id if page and has_more and since is None else None,
+            "latest_id": page[-1].id if page else since,
+        }
+    )
 
 
 @login_required
@@ -808,16 +737,19 @@ def api_send_message(request, participant_id):
     if not content:
         return JsonResponse({"error": "Message cannot be empty"}, status=400)
 
-    # Get or create conversation (order-independent)
-    conv, created = Conversation.objects.get_or_create(
-        participant1=min(request.user, recipient, key=lambda u: u.id),
-        participant2=max(request.user, recipient, key=lambda u: u.id),
-    )
+    with transaction.atomic():
+        # Get or create conversation (order-independent)
+        conv, created = Conversation.objects.get_or_create(
+            participant1=min(request.user, recipient, key=lambda u: u.id),
+            participant2=max(request.user, recipient, key=lambda u: u.id),
+        )
 
-    # Create message
-    message = Message.objects.create(
-        conversation=conv, sender=request.user, content=content
-    )
+        # Create message and update the conversation's summary fields
+        message = Message.objects.create(
+            conversation=conv, sender=request.user, content=content
+        )
+        conv.record_message(message)
+        messaging.publish_new_message(message, recipient)
 
     return JsonResponse(
         {
@@ -840,8 +772,14 @@ def api_delete_message(request, message_id):
     from core.models import Message
 
     try:
-        message = Message.objects.get(id=message_id, sender=request.user)
-        message.delete()
+        message = Message.objects.select_related("conversation").get(
+            id=message_id, sender=request.user
+        )
+        recipient = message.conversation.get_other_user(request.user)
+        with transaction.atomic():
+            message.conversation.forget_message(message)
+            messaging.publish_message_deleted(message, recipient)
+            message.delete()
         return JsonResponse({"success": True})
     except Message.DoesNotExist:
         return JsonResponse(
@@ -849,6 +787,50 @@ def api_delete_message(request, message_id):
         )
 
 
+@login_required
+@require_http_methods(["GET"])
+def api_unread_badge(request):
+    """Unread message and notification counts for the navbar badge
+
+    Served from the per-user counter cache in core/badges.py; one cache read once warm.
+    """
+    counts = badges.get_badge_counts(request.user)
+    return JsonResponse(
+        {
+            "success": True,
+            **counts,
+            "total": counts["unread_messages"] + counts["unread_notifications"],
+        }
+    )
+
+
+@login_required
+@require_http_methods(["GET"])
+async def api_messenger_stream(request):
+    """Server-sent event stream of the current user's messenger events
+
+    Pushes ``new_message``, ``message_deleted`` and ``unread`` events (see
+    core/messaging.py). Needs the ASGI server (library_root/asgi.py): under
+    WSGI Django would buffer the endless body and the request would hang,
+    so it answers 503 and the messenger page polls instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "Live updates need the ASGI server"}, status=503)
+    user = await request.auser()
+    # Subscribe before reading the unread total so no event can slip between
+    subscription = messaging.subscribe_user(user.id)
+    unread = await sync_to_async(messaging.unread_total)(user)
+    response = StreamingHttpResponse(
+        messaging.event_stream(
+            subscription, initial_events=[{"event": "unread", "data": {"unread": unread}}]
+        ),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @login_required
 @require_http_methods(["GET"])
 def api_user_profile(request, user_id):
@@ -953,304 +935,39 @@ def profile_setup(request):
 @login_required
 @require_http_methods(["GET"])
 def api_community_feed(request):
-    """API endpoint to get community news feed - all public posts from all users (students + properties)"""
+    """API endpoint to get community news feed - all public posts from all users (students + properties)
+
+    Paginated by an opaque ``cursor`` (``next_cursor`` from the previous page).
+    """
     try:
-        import json
-        from datetime import timedelta
-
-        from core.models import UserProfile
-        from django.db.models import CharField, Count, Value
-        from django.db.models.functions import Concat
-        from django.utils import timezone
-        from students.models import Post as StudentsPost
-
-        # Get page for pagination
-        page = int(request.GET.get("page", 1))
-        limit = int(request.GET.get("limit", 10))
-        offset = (page - 1) * limit
-
-        # Get location filters - Only allow Caraga region
-        filter_region = request.GET.get("region", "").strip()
-        filter_province = request.GET.get("province", "").strip()
-        filter_city = request.GET.get("city", "").strip()
-        filter_barangay = request.GET.get("barangay", "").strip()
-
-        # Restrict region to Caraga only
-        if filter_region and "caraga" not in filter_region.lower():
-            filter_region = ""
-
-        # Get all public posts from both students and properties
-        student_posts = (
-            StudentsPost.objects.filter(is_public=True)
-            .select_related("author")
-            .prefetch_related("images", "comments")
-            .annotate(
-                engagement_score=Count("comments"),
-                user_type=Value("student", output_field=CharField()),
-            )
-            .values(
-                "id",
-                "author_id",
-                "author_name",
-                "message",
-                "location",
-                "likes",
-                "created_at",
-                "engagement_score",
-                "user_type",
-            )
-        )
+        return feed_page_response(request)
+    except Exception as e:
+        import traceback
 
-        property_posts = (
-            Post.objects.filter(is_public=True)
-            .select_related("author")
-            .prefetch_related("images", "comments")
-            .annotate(
-                engagement_score=Count("comments"),
-                user_type=Value("property_owner", output_field=CharField()),
-            )
-            .values(
-                "id",
-                "author_id",
-                "author_name",
-                "message",
-                "location",
-                "likes",
-                "created_at",
-                "engagement_score",
-                "user_type",
-            )
-        )
+        traceback.print_exc()
+        return JsonResponse({"success": False, "error": str(e)}, status=500)
 
-        # Combine both querysets and mix by recency and randomness
-        all_posts = list(student_posts) + list(property_posts)
-
-        # Apply location filters if provided (Caraga region focus)
-        if filter_region or filter_province or filter_city or filter_barangay:
-            filtered_posts = []
-            for post_data in all_posts:
-                location_str = str(post_data.get("location", "") or "").lower()
-
-                # Try to parse as JSON first, then as string
-                location_obj = None
-                try:
-                    if location_str.startswith("{"):
-                        location_obj = json.loads(location_str)
-                except:
-                    pass
-
-                matches = True
-
-                # Check region (must be Caraga if specified)
-                if filter_region:
-                    region_match = False
-                    if location_obj:
-                        region_val = str(location_obj.get("region", "") or "").lower()
-                        if "caraga" in region_val:
-                            region_match = True
-                    elif "caraga" in location_str:
-                        region_match = True
-
-                    if not region_match:
-                        matches = False
-
-                # Check province (within Caraga)
-                if matches and filter_province:
-                    province_match = False
-                    if location_obj:
-                        province_val = str(
-                            location_obj.get("province", "") or ""
-                        ).lower()
-                        if filter_province.lower() in province_val:
-                            province_match = True
-                    elif filter_province.lower() in location_str:
-                        province_match = True
-
-                    if not province_match:
-                        matches = False
-
-                # Check city/municipality
-                if matches and filter_city:
-                    city_match = False
-                    if location_obj:
-                        city_val = str(location_obj.get("city", "") or "").lower()
-                        if filter_city.lower() in city_val:
-                            city_match = True
-                    elif filter_city.lower() in location_str:
-                        city_match = True
-
-                    if not city_match:
-                        matches = False
-
-                # Check barangay
-                if matches and filter_barangay:
-                    barangay_match = False
-                    if location_obj:
-                        barangay_val = str(
-                            location_obj.get("barangay", "") or ""
-                        ).lower()
-                        if filter_barangay.lower() in barangay_val:
-                            barangay_match = True
-                    elif filter_barangay.lower() in location_str:
-                        barangay_match = True
-
-                    if not barangay_match:
-                        matches = False
-
-                if matches:
-                    filtered_posts.append(post_data)
-
-            all_posts = filtered_posts
-
-        # Sort by created_at, handling both datetime objects and strings
-        def get_sort_key(post):
-            created = post.get("created_at")
-            if isinstance(created, str):
-                from django.utils.dateparse import parse_datetime
-
-                parsed = parse_datetime(created)
-                return parsed if parsed else timezone.now()
-            return created if created else timezone.now()
-
-        all_posts.sort(key=get_sort_key, reverse=True)
-        latest_slice = all_posts[:5]
-        remaining_slice = all_posts[5:]
-        random.shuffle(remaining_slice)
-        mixed_posts = latest_slice + remaining_slice
-
-        # Apply pagination
-        paginated_posts = mixed_posts[offset : offset + limit]
-
-        posts_data = []
-        for post_data in paginated_posts:
-            # Determine which model to get full post from
-            source_key = (
-                "student" if post_data["user_type"] == "student" else "property"
-            )
-            if source_key == "student":
-                post_obj = (
-                    StudentsPost.objects.select_related("author")
-                    .prefetch_related("images", "comments")
-                    .get(id=post_data["id"])
-                )
-                reaction_model = StudentsPostReaction
-            else:
-                post_obj = (
-                    Post.objects.select_related("author")
-                    .prefetch_related("images", "comments")
-                    .get(id=post_data["id"])
-                )
-                reaction_model = PostReaction
-
-            # Get images
-            images = [img.image.url for img in post_obj.images.all()]
-
-            # Get recent comments (limit to 3)
-            comments = post_obj.comments.all().order_by("-created_at")[:3]
-            comments_data = [
-                {
-                    "id": c.id,
-                    "author": c.author_name
-                    or (c.author.get_full_name() if c.author else "Anonymous"),
-                    "text": c.text,
-                    "timestamp": c.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                }
-                for c in comments
-            ]
-
-            # Calculate post age for display
-            now = timezone.now()
-            created_at = post_data["created_at"]
-            if isinstance(created_at, str):
-                from django.utils.dateparse import parse_datetime
-
-                created_at = parse_datetime(created_at) or timezone.now()
-            post_age = now - created_at
-
-            if post_age.days > 0:
-                time_display = f"{post_age.days}d ago"
-            elif post_age.seconds > 3600:
-                time_display = f"{post_age.seconds // 3600}h ago"
-            elif post_age.seconds > 60:
-                time_display = f"{post_age.seconds // 60}m ago"
-            else:
-                time_display = "just now"
-
-            # Get author role
-            author_role = "Student"
-            if post_data["user_type"] == "property_owner":
-                author_role = "Property Owner"
-
-            # Try to get user role from UserProfile
-            if post_data["author_id"]:
-                try:
-                    user_profile = UserProfile.objects.get(
-                        user_id=post_data["author_id"]
-                    )
-                    if user_profile.role == "student":
-                        author_role = "Student"
-                    elif user_profile.role == "property_owner":
-                        author_role = "Property Owner"
-                except:
-                    pass
 
-            liked = False
-            if request.user.is_authenticated:
-                liked = reaction_model.objects.filter(
-                    post=post_obj, user=request.user
-                ).exists()
-
-            # Get author profile picture
-            author_profile_picture = ""
-            if post_obj.author:
-                try:
-                    profile = UserProfile.objects.get(user=post_obj.author)
-                    if profile.profile_picture:
-                        author_profile_picture = profile.profile_picture.url
-                except UserProfile.DoesNotExist:
-                    pass
-
-            posts_data.append(
-                {
-                    "id": post_data["id"],
-                    "author_id": post_data["author_id"],
-                    "author_name": post_data["author_name"] or "Anonymous",
-                    "author_profile_picture": author_profile_picture,
-                    "author_role": author_role,
-                    "message": post_data["message"],
-                    "location": _format_location_value(post_data["location"]) or "",
-                    "likes": post_obj.likes,
-                    "images": images,
-                    "comments": comments_data,
-                    "comments_count": post_obj.comments.count(),
-                    "timestamp": time_display,
-                    "created_at": created_at.isoformat()
-                    if hasattr(created_at, "isoformat")
-                    else str(created_at),
-                    "created_display": timezone.localtime(created_at).strftime(
-                        "%b %d, %Y %H:%M"
-                    )
-                    if hasattr(created_at, "strftime")
-                    else str(created_at),
-                    "user_type": post_data["user_type"],
-                    "source": source_key,
-                    "liked": liked,
-                }
-            )
+@login_required
+@require_http_methods(["GET"])
+def api_community_feed_cache_stats(request):
+    """API endpoint with the feed page cache hit/miss counters (school admins only)"""
+    profile = getattr(request.user, "profile", None)
+    if profile is None or profile.role != "school_admin":
+        return JsonResponse({"success": False, "error": "Access denied"}, status=403)
+    return JsonResponse({"success": True, "cache": feed_cache_stats()})
 
-        total_count = len(mixed_posts)
 
-        return JsonResponse(
-            {
-                "success": True,
-                "posts": posts_data,
-                "page": page,
-                "limit": limit,
-                "total_count": total_count,
-                "has_more": offset + limit < total_count,
-            }
-        )
+@login_required
+@require_http_methods(["GET"])
+def api_community_search(request):
+    """API endpoint to full-text search public posts and their comments
 
+    ``q`` is the search text; results are best-match first and paginated by
+    an opaque ``cursor`` (``next_cursor`` from the previous page).
+    """
+    try:
+        return search_page_response(request)
     except Exception as e:
         import traceback
 
@@ -1261,36 +978,39 @@ def api_community_feed(request):
 @login_required
 @require_http_methods(["POST"])
 def api_toggle_like(request, source, post_id):
-    source_key, (PostModel, CommentModel, ReactionModel) = _normalize_source(source)
-    post = get_object_or_404(PostModel, id=post_id)
+    source_key, post = _get_post_or_404(source, post_id)
 
-    reaction, created = ReactionModel.objects.get_or_create(
-        post=post, user=request.user
-    )
-    if not created:
-        reaction.delete()
-        liked = False
-    else:
-        liked = True
-
-    post.likes = ReactionModel.objects.filter(post=post).count()
-    post.save(update_fields=["likes"])
+    # The reaction row and the likes counter change together or not at all
+    with transaction.atomic():
+        reaction, created = PostReaction.objects.get_or_create(
+            post=post, user=request.user
+        )
+        if created:
+            Post.objects.filter(id=post.id).update(likes=F("likes") + 1)
+            liked = True
+        else:
+            reaction.delete()
+            Post.objects.filter(id=post.id, likes__gt=0).update(
+                likes=F("likes") - 1
+            )
+            liked = False
+        likes = Post.objects.values_list("likes", flat=True).get(id=post.id)
 
-    return JsonResponse({"success": True, "liked": liked, "likes": post.likes})
+    return JsonResponse({"success": True, "liked": liked, "likes": likes})
 
 
 @login_required
 @require_http_methods(["GET", "POST"])
 def api_post_comments(request, source, post_id):
-    source_key, (PostModel, CommentModel, ReactionModel) = _normalize_source(source)
-    post = get_object_or_404(
-        PostModel.objects.select_related("author").prefetch_related("images"),
-        id=post_id,
+    source_key, post = _get_post_or_404(
+        source,
+        post_id,
+        Post.objects.select_related("author").prefetch_related("images"),
     )
 
     if request.method == "GET":
         comments_qs = (
-            CommentModel.objects.filter(post=post)
+            Comment.objects.filter(post=post)
             .select_related("author", "author__profile")
             .order_by("created_at")
         )
@@ -1316,14 +1036,19 @@ def api_post_comments(request, source, post_id):
             {"success": False, "error": "Comment text is required."}, status=400
         )
 
-    comment = CommentModel.objects.create(
-        post=post,
-        author=request.user,
-        author_name=request.user.get_full_name() or request.user.username,
-        text=text,
-    )
-
-    total_comments = CommentModel.objects.filter(post=post).count()
+    with transaction.atomic():
+        comment = Comment.objects.create(
+            post=post,
+            author=request.user,
+            author_name=request.user.get_full_name() or request.user.username,
+            text=text,
+        )
+        Post.objects.filter(id=post.id).update(
+            comment_count=F("comment_count") + 1
+        )
+        total_comments = Post.objects.values_list(
+            "comment_count", flat=True
+        ).get(id=post.id)
     return JsonResponse(
         {
             "success": True,
@@ -1337,8 +1062,7 @@ def api_post_comments(request, source, post_id):
 @require_http_methods(["PUT", "PATCH"])
 def api_edit_post(request, source, post_id):
     """Edit a post (only by author)"""
-    source_key, (PostModel, CommentModel, ReactionModel) = _normalize_source(source)
-    post = get_object_or_404(PostModel, id=post_id)
+    source_key, post = _get_post_or_404(source, post_id)
 
     if post.author != request.user:
         return JsonResponse({"success": False, "error": "Not authorized"}, status=403)
@@ -1352,23 +1076,15 @@ def api_edit_post(request, source, post_id):
         post.message = payload["message"].strip()
 
     if "location" in payload:
-        raw_location = payload["location"]
-        if isinstance(raw_location, dict):
-            parts = [
-                raw_location.get("province") or raw_location.get("state") or "",
-                raw_location.get("city") or "",
-                raw_location.get("barangay") or "",
-                raw_location.get("address") or raw_location.get("display_name") or "",
-            ]
-            parts = [p for p in parts if p and str(p).strip()]
-            post.location = ", ".join(parts)
-        else:
-            post.location = str(raw_location).strip()
+        post.set_location(payload["location"])
 
-    post.save()
+    # Only the edited fields: likes/comment_count are kept by F() updates
+    # elsewhere and may have moved since the post was loaded
+    post.save(update_fields=["message", "location", "region", "province", "city", "barangay"])
+    post.refresh_from_db(fields=["likes"])
 
     post_dict = {
-        "id": post.id,
+        "id": post.public_id,
         "likes": post.likes,
         "author": post.author,
         "author_id": post.author.id if post.author else None,
@@ -1407,8 +1123,7 @@ def api_edit_post(request, source, post_id):
 @require_http_methods(["DELETE"])
 def api_delete_post(request, source, post_id):
     """Permanently delete a post (only by author)"""
-    source_key, (PostModel, CommentModel, ReactionModel) = _normalize_source(source)
-    post = get_object_or_404(PostModel, id=post_id)
+    source_key, post = _get_post_or_404(source, post_id)
 
     if post.author != request.user:
         return JsonResponse({"success": False, "error": "Not authorized"}, status=403)
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0002_postreaction'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['is_public', '-created_at', '-id'], name='stud_post_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:38
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_existing_comments(apps, schema_editor):
+    """Initialize comment_count (and re-sync likes) from existing rows"""
+    Post = apps.get_model('students', 'Post')
+    Comment = apps.get_model('students', 'Comment')
+    PostReaction = apps.get_model('students', 'PostReaction')
+
+    def count_of(model):
+        counts = (
+            model.objects.filter(post=OuterRef('pk'))
+            .order_by()
+            .values('post')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        return Coalesce(Subquery(counts), 0)
+
+    Post.objects.update(
+        comment_count=count_of(Comment),
+        likes=count_of(PostReaction),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0004_post_location_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_existing_comments, migrations.RunPython.noop),
+    ]
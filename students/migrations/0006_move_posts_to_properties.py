@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:41
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Drop the student post tables once properties 0006 has copied their rows."""
+
+    dependencies = [
+        ('students', '0005_post_comment_count'),
+        ('properties', '0006_unified_post_store'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='PostReaction',
+        ),
+        migrations.DeleteModel(
+            name='PostImage',
+        ),
+        migrations.DeleteModel(
+            name='Comment',
+        ),
+        migrations.DeleteModel(
+            name='Post',
+        ),
+    ]
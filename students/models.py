@@ -1,50 +1,5 @@
 # students app models.py
 
-from django.db import models
-from django.contrib.auth.models import User
-
-
-class Post(models.Model):
-    author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='student_posts')
-    author_name = models.CharField(max_length=255, blank=True, null=True)
-    message = models.TextField(blank=True)
-    location = models.CharField(max_length=255, blank=True, null=True)
-    likes = models.PositiveIntegerField(default=0)
-    is_public = models.BooleanField(default=True)
-    created_at = models.DateTimeField(auto_now_add=True)
-
-    def __str__(self):
-        return f"Post {self.id} by {self.author or self.author_name}"
-
-
-class PostImage(models.Model):
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='post_images/')
-
-    def __str__(self):
-        return f"Image for post {self.post_id}"
-
-
-class Comment(models.Model):
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
-    author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='student_comments')
-    author_name = models.CharField(max_length=255, blank=True, null=True)
-    text = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
-
-    def __str__(self):
-        return f"Comment {self.id} on post {self.post_id}"
-
-
-class PostReaction(models.Model):
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='reactions')
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='student_post_reactions')
-    created_at = models.DateTimeField(auto_now_add=True)
-
-    class Meta:
-        unique_together = ('post', 'user')
-        verbose_name = 'Post Reaction'
-        verbose_name_plural = 'Post Reactions'
-
-    def __str__(self):
-        return f"Reaction by {self.user_id} on student post {self.post_id}"
\ No newline at end of file
+# Student community posts (and their images, comments and reactions) are
+# stored in properties.models together with property owner posts; see
+# properties.models.Post.author_role.
@@ -46,22 +46,36 @@ urlpatterns = [
         name="api_get_trashed_rooms",
     ),
     # Messaging API Endpoints
-    path("api/conversations/", views.api_conversations, name="api_conversations"),
+    path(
+        "api/conversations/",
+        property_api_views.api_conversations,
+        name="api_conversations",
+    ),
     path(
         "api/conversations/<int:conversation_id>/messages/",
-        views.api_conversation_messages,
+        property_api_views.api_conversation_messages,
         name="api_conversation_messages",
     ),
     path(
         "api/send-message/<int:participant_id>/",
-        views.api_send_message,
+        property_api_views.api_send_message,
         name="api_send_message",
     ),
     path(
         "api/messages/<int:message_id>/delete/",
-        views.api_delete_message,
+        property_api_views.api_delete_message,
         name="api_delete_message",
     ),
+    path(
+        "api/messenger/stream/",
+        property_api_views.api_messenger_stream,
+        name="api_messenger_stream",
+    ),
+    path(
+        "api/unread-badge/",
+        property_api_views.api_unread_badge,
+        name="api_unread_badge",
+    ),
     # User Profile API Endpoint
     path("api/user/<int:user_id>/", views.api_user_profile, name="api_user_profile"),
     # Full page messenger
@@ -72,6 +86,11 @@ urlpatterns = [
     path("api/boarding-key/", views.api_boarding_key, name="api_boarding_key"),
     # Community Feed API
     path("api/community-feed/", views.api_community_feed, name="api_community_feed"),
+    path(
+        "api/community-search/",
+        property_api_views.api_community_search,
+        name="api_community_search",
+    ),
     path(
         "api/post/<str:source>/<int:post_id>/toggle-like/",
         property_api_views.api_toggle_like,
@@ -3,9 +3,9 @@
 
 import ast
 import base64
-import random
 import uuid
 
+from core.locations import format_location_parts, load_location_dict
 from core.models import (
     BoardingAssignment,
     MaintenanceRequest,
@@ -25,11 +25,10 @@ from django.template.loader import render_to_string
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from properties.models import Post as PropertiesPost
-from properties.models import PostReaction as PropertiesPostReaction
+from properties.feed import feed_page_response
 
-# Post models (created below in properties.models)
-from .models import Comment, Post, PostImage, PostReaction
+# Post models (shared with property owners in properties.models)
+from properties.models import Comment, Post, PostImage, PostReaction
 
 ALLOWED_SECTIONS = {"home", "my-home", "survey", "notifications", "trash", "profile"}
 
@@ -37,29 +36,11 @@ ALLOWED_SECTIONS = {"home", "my-home", "survey", "notifications", "trash", "prof
 def _format_location_value(value):
     if not value:
         return ""
-    if isinstance(value, dict):
-        parts = [
-            value.get("province") or value.get("state") or "",
-            value.get("city") or "",
-            value.get("barangay") or "",
-            value.get("address") or value.get("display_name") or "",
-        ]
-        return ", ".join([str(p).strip() for p in parts if p and str(p).strip()])
-    if isinstance(value, str):
-        stripped = value.strip()
-        try:
-            loaded = json.loads(stripped)
-            if isinstance(loaded, dict):
-                return _format_location_value(loaded)
-        except Exception:
-            try:
-                loaded = ast.literal_eval(stripped)
-                if isinstance(loaded, dict):
-                    return _format_location_value(loaded)
-            except Exception:
-                pass
-        return stripped
-    return str(value)
+    # Stored locations are already formatted; only legacy dict values need parsing
+    parts = load_location_dict(value)
+    if parts is not None:
+        return format_location_parts(parts)
+    return str(value).strip()
 
 
 @login_required
@@ -137,7 +118,7 @@ def student_dashboard(request, section="home"):
     # Build a public posts feed (includes others' posts and your own) - ordered by newest first (news feed algorithm)
     try:
         posts_qs = (
-            Post.objects.filter(is_public=True)
+            Post.objects.filter(is_public=True, author_role="student")
             .select_related("author")
             .prefetch_related("images", "comments")
             .order_by("-created_at")[:50]
@@ -150,7 +131,7 @@ def student_dashboard(request, section="home"):
                 liked = PostReaction.objects.filter(post=p, user=request.user).exists()
             student_posts.append(
                 {
-                    "id": p.id,
+                    "id": p.public_id,
                     "likes": p.likes,
                     "author": p.author,  # Pass author object for profile picture access
                     "author_id": p.author.id if p.author else None,
@@ -386,52 +367,16 @@ def api_create_post(request):
             else ""
         )
 
-        # Normalize location: if client sent a JSON/object string, convert to a readable single string
-        def normalize_location(loc_raw):
-            if not loc_raw:
-                return ""
-            # If already a string, attempt to parse JSON or Python-literal dict
-            if isinstance(loc_raw, str):
-                s = loc_raw.strip()
-                # try JSON
-                try:
-                    parsed = json.loads(s)
-                except Exception:
-                    try:
-                        parsed = ast.literal_eval(s)
-                    except Exception:
-                        parsed = None
-                if isinstance(parsed, dict):
-                    parts = [
-                        parsed.get("province") or parsed.get("state") or "",
-                        parsed.get("city") or "",
-                        parsed.get("barangay") or "",
-                        parsed.get("address") or parsed.get("display_name") or "",
-                    ]
-                    parts = [p for p in parts if p and str(p).strip()]
-                    return ", ".join(parts)
-                return s
-            # If it's already a dict/object
-            if isinstance(loc_raw, dict):
-                parts = [
-                    loc_raw.get("province") or loc_raw.get("state") or "",
-                    loc_raw.get("city") or "",
-                    loc_raw.get("barangay") or "",
-                    loc_raw.get("address") or loc_raw.get("display_name") or "",
-                ]
-                parts = [p for p in parts if p and str(p).strip()]
-                return ", ".join(parts)
-            return str(loc_raw)
-
-        location = normalize_location(raw_location)
-
-        post = Post.objects.create(
+        post = Post(
             author=request.user,
             author_name=request.user.get_full_name(),
+            author_role="student",
             message=content,
-            location=location,
             is_public=True,
         )
+        # Normalizes JSON/object strings into a readable string + location columns
+        post.set_location(raw_location)
+        post.save()
 
         # Handle uploaded files
         files = request.FILES.getlist("images")
@@ -440,7 +385,7 @@ def api_create_post(request):
 
         # Render the post HTML using the partial
         post_dict = {
-            "id": post.id,
+            "id": post.public_id,
             "likes": post.likes,
             "author_id": post.author.id if post.author else None,
             "author_full_name": post.author.get_full_name()
@@ -646,164 +591,7 @@ def api_get_trashed_rooms(request, property_id):
     return JsonResponse({"rooms": room_data}, safe=False)
 
 
-# Messaging APIs
-@login_required
-@require_http_methods(["GET"])
-def api_conversations(request):
-    """Get all conversations for the current user"""
-    from core.models import Conversation
-
-    conversations = (
-        Conversation.objects.filter(
-            models.Q(participant1=request.user) | models.Q(participant2=request.user)
-        )
-        .prefetch_related("messages")
-        .order_by("-updated_at")
-    )
-
-    conv_data = []
-    for conv in conversations:
-        other_user = conv.get_other_user(request.user)
-        last_message = conv.get_last_message()
-        unread_count = conv.get_unread_count(request.user)
-
-        conv_data.append(
-            {
-                "id": conv.id,
-                "participant": {
-                    "id": other_user.id,
-                    "name": other_user.get_full_name() or other_user.username,
-                    "username": other_user.username,
-                    "avatar": other_user.profile.get_profile_photo()
-                    if hasattr(other_user, "profile")
-                    else None,
-                },
-                "last_message": {
-                    "content": last_message.content[:100] if last_message else "",
-                    "sender_id": last_message.sender.id if last_message else None,
-                    "created_at": last_message.created_at.isoformat()
-                    if last_message
-                    else None,
-                    "is_read": last_message.is_read if last_message else True,
-                }
-                if last_message
-                else None,
-                "unread_count": unread_count,
-                "updated_at": conv.updated_at.isoformat(),
-            }
-        )
-
-    return JsonResponse({"conversations": conv_data})
-
-
-@login_required
-@require_http_methods(["GET"])
-def api_conversation_messages(request, conversation_id):
-    """Get all messages in a conversation"""
-    from core.models import Conversation, Message
-
-    # Find conversation where user is either participant1 or participant2
-    try:
-        conv = Conversation.objects.filter(
-            models.Q(id=conversation_id, participant1=request.user)
-            | models.Q(id=conversation_id, participant2=request.user)
-        ).first()
-        if not conv:
-            return JsonResponse({"error": "Conversation not found"}, status=404)
-    except:
-        return JsonResponse({"error": "Conversation not found"}, status=404)
-
-    messages_qs = Message.objects.filter(conversation=conv).select_related("sender")
-
-    # Mark messages as read
-    Message.objects.filter(conversation=conv).exclude(sender=request.user).update(
-        is_read=True
-    )
-
-    messages_data = []
-    for msg in messages_qs:
-        messages_data.append(
-            {
-                "id": msg.id,
-                "sender_id": msg.sender.id,
-                "sender_name": msg.sender.get_full_name() or msg.sender.username,
-                "sender_avatar": msg.sender.profile.get_profile_photo()
-                if hasattr(msg.sender, "profile")
-                else None,
-                "content": msg.content,
-                "is_read": msg.is_read,
-                "created_at": msg.created_at.isoformat(),
-            }
-        )
-
-    return JsonResponse({"messages": messages_data})
-
-
-@login_required
-@require_http_methods(["POST"])
-def api_send_message(request, participant_id):
-    """Send a message to a user"""
-    import json
-
-    from core.models import Conversation, Message
-    from django.db.models import Q
-
-    try:
-        recipient = User.objects.get(id=participant_id)
-    except User.DoesNotExist:
-        return JsonResponse({"error": "User not found"}, status=404)
-
-    if recipient == request.user:
-        return JsonResponse({"error": "Cannot message yourself"}, status=400)
-
-    try:
-        data = json.loads(request.POST.get("data", "{}"))
-        content = data.get("content", "").strip()
-    except:
-        content = ""
-
-    if not content:
-        return JsonResponse({"error": "Message cannot be empty"}, status=400)
-
-    # Get or create conversation (order-independent)
-    conv, created = Conversation.objects.get_or_create(
-        participant1=min(request.user, recipient, key=lambda u: u.id),
-        participant2=max(request.user, recipient, key=lambda u: u.id),
-    )
-
-    # Create message
-    message = Message.objects.create(
-        conversation=conv, sender=request.user, content=content
-    )
-
-    return JsonResponse(
-        {
-            "success": True,
-            "message": {
-                "id": message.id,
-                "sender_id": message.sender.id,
-                "content": message.content,
-                "created_at": message.created_at.isoformat(),
-            },
-            "conversation_id": conv.id,
-        }
-    )
-
-
-@login_required
-@require_http_methods(["DELETE"])
-def api_delete_message(request, message_id):
-    """Delete a message (soft delete)"""
-    from core.models import Message
-
-    try:
-        message = Message.objects.get(id=message_id, sender=request.user)
-        message.delete()
-        return JsonResponse({"success": True})
-    except Message.DoesNotExist:
-        return JsonResponse(
-            {"error": "Message not found or not authorized"}, status=404
-        )
+# Messaging APIs are shared with property owners (properties/views.py)
 
 
 @login_required
@@ -970,285 +758,12 @@ def profile_setup(request):
 @login_required
 @require_http_methods(["GET"])
 def api_community_feed(request):
-    """API endpoint to get community news feed - all public posts from all users (students + properties)"""
-    try:
-        import json
-        from datetime import timedelta
-
-        from core.models import UserProfile
-        from django.db.models import CharField, Count, Value
-        from django.db.models.functions import Concat
-        from django.utils import timezone
-        from properties.models import Post as PropertiesPost
-
-        # Get page for pagination
-        page = int(request.GET.get("page", 1))
-        limit = int(request.GET.get("limit", 10))
-        offset = (page - 1) * limit
-
-        # Get location filters - Only allow Caraga region
-        filter_region = request.GET.get("region", "").strip()
-        filter_province = request.GET.get("province", "").strip()
-        filter_city = request.GET.get("city", "").strip()
-        filter_barangay = request.GET.get("barangay", "").strip()
-
-        # Restrict region to Caraga only
-        if filter_region and "caraga" not in filter_region.lower():
-            filter_region = ""
-
-        # Get all public posts from both students and properties
-        student_posts = (
-            Post.objects.filter(is_public=True)
-            .select_related("author")
-            .prefetch_related("images", "comments")
-            .annotate(
-                engagement_score=Count("comments"),
-                user_type=Value("student", output_field=CharField()),
-            )
-            .values(
-                "id",
-                "author_id",
-                "author_name",
-                "message",
-                "location",
-                "likes",
-                "created_at",
-                "engagement_score",
-                "user_type",
-            )
-        )
-
-        property_posts = (
-            PropertiesPost.objects.filter(is_public=True)
-            .select_related("author")
-            .prefetch_related("images", "comments")
-            .annotate(
-                engagement_score=Count("comments"),
-                user_type=Value("property_owner", output_field=CharField()),
-            )
-            .values(
-                "id",
-                "author_id",
-                "author_name",
-                "message",
-                "location",
-                "likes",
-                "created_at",
-                "engagement_score",
-                "user_type",
-            )
-        )
-
-        # Combine both querysets and mix recency with randomness
-        all_posts = list(student_posts) + list(property_posts)
-
-        # Apply location filters if provided (Caraga region focus)
-        if filter_region or filter_province or filter_city or filter_barangay:
-            filtered_posts = []
-            for post_data in all_posts:
-                location_str = str(post_data.get("location", "") or "").lower()
-
-                # Try to parse as JSON first, then as string
-                location_obj = None
-                try:
-                    if location_str.startswith("{"):
-                        location_obj = json.loads(location_str)
-                except:
-                    pass
-
-                matches = True
-
-                # Check region (must be Caraga if specified)
-                if filter_region:
-                    region_match = False
-                    if location_obj:
-                        region_val = str(location_obj.get("region", "") or "").lower()
-                        if "caraga" in region_val:
-                            region_match = True
-                    elif "caraga" in location_str:
-                        region_match = True
-
-                    if not region_match:
-                        matches = False
-
-                # Check province (within Caraga)
-                if matches and filter_province:
-                    province_match = False
-                    if location_obj:
-                        province_val = str(
-                            location_obj.get("province", "") or ""
-                        ).lower()
-                        if filter_province.lower() in province_val:
-                            province_match = True
-                    elif filter_province.lower() in location_str:
-                        province_match = True
-
-                    if not province_match:
-                        matches = False
-
-                # Check city/municipality
-                if matches and filter_city:
-                    city_match = False
-                    if location_obj:
-                        city_val = str(location_obj.get("city", "") or "").lower()
-                        if filter_city.lower() in city_val:
-                            city_match = True
-                    elif filter_city.lower() in location_str:
-                        city_match = True
-
-                    if not city_match:
-                        matches = False
-
-                # Check barangay
-                if matches and filter_barangay:
-                    barangay_match = False
-                    if location_obj:
-                        barangay_val = str(
-                            location_obj.get("barangay", "") or ""
-                        ).lower()
-                        if filter_barangay.lower() in barangay_val:
-                            barangay_match = True
-                    elif filter_barangay.lower() in location_str:
-                        barangay_match = True
-
-                    if not barangay_match:
-                        matches = False
-
-                if matches:
-                    filtered_posts.append(post_data)
-
-            all_posts = filtered_posts
-
-        all_posts.sort(key=lambda x: x["created_at"], reverse=True)
-        latest_slice = all_posts[:5]
-        remaining_slice = all_posts[5:]
-        random.shuffle(remaining_slice)
-        mixed_posts = latest_slice + remaining_slice
-
-        # Apply pagination
-        paginated_posts = mixed_posts[offset : offset + limit]
-
-        posts_data = []
-        for post_data in paginated_posts:
-            # Determine which model to get full post from
-            source_key = (
-                "student" if post_data["user_type"] == "student" else "property"
-            )
-            if source_key == "student":
-                post_obj = (
-                    Post.objects.select_related("author")
-                    .prefetch_related("images", "comments")
-                    .get(id=post_data["id"])
-                )
-                reaction_model = PostReaction
-            else:
-                post_obj = (
-                    PropertiesPost.objects.select_related("author")
-                    .prefetch_related("images", "comments")
-                    .get(id=post_data["id"])
-                )
-                reaction_model = PropertiesPostReaction
-
-            # Get images
-            images = [img.image.url for img in post_obj.images.all()]
-
-            # Get recent comments (limit to 3)
-            comments = post_obj.comments.all().order_by("-created_at")[:3]
-            comments_data = [
-                {
-                    "id": c.id,
-                    "author": c.author_name
-                    or (c.author.get_full_name() if c.author else "Anonymous"),
-                    "text": c.text,
-                    "timestamp": c.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                }
-                for c in comments
-            ]
-
-            # Calculate post age for display
-            now = timezone.now()
-            post_age = now - post_data["created_at"]
-
-            if post_age.days > 0:
-                time_display = f"{post_age.days}d ago"
-            elif post_age.seconds > 3600:
-                time_display = f"{post_age.seconds // 3600}h ago"
-            elif post_age.seconds > 60:
-                time_display = f"{post_age.seconds // 60}m ago"
-            else:
-                time_display = "just now"
-
-            # Get author role
-            author_role = "Student"
-            if post_data["user_type"] == "property_owner":
-                author_role = "Property Owner"
-
-            # Try to get user role from UserProfile
-            if post_data["author_id"]:
-                try:
-                    user_profile = UserProfile.objects.get(
-                        user_id=post_data["author_id"]
-                    )
-                    if user_profile.role == "student":
-                        author_role = "Student"
-                    elif user_profile.role == "property_owner":
-                        author_role = "Property Owner"
-                except:
-                    pass
-
-            liked = False
-            if request.user.is_authenticated:
-                liked = reaction_model.objects.filter(
-                    post=post_obj, user=request.user
-                ).exists()
-
-            # Get author profile picture
-            author_profile_picture = ""
-            if post_obj.author:
-                try:
-                    profile = UserProfile.objects.get(user=post_obj.author)
-                    if profile.profile_picture:
-                        author_profile_picture = profile.profile_picture.url
-                except UserProfile.DoesNotExist:
-                    pass
-
-            posts_data.append(
-                {
-                    "id": post_data["id"],
-                    "author_id": post_data["author_id"],
-                    "author_name": post_data["author_name"] or "Anonymous",
-                    "author_profile_picture": author_profile_picture,
-                    "author_role": author_role,
-                    "message": post_data["message"],
-                    "location": _format_location_value(post_data["location"]) or "",
-                    "likes": post_obj.likes,
-                    "images": images,
-                    "comments": comments_data,
-                    "comments_count": post_obj.comments.count(),
-                    "timestamp": time_display,
-                    "created_at": post_data["created_at"].isoformat(),
-                    "created_display": timezone.localtime(
-                        post_data["created_at"]
-                    ).strftime("%b %d, %Y %H:%M"),
-                    "user_type": post_data["user_type"],
-                    "source": source_key,
-                    "liked": liked,
-                }
-            )
-
-        total_count = len(mixed_posts)
-
-        return JsonResponse(
-            {
-                "success": True,
-                "posts": posts_data,
-                "page": page,
-                "limit": limit,
-                "total_count": total_count,
-                "has_more": offset + limit < total_count,
-            }
-        )
+    """API endpoint to get community news feed - all public posts from all users (students + properties)
 
+    Paginated by an opaque ``cursor`` (``next_cursor`` from the previous page).
+    """
+    try:
+        return feed_page_response(request)
     except Exception as e:
         import traceback
 